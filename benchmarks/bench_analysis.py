@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+""" Panoptes - Benchmarks - Analysis
+
+Times and measures the memory of every stage of the AWS analysis against
+synthetic accounts, replayed in memory through SnapshotInventory.
+
+Usage:
+    python benchmarks/bench_analysis.py --sizes 1000,10000,100000
+    python benchmarks/bench_analysis.py --save baseline.json
+    python benchmarks/bench_analysis.py --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import panoptes
+import synthetic
+
+
+DEFAULT_SIZES = "1000,10000,100000"
+DEFAULT_TOLERANCE = 0.25
+
+
+def generate_cases(account: dict) -> list:
+    """
+    Generates the (name, function) pairs benchmarked for one account
+    """
+    snapshot = account['Snapshot']
+    whitelist = account['Whitelist']
+
+    def inventory():
+        return panoptes.aws.snapshot.SnapshotInventory(snapshot)
+
+    def analyze():
+        return panoptes.aws.analysis.analyze_security_groups(
+            session=None,
+            whitelist=whitelist,
+            inventory=inventory(),
+        )
+
+    def analyze_columnar():
+        return panoptes.aws.analysis.analyze_security_groups(
+            session=None,
+            whitelist=whitelist,
+            inventory=inventory(),
+            engine=panoptes.aws.analysis.COLUMNAR_ENGINE,
+        )
+
+    def write(function):
+        with open(os.devnull, 'w') as output_file:
+            function(analysis=analysis, output_file=output_file)
+
+    analysis = analyze()
+    cases = [
+        ("list_all_safe_ips",
+         lambda: panoptes.aws.whitelist.list_all_safe_ips(None, inventory=inventory())),
+        ("list_all_attached_secgroups",
+         lambda: panoptes.aws.attached.list_all_attached_secgroups(None, inventory=inventory())),
+        ("analyze_security_groups", analyze),
+    ]
+    if panoptes.aws.columnar.is_available():
+        cases.append(("analyze_security_groups_columnar", analyze_columnar))
+    return cases + [
+        ("print_human", lambda: panoptes.aws.output.print_human(analysis)),
+        ("print_json", lambda: panoptes.generic.output.print_json(analysis)),
+        ("print_yml", lambda: panoptes.generic.output.print_yml(analysis)),
+        ("write_json", lambda: write(panoptes.generic.output.write_json)),
+        ("write_yml", lambda: write(panoptes.generic.output.write_yml)),
+    ]
+
+
+def measure_time(function, repeat: int) -> float:
+    """
+    Returns the best wall time in seconds among the repetitions
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def measure_memory(function) -> float:
+    """
+    Returns the peak of memory allocated by the function in MiB
+    """
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run_benchmarks(sizes: list, repeat: int, memory: bool) -> list:
+    """
+    Runs every benchmark case for every account size
+    """
+    results = []
+    for size in sizes:
+        account = synthetic.generate_account(groups=size)
+        for name, function in generate_cases(account):
+            result = {
+                'Name': name,
+                'Groups': size,
+                'Seconds': measure_time(function, repeat),
+            }
+            if memory:
+                result['PeakMiB'] = measure_memory(function)
+            results.append(result)
+            print_result(result)
+    return results
+
+
+def print_result(result: dict):
+    """
+    Prints a benchmark result as a table row
+    """
+    peak = f"{result['PeakMiB']:>10.1f}" if 'PeakMiB' in result else f"{'-':>10}"
+    print(
+        f"{result['Name']:<34}{result['Groups']:>9}"
+        f"{result['Seconds']:>12.4f}{peak}",
+        flush=True,
+    )
+
+
+def compare_results(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Returns the descriptions of every result slower or bigger than the
+    baseline beyond the tolerance
+    """
+    baseline_results = {
+        (result['Name'], result['Groups']): result for result in baseline
+    }
+    regressions = []
+    for result in results:
+        previous = baseline_results.get((result['Name'], result['Groups']))
+        if previous is None:
+            continue
+        for metric in ('Seconds', 'PeakMiB'):
+            if metric in result and metric in previous and previous[metric] > 0:
+                ratio = result[metric] / previous[metric]
+                if ratio > 1 + tolerance:
+                    regressions.append(
+                        f"{result['Name']} ({result['Groups']} groups): "
+                        f"{metric} {previous[metric]:.4f} -> {result[metric]:.4f} "
+                        f"(+{(ratio - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', default=DEFAULT_SIZES,
+        help=f"Comma separated amounts of security groups (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help="Repetitions per case, the best one is kept (default: 3)",
+    )
+    parser.add_argument(
+        '--no-memory', action='store_true',
+        help="Skip the tracemalloc run, which is slower than the timed one",
+    )
+    parser.add_argument('--save', metavar='<path>', help="Write results as JSON")
+    parser.add_argument(
+        '--compare', metavar='<path>',
+        help="Fail when results regress against a file written by --save",
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help=f"Allowed regression ratio for --compare (default: {DEFAULT_TOLERANCE})",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    print(f"{'Benchmark':<34}{'Groups':>9}{'Seconds':>12}{'PeakMiB':>10}")
+    results = run_benchmarks(sizes, args.repeat, memory=not args.no_memory)
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
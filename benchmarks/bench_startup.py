@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+""" Panoptes - Benchmarks - Startup
+
+Times short panoptesctl commands in fresh interpreters, where imports
+dominate, and lists the heavy dependencies each of them loads.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --save baseline.json
+    python benchmarks/bench_startup.py --compare baseline.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+
+DEFAULT_REPEAT = 10
+DEFAULT_TOLERANCE = 0.25
+HEAVY_MODULES = [
+    "boto3",
+    "botocore",
+    "colorama",
+    "dateutil",
+    "jinja2",
+    "numpy",
+    "pkg_resources",
+    "yaml",
+]
+CASES = [
+    ("python", []),
+    ("import panoptes", None),
+    ("panoptesctl --help", ["--help"]),
+    ("panoptesctl version", ["version"]),
+    ("panoptesctl aws --help", ["aws", "--help"]),
+    ("panoptesctl aws analyze --help", ["aws", "analyze", "--help"]),
+]
+# Runs panoptesctl, then writes the heavy modules it loaded to stderr
+RUNNER = """
+import sys
+arguments = {arguments!r}
+if arguments is not None:
+    import panoptes.panoptesctl
+    try:
+        panoptes.panoptesctl.main(arguments, prog_name="panoptesctl")
+    except SystemExit:
+        pass
+else:
+    import panoptes
+loaded = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+print(",".join(loaded), file=sys.stderr)
+"""
+
+
+def measure_case(arguments, repeat: int) -> tuple:
+    """
+    Returns the best wall time in seconds of a fresh interpreter running
+    the case, and the heavy modules it loaded. Empty arguments only start
+    the interpreter, as a reference
+    """
+    if arguments == []:
+        command = [sys.executable, "-c", "pass"]
+    else:
+        command = [
+            sys.executable, "-c",
+            RUNNER.format(arguments=arguments, heavy=HEAVY_MODULES),
+        ]
+
+    timings = []
+    loaded = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process = subprocess.run(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        timings.append(time.perf_counter() - started)
+        stderr_lines = process.stderr.strip().splitlines()
+        loaded = stderr_lines[-1] if stderr_lines else ""
+    return min(timings), loaded
+
+
+def run_benchmarks(repeat: int) -> list:
+    """
+    Runs every startup case
+    """
+    results = []
+    for name, arguments in CASES:
+        seconds, loaded = measure_case(arguments, repeat)
+        result = {
+            'Name': name,
+            'Seconds': seconds,
+            'Modules': loaded,
+        }
+        results.append(result)
+        print(f"{name:<34}{seconds:>10.4f}   {loaded or '-'}", flush=True)
+    return results
+
+
+def compare_results(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Returns the descriptions of every result slower than the baseline
+    beyond the tolerance
+    """
+    baseline_results = {result['Name']: result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(result['Name'])
+        if previous is None or previous['Seconds'] <= 0:
+            continue
+        ratio = result['Seconds'] / previous['Seconds']
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{result['Name']}: Seconds {previous['Seconds']:.4f} -> "
+                f"{result['Seconds']:.4f} (+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--repeat', type=int, default=DEFAULT_REPEAT,
+        help=f"Runs per case, the best one is kept (default: {DEFAULT_REPEAT})",
+    )
+    parser.add_argument('--save', metavar='<path>', help="Write results as JSON")
+    parser.add_argument(
+        '--compare', metavar='<path>',
+        help="Fail when results regress against a file written by --save",
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help=f"Allowed regression ratio for --compare (default: {DEFAULT_TOLERANCE})",
+    )
+    args = parser.parse_args()
+
+    print(f"{'Benchmark':<34}{'Seconds':>10}   Heavy modules loaded")
+    results = run_benchmarks(args.repeat)
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=4)
+
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
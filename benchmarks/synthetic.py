@@ -0,0 +1,154 @@
+""" Panoptes - Benchmarks - Synthetic
+
+Generates synthetic AWS accounts as in-memory snapshots, so the analysis can
+be benchmarked through panoptes.aws.snapshot.SnapshotInventory without
+calling AWS.
+"""
+
+import random
+import panoptes
+
+
+PROTOCOLS = ["tcp", "udp", "icmp", "-1"]
+COMMON_PORTS = [22, 80, 443, 3306, 5432, 6379, 8080, 9200]
+
+
+def generate_cidr(rng: random.Random) -> str:
+    """
+    Generates a random public or private CIDR
+    """
+    prefix = rng.choice([8, 16, 24, 28, 32, 32, 32])
+    address = rng.getrandbits(32) & (0xFFFFFFFF << (32 - prefix))
+    octets = ".".join(str((address >> shift) & 0xFF) for shift in (24, 16, 8, 0))
+    return f"{octets}/{prefix}"
+
+
+def generate_ip_permission(rng: random.Random, ranges_per_rule: int, whitelist: list) -> dict:
+    """
+    Generates an ingress rule, part of its ranges being whitelisted ones
+    """
+    protocol = rng.choice(PROTOCOLS)
+    permission = {
+        'IpProtocol': protocol,
+        'IpRanges': [],
+        'Ipv6Ranges': [],
+        'UserIdGroupPairs': [],
+    }
+    if protocol in ("tcp", "udp"):
+        from_port = rng.choice(COMMON_PORTS)
+        permission['FromPort'] = from_port
+        permission['ToPort'] = from_port + rng.choice([0, 0, 0, 10, 1000])
+    elif protocol == "icmp":
+        permission['FromPort'] = -1
+        permission['ToPort'] = -1
+    for _ in range(ranges_per_rule):
+        roll = rng.random()
+        if roll < 0.5 and whitelist:
+            cidr = rng.choice(whitelist)
+        elif roll < 0.55:
+            cidr = "0.0.0.0/0"
+        else:
+            cidr = generate_cidr(rng)
+        permission['IpRanges'].append({'CidrIp': cidr})
+    return permission
+
+
+def generate_account(
+        groups: int,
+        rules_per_group: int = 5,
+        ranges_per_rule: int = 4,
+        whitelist_size: int = 5000,
+        page_size: int = 1000,
+        seed: int = 42) -> dict:
+    """
+    Generates a snapshot of a synthetic account, with half of the groups
+    attached to EC2 instances and the other half to network interfaces or
+    nothing at all
+
+    DesiredReturn:
+        {
+            "Snapshot": dict[Same as panoptes.aws.snapshot.create_snapshot],
+            "Whitelist": list,
+        }
+    """
+    rng = random.Random(seed)
+    whitelist = [generate_cidr(rng) for _ in range(whitelist_size)]
+
+    security_groups = []
+    instances = []
+    network_interfaces = []
+    for index in range(groups):
+        group_id = f"sg-{index:017x}"
+        security_groups.append({
+            'GroupName': f"group-{index}",
+            'GroupId': group_id,
+            'Description': f"Synthetic group {index}",
+            'VpcId': f"vpc-{index % 50:08x}",
+            'IpPermissions': [
+                generate_ip_permission(rng, ranges_per_rule, whitelist)
+                for _ in range(rng.randint(1, rules_per_group * 2 - 1))
+            ],
+        })
+        if index % 2 == 0:
+            instances.append({
+                'InstanceId': f"i-{index:017x}",
+                'SecurityGroups': [{'GroupId': group_id}],
+                'NetworkInterfaces': [{
+                    'PrivateIpAddress': f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+                }],
+            })
+        elif index % 3 == 0:
+            network_interfaces.append({
+                'NetworkInterfaceId': f"eni-{index:017x}",
+                'Groups': [{'GroupId': group_id}],
+            })
+
+    def paginate(items: list, key: str, wrap=None) -> list:
+        pages = []
+        for start in range(0, len(items), page_size):
+            chunk = items[start:start + page_size]
+            pages.append({key: wrap(chunk) if wrap else chunk})
+        return pages or [{key: []}]
+
+    def call(service: str, operation: str, **params) -> str:
+        return panoptes.aws.inventory.generate_call_key(service, operation, params)
+
+    calls = {
+        call('ec2', 'describe_security_groups'): paginate(security_groups, 'SecurityGroups'),
+        call('ec2', 'describe_instances'): paginate(
+            instances, 'Reservations', wrap=lambda chunk: [{'Instances': chunk}]
+        ),
+        call('ec2', 'describe_network_interfaces', PaginationConfig={'PageSize': 1000}): (
+            paginate(network_interfaces, 'NetworkInterfaces')
+        ),
+        call('ec2', 'describe_vpcs'): [{'Vpcs': [
+            {'VpcId': f"vpc-{index:08x}", 'CidrBlock': f"10.{index}.0.0/16"}
+            for index in range(50)
+        ]}],
+        call('ec2', 'describe_subnets'): [{'Subnets': [
+            {'CidrBlock': f"10.{index // 4}.{index % 4}.0/24"} for index in range(200)
+        ]}],
+        call('ec2', 'describe_addresses'): [{'Addresses': [
+            {'PublicIp': f"52.0.{index // 256}.{index % 256}"} for index in range(500)
+        ]}],
+        call('rds', 'describe_db_instances'): [{'DBInstances': []}],
+        call('elb', 'describe_load_balancers'): [{'LoadBalancerDescriptions': []}],
+        call('elbv2', 'describe_load_balancers'): [{'LoadBalancers': []}],
+        call('lambda', 'list_functions'): [{'Functions': []}],
+        call('elasticache', 'describe_cache_clusters'): [{'CacheClusters': []}],
+        call('elasticache', 'describe_cache_security_groups'): [{'CacheSecurityGroups': []}],
+        call('ecs', 'list_clusters'): [{'clusterArns': []}],
+        call('sts', 'get_caller_identity'): [{
+            'Arn': "arn:aws:iam::123456789012:user/benchmark",
+            'Account': "123456789012",
+        }],
+    }
+    return {
+        'Snapshot': {
+            'Version': panoptes.aws.snapshot.SNAPSHOT_VERSION,
+            'Region': "us-east-1",
+            'CreatedAt': panoptes.generic.helpers.get_current_time(),
+            'Calls': calls,
+        },
+        'Whitelist': whitelist,
+    }
@@ -2,12 +2,40 @@
 
 Responsible only to import the cloud respective folders, which were created to
 organize the project properly.
+
+Folders and modules are imported lazily the first time they are accessed, so
+short commands only load the dependencies they use.
 """
 
-from panoptes import aws
-from panoptes import cli
-from panoptes import generic
-from panoptes import panoptesctl
+import importlib
+
+
+SUBMODULES = [
+    "aws",
+    "cli",
+    "generic",
+    "panoptesctl",
+]
+
+
+def lazy_submodules(package_name: str, submodules: list) -> tuple:
+    """
+    Generates the module __getattr__ and __dir__ (PEP 562) of a package,
+    importing its submodules on first access
+    """
+    def __getattr__(name: str):
+        if name in submodules:
+            return importlib.import_module(f"{package_name}.{name}")
+        raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+
+    def __dir__() -> list:
+        package = importlib.import_module(package_name)
+        return sorted(set(vars(package)) | set(submodules))
+
+    return __getattr__, __dir__
+
+
+__getattr__, __dir__ = lazy_submodules(__name__, SUBMODULES)
 
 
 if __name__ == "__main__":
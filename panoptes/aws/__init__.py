@@ -2,12 +2,34 @@
 Responsible to import analysis functions from AWS.
 """
 
-from panoptes.aws import analysis
-from panoptes.aws import attached
-from panoptes.aws import authentication
-from panoptes.aws import exceptions
-from panoptes.aws import output
-from panoptes.aws import whitelist
+import panoptes
+
+
+SUBMODULES = [
+    "aio",
+    "analysis",
+    "analyzer",
+    "attached",
+    "authentication",
+    "cache",
+    "columnar",
+    "events",
+    "exceptions",
+    "exposure",
+    "graph",
+    "instrumentation",
+    "inventory",
+    "model",
+    "output",
+    "scheduler",
+    "scope",
+    "snapshot",
+    "state",
+    "watch",
+    "whitelist",
+]
+
+__getattr__, __dir__ = panoptes.lazy_submodules(__name__, SUBMODULES)
 
 
 if __name__ == "__main__":
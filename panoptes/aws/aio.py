@@ -0,0 +1,464 @@
+""" Panoptes - AWS - Asyncio
+
+Optional collection engine running every describe/list call of the analysis
+as a coroutine on a single event loop, through aiobotocore clients. Calls
+are bounded by a semaphore per session, service and region, and by a
+global cap of requests in flight, instead of one OS thread per call. Every
+request is paced by the token buckets of the scheduler, shared with the
+threaded collectors.
+
+Coroutines ending in _async run on the caller's event loop. The
+synchronous functions run them on one event loop shared by every caller,
+started on a daemon thread on first use, so they work from any thread,
+even one already running an event loop, and concurrent callers, like the
+workers streaming the findings of many regions, share the same loop and
+request bounds.
+
+The collected pages are stored into the inventory, so the analysis reads
+them exactly as if they had been fetched by the threaded collectors. Calls
+which fail are left out, and the analysis fetches them again synchronously,
+handling and reporting their errors the same way it always did.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import importlib.util
+import threading
+import time
+import typing
+import weakref
+import panoptes
+
+
+DEFAULT_MAX_SCANS = 64
+DEFAULT_MAX_REQUESTS = 256
+DEFAULT_SERVICE_CONCURRENCY = 4
+# Independent calls of the analysis, the ECS ones depend on each other.
+# Scoped inventories fetch the security groups and the calls of
+# SCOPED_CALLS with their filters
+COLLECTED_CALLS = [
+    ('sts', 'get_caller_identity', {}),
+    ('ec2', 'describe_security_groups', {}),
+    ('ec2', 'describe_vpcs', {}),
+    ('ec2', 'describe_subnets', {}),
+    ('ec2', 'describe_addresses', {}),
+    ('ec2', 'describe_instances', {}),
+    ('ec2', 'describe_network_interfaces', {'PaginationConfig': {'PageSize': 1000}}),
+    ('rds', 'describe_db_instances', {}),
+    ('elb', 'describe_load_balancers', {}),
+    ('elbv2', 'describe_load_balancers', {}),
+    ('lambda', 'list_functions', {}),
+    ('elasticache', 'describe_cache_clusters', {}),
+    ('elasticache', 'describe_cache_security_groups', {}),
+]
+# (service, operation, group filter, params) of the calls limited by the
+# scope, see panoptes.aws.scope.generate_scoped_params
+SCOPED_CALLS = [
+    ('ec2', 'describe_network_interfaces', 'group-id', {'PaginationConfig': {'PageSize': 1000}}),
+]
+# Calls of whitelist sources which the attachments read too, fetched even
+# when the ranges of the source are cached
+ATTACHMENT_CALLS = {
+    ('ec2', 'describe_instances'),
+}
+
+
+def is_available() -> bool:
+    """
+    Returns True when aiobotocore, required by this engine, is installed
+    """
+    return importlib.util.find_spec("aiobotocore") is not None
+
+
+class AsyncCollector:
+    """
+    Fetches the calls of the analysis into inventories. Must be created
+    inside the event loop running it. Every collected inventory gets its own
+    clients, closed once its collection is done, while the aiobotocore
+    sessions and the semaphores are shared by every inventory
+    """
+
+    def __init__(
+            self,
+            max_requests: int = DEFAULT_MAX_REQUESTS,
+            service_concurrency: int = DEFAULT_SERVICE_CONCURRENCY):
+        self.service_concurrency = service_concurrency
+        self._requests = asyncio.Semaphore(max_requests)
+        self._semaphores = {}
+        self._sessions = weakref.WeakKeyDictionary()
+
+    async def collect(
+            self,
+            inventory: 'panoptes.aws.inventory.Inventory',
+            whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None):
+        """
+        Fetches every call of the analysis which the inventory doesn't have
+        yet, concurrently. Calls of the whitelist sources cached in the
+        whitelist cache are skipped
+        """
+        with inventory.recorder.phase('Collection'):
+            async with contextlib.AsyncExitStack() as clients_stack:
+                memoized_calls = set(inventory.export())
+                clients = {}
+                running_calls = {}
+
+                async def fetch_call(service: str, operation: str, params: dict):
+                    if service not in clients:
+                        clients[service] = asyncio.ensure_future(
+                            self.create_client(inventory, service, clients_stack)
+                        )
+                    try:
+                        client = await clients[service]
+                        return await self.fetch(inventory, client, service, operation, **params)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        return None
+
+                async def fetch(service: str, operation: str, **params):
+                    key = panoptes.aws.inventory.generate_call_key(service, operation, params)
+                    if key in memoized_calls:
+                        return inventory.pages(service, operation, **params)
+                    # Calls asked for twice are fetched once
+                    if key not in running_calls:
+                        running_calls[key] = asyncio.ensure_future(
+                            fetch_call(service, operation, params)
+                        )
+                    return await running_calls[key]
+
+                try:
+                    skipped_calls = set()
+                    if whitelist_cache is not None:
+                        identity_pages = await fetch('sts', 'get_caller_identity')
+                        if identity_pages:
+                            skipped_calls = {
+                                panoptes.aws.whitelist.SOURCE_CALLS[source]
+                                for source in whitelist_cache.get_fresh_sources(
+                                    identity_pages[0]['Account'],
+                                    inventory.region,
+                                )
+                            } - ATTACHMENT_CALLS
+                    if inventory.scope:
+                        skipped_calls.add(('ec2', 'describe_security_groups'))
+                        skipped_calls.update(
+                            (service, operation) for service, operation, _, _ in SCOPED_CALLS
+                        )
+                    await asyncio.gather(
+                        *[
+                            fetch(service, operation, **params)
+                            for service, operation, params in COLLECTED_CALLS
+                            if (service, operation) not in skipped_calls
+                        ],
+                        self.collect_ecs(fetch),
+                        self.collect_scope(inventory, fetch),
+                    )
+                finally:
+                    # Calls and clients still running when cancelled
+                    for running_task in [*running_calls.values(), *clients.values()]:
+                        running_task.cancel()
+
+    async def collect_scope(
+            self,
+            inventory: 'panoptes.aws.inventory.Inventory',
+            fetch: typing.Callable):
+        """
+        Fetches the security groups of the inventory scope, then the calls
+        limited by it and the groups referencing them, the same calls made
+        by the analysis of a scoped inventory
+        """
+        if not inventory.scope:
+            return
+        security_groups_pages = await fetch(
+            'ec2', 'describe_security_groups',
+            Filters=inventory.scope.generate_security_group_filters(),
+        )
+        if security_groups_pages is None:
+            return
+        await asyncio.gather(
+            *[
+                fetch(service, operation, **params)
+                for service, operation, group_filter, call_params in SCOPED_CALLS
+                for params in panoptes.aws.scope.generate_scoped_params(
+                    inventory, group_filter, **call_params
+                )
+            ],
+            *[
+                fetch('ec2', 'describe_security_groups', **params)
+                for params in panoptes.aws.scope.generate_referencing_params(inventory)
+            ],
+        )
+
+    async def collect_ecs(self, fetch: typing.Callable):
+        """
+        Fetches the ECS services of every cluster, the same calls made by
+        panoptes.aws.attached.list_ecs_attached_secgroups
+        """
+        clusters_pages = await fetch('ecs', 'list_clusters')
+        clusters = [
+            cluster
+            for clusters_page in clusters_pages or []
+            for cluster in clusters_page['clusterArns']
+        ]
+        services_pages = await asyncio.gather(
+            *[fetch('ecs', 'list_services', cluster=cluster) for cluster in clusters]
+        )
+        limit = panoptes.aws.attached.ECS_SERVICE_API_LIMIT
+        await asyncio.gather(*[
+            fetch(
+                'ecs', 'describe_services',
+                cluster=cluster,
+                services=services_page['serviceArns'][i:i+limit],
+            )
+            for cluster, cluster_pages in zip(clusters, services_pages)
+            for services_page in cluster_pages or []
+            for i in range(0, len(services_page['serviceArns']), limit)
+        ])
+
+    async def create_client(
+            self,
+            inventory: 'panoptes.aws.inventory.Inventory',
+            service: str,
+            clients_stack: contextlib.AsyncExitStack):
+        """
+        Creates the aiobotocore client of the service, closed together with
+        the stack
+        """
+        import aiobotocore.config
+        client = await clients_stack.enter_async_context(
+            self.get_session(inventory.session).create_client(
+                service,
+                region_name=inventory.region,
+                config=aiobotocore.config.AioConfig(
+                    max_pool_connections=self.service_concurrency,
+                    retries={
+                        'mode': 'standard',
+                        'max_attempts': panoptes.aws.scheduler.MAX_ATTEMPTS,
+                    },
+                ),
+            )
+        )
+        client.meta.events.register(
+            'needs-retry',
+            functools.partial(inventory.handle_retry_event, service),
+        )
+        inventory.scheduler.register_async(
+            client, inventory.session, service, inventory.region
+        )
+        return client
+
+    def get_session(self, session: 'boto3.session.Session'):
+        """
+        Returns the aiobotocore session of the Boto3 session, with its
+        current credentials, so refreshed credentials are picked up by the
+        next clients
+        """
+        import aiobotocore.session
+        if session not in self._sessions:
+            self._sessions[session] = aiobotocore.session.get_session()
+        aio_session = self._sessions[session]
+        credentials = session.get_credentials()
+        if credentials is not None:
+            credentials = credentials.get_frozen_credentials()
+            aio_session.set_credentials(
+                credentials.access_key,
+                credentials.secret_key,
+                credentials.token,
+            )
+        return aio_session
+
+    def semaphore(self, session: 'boto3.session.Session', service: str, region: str):
+        """
+        Returns the semaphore bounding the requests of the session, service
+        and region, the scope AWS throttles
+        """
+        key = (session, service, region)
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.service_concurrency)
+        return self._semaphores[key]
+
+    async def fetch(
+            self,
+            inventory: 'panoptes.aws.inventory.Inventory',
+            client,
+            service: str,
+            operation: str,
+            **params) -> typing.List[dict]:
+        """
+        Calls AWS walking the paginator when the operation has one, the same
+        as panoptes.aws.inventory.Inventory.fetch, and stores the pages into
+        the inventory
+        """
+        async with self.semaphore(inventory.session, service, inventory.region):
+            async with self._requests:
+                started = time.perf_counter()
+                if client.can_paginate(operation):
+                    paginator = client.get_paginator(operation)
+                    pages = [page async for page in paginator.paginate(**params)]
+                else:
+                    pages = [await getattr(client, operation)(**params)]
+        inventory.recorder.record_call(
+            service=service,
+            operation=operation,
+            seconds=time.perf_counter() - started,
+            pages=len(pages),
+            items=sum(map(panoptes.aws.instrumentation.count_page_items, pages)),
+            retries=sum(map(panoptes.aws.instrumentation.count_page_retries, pages)),
+        )
+        inventory.store(service, operation, pages, **params)
+        return pages
+
+
+async def collect_inventories_async(
+        inventories: list,
+        service_concurrency: int = DEFAULT_SERVICE_CONCURRENCY,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        collector: AsyncCollector = None):
+    """
+    Fetches the calls of every inventory concurrently on the running event
+    loop, through a new collector unless one is given
+    """
+    if collector is None:
+        collector = AsyncCollector(service_concurrency=service_concurrency)
+    await asyncio.gather(*[
+        collector.collect(inventory, whitelist_cache=whitelist_cache)
+        for inventory in inventories
+    ])
+
+
+def collect_inventories(
+        inventories: list,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None):
+    """
+    Fetches the calls of every inventory concurrently on the shared event
+    loop, through its collector
+    """
+    run(collect_inventories_async(
+        inventories,
+        whitelist_cache=whitelist_cache,
+        collector=get_collector(),
+    ))
+
+
+async def run_scans_async(
+        scans: list,
+        max_workers: int = panoptes.aws.inventory.DEFAULT_MAX_WORKERS,
+        max_scans: int = DEFAULT_MAX_SCANS,
+        service_concurrency: int = DEFAULT_SERVICE_CONCURRENCY,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        collector: AsyncCollector = None) -> list:
+    """
+    Runs many scans on the running event loop. Every scan is a pair of
+    callables: the first one creates its inventory, the second one analyzes
+    it once collected. Both run on a pool of max_workers threads, since they
+    may block or use the CPU, while at most max_scans inventories are
+    collected or hold their pages at the same time.
+
+    Returns the result of every scan in order, or the exception raising it.
+    Cancelling the coroutine, like on KeyboardInterrupt, cancels every call
+    in flight and closes their clients
+    """
+    loop = asyncio.get_running_loop()
+    if collector is None:
+        collector = AsyncCollector(service_concurrency=service_concurrency)
+    scans_semaphore = asyncio.Semaphore(max_scans)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    async def run_scan(create_inventory: typing.Callable, analyze: typing.Callable):
+        async with scans_semaphore:
+            inventory = await loop.run_in_executor(executor, create_inventory)
+            try:
+                await collector.collect(inventory, whitelist_cache=whitelist_cache)
+                return await loop.run_in_executor(executor, analyze, inventory)
+            finally:
+                inventory.release()
+
+    try:
+        return await asyncio.gather(
+            *[run_scan(create_inventory, analyze) for create_inventory, analyze in scans],
+            return_exceptions=True,
+        )
+    finally:
+        # Never blocks the loop, the scans still running were cancelled
+        executor.shutdown(wait=False)
+
+
+def run_scans(
+        scans: list,
+        max_workers: int = panoptes.aws.inventory.DEFAULT_MAX_WORKERS,
+        max_scans: int = DEFAULT_MAX_SCANS,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None) -> list:
+    """
+    Same as run_scans_async, on the shared event loop and through its
+    collector
+    """
+    return run(run_scans_async(
+        scans,
+        max_workers=max_workers,
+        max_scans=max_scans,
+        whitelist_cache=whitelist_cache,
+        collector=get_collector(),
+    ))
+
+
+_shared_loop = None
+_shared_thread = None
+_shared_collector = None
+_shared_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the event loop shared by the synchronous functions, running
+    forever on a daemon thread started on first use
+    """
+    global _shared_loop, _shared_thread
+    with _shared_lock:
+        if _shared_loop is None:
+            _shared_loop = asyncio.new_event_loop()
+            _shared_thread = threading.Thread(
+                target=_shared_loop.run_forever,
+                name="panoptes-asyncio",
+                daemon=True,
+            )
+            _shared_thread.start()
+        return _shared_loop
+
+
+def get_collector() -> AsyncCollector:
+    """
+    Returns the collector of the shared event loop, so every synchronous
+    caller shares its request bounds
+    """
+    global _shared_collector
+    loop = get_event_loop()
+    with _shared_lock:
+        if _shared_collector is None:
+            async def create_collector() -> AsyncCollector:
+                return AsyncCollector()
+            _shared_collector = asyncio.run_coroutine_threadsafe(
+                create_collector(), loop
+            ).result()
+        return _shared_collector
+
+
+def run(coroutine: typing.Coroutine):
+    """
+    Runs the coroutine on the shared event loop, blocking until it is done.
+    The coroutine is cancelled when the wait is interrupted, like on
+    KeyboardInterrupt
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _shared_thread:
+        raise RuntimeError("Can't wait for the shared event loop from its own thread")
+    future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+if __name__ == "__main__":
+    pass
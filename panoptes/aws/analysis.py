@@ -4,52 +4,102 @@ Responsible to the entire AWS analysis. Here the dynamic whitelist,
 the logic behind unknown ingress rules and unused security groups are created.
 """
 
-import boto3
+import concurrent.futures
+import functools
+import queue
+import threading
+import time
+import typing
 import panoptes
 
 
 CLOUD_PROVIDER = "aws"
+DEFAULT_MAX_WORKERS = 8
+FINDINGS_QUEUE_SIZE = 1000
+PYTHON_ENGINE = "python"
+COLUMNAR_ENGINE = "columnar"
+ENGINES = [
+    PYTHON_ENGINE,
+    COLUMNAR_ENGINE,
+]
+THREADS_COLLECTOR = "threads"
+ASYNCIO_COLLECTOR = "asyncio"
+COLLECTORS = [
+    THREADS_COLLECTOR,
+    ASYNCIO_COLLECTOR,
+]
+UNUSED_FINDING = "UnusedGroup"
+UNSAFE_FINDING = "UnsafeGroup"
+EXPOSED_FINDING = "ExposedGroup"
+ERROR_FINDING = "Error"
+FINDING_SECTIONS = {
+    UNUSED_FINDING: "UnusedGroups",
+    UNSAFE_FINDING: "UnsafeGroups",
+    EXPOSED_FINDING: "ExposedGroups",
+}
 
 
-def generate_unused_secgroup_entry(security_group: dict) -> dict:
+def generate_unused_secgroup_entry(security_group: dict) -> 'panoptes.aws.model.UnusedGroup':
     """
-    Generates a dictionary from an unused security group to the analysis
+    Generates a record from an unused security group to the analysis
     response
     """
-    unused_group = {
-        'GroupName': security_group['GroupName'],
-        'GroupId': security_group['GroupId'],
-        'Description': security_group['Description'],
-        'VpcId': security_group.get('VpcId') or 'no-vpc',
-    }
+    unused_group = panoptes.aws.model.UnusedGroup(
+        GroupName=security_group['GroupName'],
+        GroupId=security_group['GroupId'],
+        Description=security_group['Description'],
+        VpcId=panoptes.aws.model.intern(security_group.get('VpcId') or 'no-vpc'),
+    )
     return unused_group
 
 
-def generate_unsafe_secgroup_entry(security_group: dict, unsafe_ingress_entries: list) -> dict:
+def generate_unsafe_secgroup_entry(
+        security_group: dict,
+        unsafe_ingress_entries: list) -> 'panoptes.aws.model.UnsafeGroup':
     """
-    Generates a dictionary from an unsafe security group, receiving all
+    Generates a record from an unsafe security group, receiving all
     unsafe ingress entries related to this security group to the analysis
     response
     """
-    unsafe_group = {
-        "GroupName": security_group['GroupName'],
-        "GroupId": security_group['GroupId'],
-        "Description": security_group['Description'],
-        "UnsafePorts": unsafe_ingress_entries,
-    }
+    unsafe_group = panoptes.aws.model.UnsafeGroup(
+        GroupName=security_group['GroupName'],
+        GroupId=security_group['GroupId'],
+        Description=security_group['Description'],
+        UnsafePorts=unsafe_ingress_entries,
+    )
     return unsafe_group
 
 
-def generate_unsafe_ingress_entry(ingress_entry: dict, unsafe_ip: str) -> dict:
+def generate_exposed_secgroup_entry(
+        security_group: dict,
+        exposure_path: list) -> 'panoptes.aws.model.ExposedGroup':
     """
-    Generates a dictionary from an unsafe ingress entry to the analysis
+    Generates a record from a security group reachable from the internet
+    through the groups of the exposure path, starting by the internet-open
+    one, to the analysis response
+    """
+    exposed_group = panoptes.aws.model.ExposedGroup(
+        GroupName=security_group['GroupName'],
+        GroupId=security_group['GroupId'],
+        Description=security_group['Description'],
+        ExposedFrom=exposure_path[0],
+        ExposurePath=exposure_path,
+    )
+    return exposed_group
+
+
+def generate_unsafe_ingress_entry(
+        ingress_entry: dict,
+        unsafe_ip: str) -> 'panoptes.aws.model.IngressRule':
+    """
+    Generates a record from an unsafe ingress entry to the analysis
     response
     """
-    unsafe_ingress = {
-        "IpProtocol": ingress_entry["IpProtocol"],
-        "CidrIp": unsafe_ip,
-        "Status": "warning",
-    }
+    unsafe_ingress = panoptes.aws.model.IngressRule(
+        IpProtocol=panoptes.aws.model.intern(ingress_entry["IpProtocol"]),
+        CidrIp=unsafe_ip,
+        Status="warning",
+    )
     if "FromPort" in ingress_entry:
         unsafe_ingress["FromPort"] = ingress_entry["FromPort"]
     if "ToPort" in ingress_entry:
@@ -65,8 +115,7 @@ def analyze_unsafe_ingress(unsafe_ingress: dict) -> dict:
         ALL_TRAFFIC_PROTOCOL = "-1"
         return protocol == ALL_TRAFFIC_PROTOCOL
     def is_anywhere(cidr: str) -> bool:
-        ANYWHERE_CIDR = "0.0.0.0/0"
-        return cidr == ANYWHERE_CIDR
+        return cidr in panoptes.aws.graph.ANYWHERE_CIDRS
 
     if is_all_traffic(unsafe_ingress["IpProtocol"]):
         unsafe_ingress["Status"] = "alert"
@@ -76,7 +125,266 @@ def analyze_unsafe_ingress(unsafe_ingress: dict) -> dict:
     return unsafe_ingress
 
 
-def analyze_security_groups(session: boto3.session.Session, whitelist: list = []) -> dict:
+def evaluate_security_group(
+        security_group: dict,
+        attached: bool,
+        whitelist_index: 'panoptes.generic.network.WhitelistIndex') -> tuple:
+    """
+    Evaluates a single security group, returning its (unused_entry,
+    unsafe_entry) findings, each of them None when not applicable. IPv6
+    ranges are reported in "CidrIp" too, and redundant unsafe ingress entries
+    are collapsed
+    """
+    unused_entry = None
+    unsafe_entry = None
+
+    # Validating if group is unused
+    if not attached:
+        unused_entry = generate_unused_secgroup_entry(
+            security_group=security_group
+        )
+
+    # Validating if group is unsafe
+    unsafe_ingress_entries = []
+    for ingress_entry in security_group['IpPermissions']:
+        allowed_ips = [
+            allowed_ip['CidrIp'] for allowed_ip in ingress_entry['IpRanges']
+        ] + [
+            allowed_ip['CidrIpv6'] for allowed_ip in ingress_entry.get('Ipv6Ranges', [])
+        ]
+        for allowed_ip in allowed_ips:
+            if allowed_ip not in whitelist_index:
+                unsafe_ingress = generate_unsafe_ingress_entry(
+                    ingress_entry=ingress_entry,
+                    unsafe_ip=allowed_ip,
+                )
+                unsafe_ingress = analyze_unsafe_ingress(unsafe_ingress)
+                unsafe_ingress_entries.append(unsafe_ingress)
+
+    if unsafe_ingress_entries:
+        unsafe_entry = generate_unsafe_secgroup_entry(
+            security_group=security_group,
+            unsafe_ingress_entries=panoptes.aws.exposure.merge_unsafe_ingress(
+                unsafe_ingress_entries
+            ),
+        )
+    return unused_entry, unsafe_entry
+
+
+def iter_findings(
+        session: 'boto3.session.Session',
+        whitelist: typing.Optional[list] = None,
+        region: str = None,
+        inventory: 'panoptes.aws.inventory.Inventory' = None,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        collector: str = THREADS_COLLECTOR,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None,
+        release_inventory: bool = False) -> typing.Iterator[dict]:
+    """
+    Yields every finding as soon as its security group is evaluated, without
+    building the whole analysis in memory. Parameters are the same as
+    analyze_security_groups. The raw responses of the inventory are dropped
+    once the security groups are parsed when it is built here, or when
+    release_inventory is set
+
+    Security groups referenced by the rules of other groups are in use.
+    Groups reachable from the internet through references are yielded once
+    every group is evaluated.
+
+    DesiredYield:
+        {
+            "Type": str["UnusedGroup", "UnsafeGroup" or "ExposedGroup"],
+            "Region": str,
+            "SecurityGroup": dict[Same as the UnusedGroups, UnsafeGroups or
+                ExposedGroups entries],
+        }
+    """
+    if inventory is None:
+        inventory = panoptes.aws.inventory.Inventory(
+            session,
+            region=region,
+            recorder=panoptes.aws.instrumentation.Recorder(parent=recorder),
+            scope=scope,
+        )
+        release_inventory = True
+    # Snapshots already hold every call, there is nothing to collect
+    if (collector == ASYNCIO_COLLECTOR
+            and not isinstance(inventory, panoptes.aws.snapshot.SnapshotInventory)):
+        panoptes.aws.aio.collect_inventories([inventory], whitelist_cache=whitelist_cache)
+    with inventory.recorder.phase('Whitelist'):
+        if isinstance(whitelist, panoptes.generic.network.WhitelistIndex):
+            # Already parsed by the caller, the safe IPs go to a copy of it
+            whitelist_index = whitelist.copy()
+        else:
+            whitelist_index = panoptes.generic.network.WhitelistIndex(whitelist or [])
+        whitelist_index.update(
+            panoptes.aws.whitelist.list_all_safe_ips(
+                session,
+                inventory=inventory,
+                whitelist_cache=whitelist_cache,
+            )
+        )
+        whitelist_digest = whitelist_index.digest() if state is not None else None
+    with inventory.recorder.phase('Attachment'):
+        all_attached_groups = panoptes.aws.attached.list_all_attached_secgroups(
+            session,
+            inventory=inventory,
+        )
+    all_security_groups = [
+        panoptes.aws.model.parse_security_group(security_group)
+        for security_group in panoptes.aws.scope.list_security_groups(inventory)
+    ]
+
+    def is_attached(security_group: dict) -> bool:
+        return (
+            security_group['GroupName'] in all_attached_groups or
+            security_group['GroupId'] in all_attached_groups
+        )
+
+    with inventory.recorder.phase('Graph'):
+        security_group_graph = panoptes.aws.graph.SecurityGroupGraph(all_security_groups)
+        for referencing_group in panoptes.aws.scope.list_referencing_security_groups(inventory):
+            security_group_graph.add_references(referencing_group)
+        exposure_paths = security_group_graph.compute_exposure(
+            lambda group_id: is_attached(security_group_graph.security_groups[group_id])
+        )
+    if release_inventory:
+        inventory.release()
+
+    def is_in_use(security_group: dict) -> bool:
+        return (
+            is_attached(security_group) or
+            security_group_graph.is_referenced(security_group['GroupId'])
+        )
+
+    evaluation_seconds = 0.0
+    try:
+        group_findings = iter_group_findings(
+            security_groups=all_security_groups,
+            is_in_use=is_in_use,
+            whitelist_index=whitelist_index,
+            state=state,
+            whitelist_digest=whitelist_digest,
+            engine=engine,
+        )
+        while True:
+            evaluation_started = time.perf_counter()
+            findings = next(group_findings, None)
+            evaluation_seconds += time.perf_counter() - evaluation_started
+            if findings is None:
+                break
+            unused_entry, unsafe_entry = findings
+            if unused_entry:
+                yield generate_finding(UNUSED_FINDING, inventory.region, unused_entry)
+            if unsafe_entry:
+                yield generate_finding(UNSAFE_FINDING, inventory.region, unsafe_entry)
+    finally:
+        inventory.recorder.record_phase('Evaluation', evaluation_seconds)
+
+    for group_id, exposure_path in exposure_paths.items():
+        yield generate_finding(
+            EXPOSED_FINDING,
+            inventory.region,
+            generate_exposed_secgroup_entry(
+                security_group=security_group_graph.security_groups[group_id],
+                exposure_path=exposure_path,
+            ),
+        )
+
+
+def iter_group_findings(
+        security_groups: list,
+        is_in_use: typing.Callable[[dict], bool],
+        whitelist_index: 'panoptes.generic.network.WhitelistIndex',
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        whitelist_digest: str = None,
+        engine: str = PYTHON_ENGINE) -> typing.Iterator[tuple]:
+    """
+    Yields the (unused_entry, unsafe_entry) findings of every security group
+    in order, reusing the ones of the state when the group didn't change.
+    The python engine evaluates one group at a time, while the columnar
+    engine evaluates every changed group in a single batch first
+    """
+    def get_cached_findings(security_group: dict, attached: bool) -> tuple:
+        if state is None:
+            return None, None
+        group_hash = panoptes.aws.state.generate_group_hash(
+            security_group=security_group,
+            attached=attached,
+            whitelist_digest=whitelist_digest,
+        )
+        return group_hash, state.get(security_group['GroupId'], group_hash)
+
+    if engine != COLUMNAR_ENGINE:
+        for security_group in security_groups:
+            attached = is_in_use(security_group)
+            group_hash, findings = get_cached_findings(security_group, attached)
+            if findings is None:
+                findings = evaluate_security_group(
+                    security_group=security_group,
+                    attached=attached,
+                    whitelist_index=whitelist_index,
+                )
+                if state is not None:
+                    state.put(security_group['GroupId'], group_hash, *findings)
+            yield findings
+        return
+
+    group_hashes = []
+    all_findings = []
+    changed_groups = []
+    for group_position, security_group in enumerate(security_groups):
+        attached = is_in_use(security_group)
+        group_hash, findings = get_cached_findings(security_group, attached)
+        group_hashes.append(group_hash)
+        all_findings.append(findings)
+        if findings is None:
+            changed_groups.append((group_position, attached))
+
+    evaluated_findings = panoptes.aws.columnar.evaluate_security_groups(
+        security_groups=[security_groups[position] for position, _ in changed_groups],
+        attached=[attached for _, attached in changed_groups],
+        whitelist_index=whitelist_index,
+    )
+    for (group_position, _), findings in zip(changed_groups, evaluated_findings):
+        all_findings[group_position] = findings
+        if state is not None:
+            state.put(
+                security_groups[group_position]['GroupId'],
+                group_hashes[group_position],
+                *findings
+            )
+    yield from all_findings
+
+
+def generate_finding(
+        finding_type: str,
+        region: str,
+        security_group_entry: 'panoptes.aws.model.Record') -> 'panoptes.aws.model.Finding':
+    """
+    Generates a finding from an analysis entry to the findings stream
+    """
+    return panoptes.aws.model.Finding(
+        Type=finding_type,
+        Region=region,
+        SecurityGroup=security_group_entry,
+    )
+
+
+def analyze_security_groups(
+        session: 'boto3.session.Session',
+        whitelist: typing.Optional[list] = None,
+        region: str = None,
+        inventory: 'panoptes.aws.inventory.Inventory' = None,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        collector: str = THREADS_COLLECTOR,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None) -> dict:
     """
     The main analysis function
 
@@ -87,7 +395,52 @@ def analyze_security_groups(session: boto3.session.Session, whitelist: list = []
 
         - whitelist:
             Type: list
-            Description: List of whitelisted CIDR from optional input file
+            Description: List of whitelisted CIDR from optional input file.
+                Any ingress range contained in a whitelisted CIDR is safe.
+                A panoptes.generic.network.WhitelistIndex is used as it is,
+                without parsing the whitelist again
+
+        - region:
+            Type: str
+            Description: Region to analyze, defaults to the session region
+
+        - inventory:
+            Type: panoptes.aws.inventory.Inventory
+            Description: Inventory serving the AWS calls, like a replayed
+                snapshot. Built from the session when omitted
+
+        - state:
+            Type: panoptes.aws.state.AnalysisState
+            Description: Incremental state from a previous run. Groups whose
+                content hash didn't change reuse their cached findings
+
+        - recorder:
+            Type: panoptes.aws.instrumentation.Recorder
+            Description: Parent recorder aggregating the timings of the
+                whole run, like several regions
+
+        - engine:
+            Type: str
+            Description: "python" evaluates the groups one at a time, while
+                "columnar" evaluates them in batched array operations,
+                requiring numpy. Both return the same findings
+
+        - collector:
+            Type: str
+            Description: "threads" fetches the AWS calls on thread pools,
+                while "asyncio" fetches them as coroutines on an event loop
+                through panoptes.aws.aio, requiring aiobotocore
+
+        - whitelist_cache:
+            Type: panoptes.aws.cache.WhitelistCache
+            Description: Cache of the dynamic whitelist. Sources whose ranges
+                are cached aren't listed again until they expire
+
+        - scope:
+            Type: panoptes.aws.scope.Scope
+            Description: VPCs, group IDs and tags the analysis is limited
+                to, pushed down to AWS as EC2 filters. Ignored when an
+                inventory is given
 
     DesiredReturn:
         {
@@ -98,6 +451,7 @@ def analyze_security_groups(session: boto3.session.Session, whitelist: list = []
                     "Name": str,
                     "Auth": str,
                 },
+                "Timings": dict[Same as panoptes.aws.instrumentation.Recorder.to_dict],
             },
             "SecurityGroups": {
                 "UnusedGroups": [
@@ -124,6 +478,16 @@ def analyze_security_groups(session: boto3.session.Session, whitelist: list = []
                         ]
                     },
                 ],
+                "ExposedGroups": [
+                    {
+                        "GroupName": str,
+                        "GroupId": str,
+                        "Description": str,
+                        "ExposedFrom": str[Internet-open GroupId],
+                        "ExposurePath": list[GroupIds from ExposedFrom to the
+                            group granting access],
+                    },
+                ],
             },
         }
     """
@@ -131,6 +495,7 @@ def analyze_security_groups(session: boto3.session.Session, whitelist: list = []
         'SecurityGroups': {
             'UnusedGroups': [],
             'UnsafeGroups': [],
+            'ExposedGroups': [],
         },
         'Metadata': {
             'StartedAt': '',
@@ -143,49 +508,540 @@ def analyze_security_groups(session: boto3.session.Session, whitelist: list = []
     }
     response['Metadata']['StartedAt'] = panoptes.generic.helpers.get_current_time()
 
-    whitelist += panoptes.aws.whitelist.list_all_safe_ips(session)
-    all_security_groups = session.client('ec2').describe_security_groups()['SecurityGroups']
-    all_attached_groups = panoptes.aws.attached.list_all_attached_secgroups(session)
-
-    for security_group in all_security_groups:
-        # Validating if group is unused
-        if (
-                security_group['GroupName'] not in all_attached_groups and
-                security_group['GroupId'] not in all_attached_groups
-        ):
-            response['SecurityGroups']['UnusedGroups'].append(
-                generate_unused_secgroup_entry(
-                    security_group=security_group
-                )
+    release_inventory = inventory is None
+    if inventory is None:
+        inventory = panoptes.aws.inventory.Inventory(
+            session,
+            region=region,
+            recorder=panoptes.aws.instrumentation.Recorder(parent=recorder),
+            scope=scope,
+        )
+
+    # Read before the inventory releases its pages
+    response['Metadata']['CloudProvider']['Auth'] = (
+        inventory.pages('sts', 'get_caller_identity')[0]['Arn']
+    )
+    findings = iter_findings(
+        session=session,
+        whitelist=whitelist,
+        region=region,
+        inventory=inventory,
+        state=state,
+        engine=engine,
+        collector=collector,
+        whitelist_cache=whitelist_cache,
+        scope=scope,
+        release_inventory=release_inventory,
+    )
+    for finding in findings:
+        response['SecurityGroups'][FINDING_SECTIONS[finding['Type']]].append(
+            finding['SecurityGroup']
+        )
+
+    response['Metadata']['FinishedAt'] = panoptes.generic.helpers.get_current_time()
+    response['Metadata']['CloudProvider']['Name'] = CLOUD_PROVIDER
+    response['Metadata']['Timings'] = inventory.recorder.to_dict()
+    return response
+
+
+def analyze_regions(
+        session: 'boto3.session.Session',
+        regions: list,
+        whitelist: typing.Optional[list] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        collector: str = THREADS_COLLECTOR,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None,
+        inventories: dict = None) -> dict:
+    """
+    Analyzes several regions concurrently on a bounded worker pool sharing
+    the same session credentials, merging them into a single report.
+    Regions which could not be analyzed, like opt-in regions without access,
+    are reported under "Errors" without stopping the others. Inventories
+    given by region, like the warm ones of a long-running process, are used
+    instead of new ones.
+
+    DesiredReturn:
+        {
+            "Metadata": {
+                "StartedAt": str[ISO 8601 Date],
+                "FinishedAt": str[ISO 8601 Date],
+                "CloudProvider": {
+                    "Name": str,
+                    "Auth": str,
+                },
+                "Regions": {
+                    str[Region]: {
+                        "StartedAt": str[ISO 8601 Date],
+                        "FinishedAt": str[ISO 8601 Date],
+                        "ElapsedSeconds": float,
+                        "Timings": dict[Same as analyze_security_groups],
+                    },
+                },
+                "Errors": {
+                    str[Region]: str,
+                },
+            },
+            "Regions": {
+                str[Region]: {
+                    "SecurityGroups": dict[Same as analyze_security_groups],
+                },
+            },
+        }
+    """
+    response = generate_regions_report()
+    response['Metadata']['StartedAt'] = panoptes.generic.helpers.get_current_time()
+
+    inventories = inventories or {}
+    if collector == ASYNCIO_COLLECTOR:
+        scans = [
+            generate_region_scan(
+                lambda: session, region, whitelist, state, recorder, engine,
+                whitelist_cache, scope, inventories.get(region),
             )
+            for region in regions
+        ]
+        region_analyses = panoptes.aws.aio.run_scans(
+            scans,
+            max_workers=max_workers,
+            whitelist_cache=whitelist_cache,
+        )
+        for region, region_analysis in zip(regions, region_analyses):
+            if isinstance(region_analysis, Exception):
+                response['Metadata']['Errors'][region] = str(region_analysis)
+                continue
+            add_region_analysis(response, *region_analysis)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running_workers = {
+                executor.submit(
+                    analyze_region_timed, session, region, whitelist, state, recorder,
+                    inventories.get(region),
+                    engine=engine,
+                    whitelist_cache=whitelist_cache,
+                    scope=scope,
+                ): region
+                for region in regions
+            }
+            for future in concurrent.futures.as_completed(running_workers):
+                try:
+                    add_region_analysis(response, *future.result())
+                except Exception as error:
+                    response['Metadata']['Errors'][running_workers[future]] = str(error)
 
-        # Validating if group is unsafe
-        unsafe_ingress_entries = []
-        for ingress_entry in security_group['IpPermissions']:
-            for allowed_ip in ingress_entry['IpRanges']:
-                if allowed_ip['CidrIp'] not in whitelist:
-                    unsafe_ingress = generate_unsafe_ingress_entry(
-                        ingress_entry=ingress_entry,
-                        unsafe_ip=allowed_ip['CidrIp'],
-                    )
-                    unsafe_ingress = analyze_unsafe_ingress(unsafe_ingress)
-                    unsafe_ingress_entries.append(unsafe_ingress)
-
-        if unsafe_ingress_entries:
-            response['SecurityGroups']['UnsafeGroups'].append(
-                generate_unsafe_secgroup_entry(
-                    security_group=security_group,
-                    unsafe_ingress_entries=unsafe_ingress_entries,
+    sort_regions_report(response)
+    response['Metadata']['FinishedAt'] = panoptes.generic.helpers.get_current_time()
+    return response
+
+
+def analyze_accounts(
+        session_pool: 'panoptes.aws.authentication.SessionPool',
+        accounts: list,
+        regions: list,
+        whitelist: typing.Optional[list] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        collector: str = THREADS_COLLECTOR,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None) -> dict:
+    """
+    Analyzes every region of every account assuming a role into each of
+    them. All account and region pairs share one worker pool, so
+    max_workers is a global concurrency cap. Regions which could not be
+    analyzed are reported under "Errors" by account and region without
+    stopping the others, and accounts whose role could not be assumed are
+    left out of "Accounts".
+
+    DesiredReturn:
+        {
+            "Metadata": {
+                "StartedAt": str[ISO 8601 Date],
+                "FinishedAt": str[ISO 8601 Date],
+                "CloudProvider": {
+                    "Name": str,
+                    "Auth": str,
+                },
+                "Errors": {
+                    str[AccountId]: {
+                        str[Region]: str,
+                    },
+                },
+            },
+            "Accounts": {
+                str[AccountId]: dict[Same as analyze_regions],
+            },
+        }
+    """
+    response = {
+        'Accounts': {},
+        'Metadata': {
+            'StartedAt': '',
+            'FinishedAt': '',
+            'CloudProvider': {
+                'Name': CLOUD_PROVIDER,
+                'Auth': session_pool.get_base_identity(),
+            },
+            'Errors': {},
+        },
+    }
+    response['Metadata']['StartedAt'] = panoptes.generic.helpers.get_current_time()
+
+    def add_error(account: str, region: str, error: Exception):
+        response['Metadata']['Errors'].setdefault(account, {})[region] = str(error)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running_workers = {
+            executor.submit(session_pool.assume, account): account
+            for account in accounts
+        }
+        for future in concurrent.futures.as_completed(running_workers):
+            account = running_workers[future]
+            try:
+                future.result()
+                response['Accounts'][account] = generate_regions_report()
+            except Exception as error:
+                for region in regions:
+                    add_error(account, region, error)
+    assumed_accounts = [account for account in accounts if account in response['Accounts']]
+
+    def analyze_account_region(account: str, region: str) -> tuple:
+        session = session_pool.get(account)
+        return analyze_region_timed(
+            session, region, whitelist, state, recorder,
+            engine=engine,
+            whitelist_cache=whitelist_cache,
+            scope=scope,
+        )
+
+    def iter_account_analyses() -> typing.Iterator[tuple]:
+        # Yields (account, region, region analysis or the exception raising it)
+        account_regions = [
+            (account, region) for account in assumed_accounts for region in regions
+        ]
+        if collector == ASYNCIO_COLLECTOR:
+            scans = [
+                generate_region_scan(
+                    functools.partial(session_pool.get, account),
+                    region, whitelist, state, recorder, engine, whitelist_cache, scope,
                 )
+                for account, region in account_regions
+            ]
+            region_analyses = panoptes.aws.aio.run_scans(
+                scans,
+                max_workers=max_workers,
+                whitelist_cache=whitelist_cache,
             )
+            for (account, region), region_analysis in zip(account_regions, region_analyses):
+                yield account, region, region_analysis
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running_workers = {
+                executor.submit(analyze_account_region, account, region): (account, region)
+                for account, region in account_regions
+            }
+            for future in concurrent.futures.as_completed(running_workers):
+                try:
+                    yield (*running_workers[future], future.result())
+                except Exception as error:
+                    yield (*running_workers[future], error)
+
+    for account, region, region_analysis in iter_account_analyses():
+        account_report = response['Accounts'][account]
+        if isinstance(region_analysis, Exception):
+            account_report['Metadata']['Errors'][region] = str(region_analysis)
+            add_error(account, region, region_analysis)
+            continue
+        add_region_analysis(account_report, *region_analysis)
 
+    for account_report in response['Accounts'].values():
+        sort_regions_report(account_report)
+    response['Accounts'] = dict(sorted(response['Accounts'].items()))
+    response['Metadata']['Errors'] = {
+        account: dict(sorted(errors.items()))
+        for account, errors in sorted(response['Metadata']['Errors'].items())
+    }
     response['Metadata']['FinishedAt'] = panoptes.generic.helpers.get_current_time()
-    response['Metadata']['CloudProvider']['Name'] = CLOUD_PROVIDER
-    response['Metadata']['CloudProvider']['Auth'] = (
-        panoptes.aws.authentication.get_session_info(session)
-    )
     return response
 
 
+def iter_regions_findings(
+        session: 'boto3.session.Session',
+        regions: list,
+        whitelist: typing.Optional[list] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        collector: str = THREADS_COLLECTOR,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None) -> typing.Iterator[dict]:
+    """
+    Streaming version of analyze_regions, yielding the findings of every
+    region as soon as they are computed. Regions which could not be analyzed
+    yield an "Error" finding with a "Message" instead of stopping the others
+    """
+    def generate_stream(region: str):
+        def stream():
+            try:
+                yield from iter_findings(
+                    session=session,
+                    whitelist=whitelist,
+                    region=region,
+                    state=state,
+                    recorder=recorder,
+                    engine=engine,
+                    collector=collector,
+                    whitelist_cache=whitelist_cache,
+                    scope=scope,
+                )
+            except Exception as error:
+                yield {
+                    'Type': ERROR_FINDING,
+                    'Region': region,
+                    'Message': str(error),
+                }
+        return stream
+
+    yield from iter_concurrent_findings(
+        streams=[generate_stream(region) for region in regions],
+        max_workers=max_workers,
+    )
+
+
+def iter_accounts_findings(
+        session_pool: 'panoptes.aws.authentication.SessionPool',
+        accounts: list,
+        regions: list,
+        whitelist: typing.Optional[list] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        collector: str = THREADS_COLLECTOR,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None) -> typing.Iterator[dict]:
+    """
+    Streaming version of analyze_accounts. Every finding carries its
+    "Account", and account and region pairs which could not be analyzed
+    yield an "Error" finding with a "Message" instead of stopping the others
+    """
+    def generate_stream(account: str, region: str):
+        def stream():
+            try:
+                session = session_pool.get(account)
+                for finding in iter_findings(
+                        session=session,
+                        whitelist=whitelist,
+                        region=region,
+                        state=state,
+                        recorder=recorder,
+                        engine=engine,
+                        collector=collector,
+                        whitelist_cache=whitelist_cache,
+                        scope=scope,
+                ):
+                    finding['Account'] = account
+                    yield finding
+            except Exception as error:
+                yield {
+                    'Type': ERROR_FINDING,
+                    'Region': region,
+                    'Account': account,
+                    'Message': str(error),
+                }
+        return stream
+
+    yield from iter_concurrent_findings(
+        streams=[
+            generate_stream(account, region)
+            for account in accounts
+            for region in regions
+        ],
+        max_workers=max_workers,
+    )
+
+
+def iter_concurrent_findings(
+        streams: list,
+        max_workers: int = DEFAULT_MAX_WORKERS) -> typing.Iterator[dict]:
+    """
+    Drains several findings streams on a bounded worker pool, yielding their
+    findings through a bounded queue as they arrive. Streams are callables
+    returning findings iterators. Closing the generator stops the workers.
+    """
+    findings_queue = queue.Queue(maxsize=FINDINGS_QUEUE_SIZE)
+    stopped = threading.Event()
+    stream_finished = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                findings_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(stream):
+        try:
+            if stopped.is_set():
+                return
+            for finding in stream():
+                if not put(finding):
+                    return
+        finally:
+            put(stream_finished)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running_workers = [executor.submit(drain, stream) for stream in streams]
+        try:
+            remaining_streams = len(running_workers)
+            while remaining_streams:
+                item = findings_queue.get()
+                if item is stream_finished:
+                    remaining_streams -= 1
+                    continue
+                yield item
+        finally:
+            stopped.set()
+
+    for future in running_workers:
+        future.result()
+
+
+def analyze_region_timed(
+        session: 'boto3.session.Session',
+        region: str,
+        whitelist: typing.Optional[list] = None,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        inventory: 'panoptes.aws.inventory.Inventory' = None,
+        engine: str = PYTHON_ENGINE,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None) -> tuple:
+    """
+    Runs the analysis of a single region, returning the region, its analysis
+    and the elapsed seconds
+    """
+    started = time.monotonic()
+    analysis = analyze_security_groups(
+        session=session,
+        whitelist=whitelist,
+        region=region,
+        inventory=inventory,
+        state=state,
+        recorder=recorder,
+        engine=engine,
+        whitelist_cache=whitelist_cache,
+        scope=scope,
+    )
+    return region, analysis, time.monotonic() - started
+
+
+def generate_region_scan(
+        get_session: typing.Callable,
+        region: str,
+        whitelist: typing.Optional[list] = None,
+        state: 'panoptes.aws.state.AnalysisState' = None,
+        recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+        engine: str = PYTHON_ENGINE,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+        scope: 'panoptes.aws.scope.Scope' = None,
+        inventory: 'panoptes.aws.inventory.Inventory' = None) -> tuple:
+    """
+    Generates the (create_inventory, analyze) callables of a region scan run
+    by panoptes.aws.aio.run_scans. The scan returns the same as
+    analyze_region_timed, its elapsed seconds including the collection.
+    The inventory, when given, is collected instead of a new one
+    """
+    started = []
+
+    def create_inventory() -> 'panoptes.aws.inventory.Inventory':
+        started.append(time.monotonic())
+        if inventory is not None:
+            return inventory
+        return panoptes.aws.inventory.Inventory(
+            get_session(),
+            region=region,
+            recorder=panoptes.aws.instrumentation.Recorder(parent=recorder),
+            scope=scope,
+        )
+
+    def analyze(inventory: 'panoptes.aws.inventory.Inventory') -> tuple:
+        analysis = analyze_security_groups(
+            session=inventory.session,
+            whitelist=whitelist,
+            region=region,
+            inventory=inventory,
+            state=state,
+            engine=engine,
+            whitelist_cache=whitelist_cache,
+            scope=scope,
+        )
+        return region, analysis, time.monotonic() - started[0]
+
+    return create_inventory, analyze
+
+
+def generate_regions_report() -> dict:
+    """
+    Generates an empty multi-region report
+    """
+    return {
+        'Regions': {},
+        'Metadata': {
+            'StartedAt': '',
+            'FinishedAt': '',
+            'CloudProvider': {
+                'Name': CLOUD_PROVIDER,
+                'Auth': '',
+            },
+            'Regions': {},
+            'Errors': {},
+        },
+    }
+
+
+def add_region_analysis(report: dict, region: str, analysis: dict, elapsed: float) -> dict:
+    """
+    Merges a single region analysis into a multi-region report
+    """
+    report['Regions'][region] = {
+        'SecurityGroups': analysis['SecurityGroups'],
+    }
+    report['Metadata']['Regions'][region] = {
+        'StartedAt': analysis['Metadata']['StartedAt'],
+        'FinishedAt': analysis['Metadata']['FinishedAt'],
+        'ElapsedSeconds': round(elapsed, 3),
+        'Timings': analysis['Metadata']['Timings'],
+    }
+    report['Metadata']['CloudProvider']['Auth'] = (
+        analysis['Metadata']['CloudProvider']['Auth']
+    )
+    if not report['Metadata']['StartedAt'] or (
+            analysis['Metadata']['StartedAt'] < report['Metadata']['StartedAt']
+    ):
+        report['Metadata']['StartedAt'] = analysis['Metadata']['StartedAt']
+    if analysis['Metadata']['FinishedAt'] > report['Metadata']['FinishedAt']:
+        report['Metadata']['FinishedAt'] = analysis['Metadata']['FinishedAt']
+    return report
+
+
+def sort_regions_report(report: dict) -> dict:
+    """
+    Sorts the regions of a multi-region report by name
+    """
+    report['Regions'] = dict(sorted(report['Regions'].items()))
+    report['Metadata']['Regions'] = dict(sorted(report['Metadata']['Regions'].items()))
+    report['Metadata']['Errors'] = dict(sorted(report['Metadata']['Errors'].items()))
+    return report
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,105 @@
+""" Panoptes - AWS - Analyzer
+
+Reusable analysis for long-lived processes embedding Panoptes. The session,
+Boto3 clients, parsed whitelist and cached findings are kept between calls
+instead of being built again on every analysis.
+"""
+
+import threading
+import typing
+import panoptes
+
+
+class Analyzer:
+    """
+    Analyzes the regions of a session as many times as needed. The whitelist
+    is parsed once, and every region keeps its inventory, whose clients stay
+    warm, and its incremental state, so groups which didn't change since the
+    previous analysis reuse their findings. Raw responses are dropped after
+    every analysis, and the state only keeps the groups of the latest one.
+    Every analysis is limited to the scope, when given.
+
+    Safe to share between threads: analyses of different regions run
+    concurrently, while analyses of the same region wait for each other.
+    """
+
+    def __init__(
+            self,
+            session: 'boto3.session.Session',
+            whitelist: typing.Iterable[str] = (),
+            engine: str = None,
+            whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+            scope: 'panoptes.aws.scope.Scope' = None):
+        self.session = session
+        self.whitelist_index = panoptes.generic.network.WhitelistIndex(whitelist)
+        self.engine = engine or panoptes.aws.analysis.PYTHON_ENGINE
+        self.whitelist_cache = whitelist_cache
+        self.scope = scope
+        self._inventories = {}
+        self._states = {}
+        self._region_locks = {}
+        self._lock = threading.Lock()
+
+    def analyze(self, region: str = None) -> dict:
+        """
+        Runs the analysis of the region, the session region when omitted
+
+        DesiredReturn:
+            dict[Same as panoptes.aws.analysis.analyze_security_groups]
+        """
+        region = region or self.session.region_name
+        with self._lock:
+            if region not in self._inventories:
+                self._inventories[region] = panoptes.aws.inventory.Inventory(
+                    self.session,
+                    region=region,
+                    scope=self.scope,
+                )
+                self._states[region] = panoptes.aws.state.AnalysisState()
+                self._region_locks[region] = threading.Lock()
+            inventory = self._inventories[region]
+            region_lock = self._region_locks[region]
+
+        with region_lock:
+            with self._lock:
+                state = self._states[region]
+                whitelist_index = self.whitelist_index
+            inventory.refresh()
+            state.rotate()
+            try:
+                return panoptes.aws.analysis.analyze_security_groups(
+                    session=self.session,
+                    whitelist=whitelist_index,
+                    region=region,
+                    inventory=inventory,
+                    state=state,
+                    engine=self.engine,
+                    whitelist_cache=self.whitelist_cache,
+                )
+            finally:
+                inventory.release()
+
+    def set_whitelist(self, whitelist: typing.Iterable[str]):
+        """
+        Replaces the whitelist used by the next analyses. Cached findings are
+        evaluated again, since the whitelist digest is part of their hash
+        """
+        whitelist_index = panoptes.generic.network.WhitelistIndex(whitelist)
+        with self._lock:
+            self.whitelist_index = whitelist_index
+
+    def invalidate(self, region: str = None):
+        """
+        Drops the cached findings of the region, or of every region when
+        omitted, so the next analysis evaluates every group again. Clients
+        are kept
+        """
+        with self._lock:
+            regions = [region] if region is not None else list(self._states)
+            for cached_region in regions:
+                if cached_region in self._states:
+                    self._states[cached_region] = panoptes.aws.state.AnalysisState()
+
+
+if __name__ == "__main__":
+    pass
@@ -2,204 +2,184 @@
 
 Functions responsible for listing and grouping all attached security
 groups within AWS resources.
+
+Every collector is a generator walking the pages of its resource from the
+shared inventory, yielding group identifiers page by page. Pages are
+streamed from AWS, except the ones of describe_instances, which are shared
+with the whitelist.
 """
 
 import concurrent.futures
-import boto3
+import typing
 import panoptes
 
 
-def list_all_attached_secgroups(session: boto3.session.Session) -> list:
+ECS_SERVICE_API_LIMIT = 10
+
+
+def list_all_attached_secgroups(
+        session: 'boto3.session.Session',
+        inventory: 'panoptes.aws.inventory.Inventory' = None) -> set:
     """
     Lists and groups all attached security groups within AWS resources
     """
-    all_attached_groups = []
-    boto_clients = panoptes.aws.authentication.get_boto_clients(session)
+    all_attached_groups = set()
+    if inventory is None:
+        inventory = panoptes.aws.inventory.Inventory(session)
 
     services_with_security_groups = [
-        (list_ec2_attached_secgroups, boto_clients['ec2']),
-        (list_eni_attached_secgroups, boto_clients['ec2']),
-        (list_rds_attached_secgroups, boto_clients['rds']),
-        (list_elb_attached_secgroups, boto_clients['elb']),
-        (list_elbv2_attached_secgroups, boto_clients['elbv2']),
-        (list_lambda_attached_secgroups, boto_clients['lambda']),
-        (list_elasticache_attached_secgroups, boto_clients['elasticache']),
-        (list_ecs_attached_secgroups, boto_clients['ecs']),
+        list_ec2_attached_secgroups,
+        list_eni_attached_secgroups,
+        list_rds_attached_secgroups,
+        list_elb_attached_secgroups,
+        list_elbv2_attached_secgroups,
+        list_lambda_attached_secgroups,
+        list_elasticache_attached_secgroups,
+        list_ecs_attached_secgroups,
     ]
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    def consume(list_attached_function) -> set:
+        return set(list_attached_function(inventory))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=inventory.max_workers) as executor:
         running_workers = []
         for list_attached_function in services_with_security_groups:
-            running_workers.append(executor.submit(*list_attached_function))
+            running_workers.append(
+                executor.submit(consume, list_attached_function)
+            )
 
         for future in concurrent.futures.as_completed(running_workers):
-            all_attached_groups += future.result()
+            all_attached_groups.update(future.result())
     return all_attached_groups
 
 
-def list_ec2_attached_secgroups(ec2) -> list:
+def list_ec2_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
-    List security groups attached to EC2 instances
+    List security groups attached to EC2 instances. Every instance of the
+    region is listed, even for scoped inventories, as the same pages build
+    the whitelist
     """
-    ec2_attached_groups = []
-    boto_ec2_instances = ec2.describe_instances()
-    for instance_obj in boto_ec2_instances['Reservations']:
-        for instance in instance_obj['Instances']:
-            for security_group in instance['SecurityGroups']:
-                ec2_attached_groups.append(
-                    security_group['GroupId']
-                )
-    return ec2_attached_groups
+    for page in inventory.pages('ec2', 'describe_instances'):
+        for instance_obj in page['Reservations']:
+            for instance in instance_obj['Instances']:
+                for security_group in instance['SecurityGroups']:
+                    yield security_group['GroupId']
 
 
-def list_eni_attached_secgroups(ec2) -> list:
+def list_eni_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
     List security groups attached to Elastic Network Interfaces
     """
-    network_interfaces = []
-    next_token = None
-    has_next = True
-    while has_next:
-        args = {'MaxResults': 1000}
-        if next_token is not None:
-            args['NextToken'] = next_token
-
-        network_interfaces_result = ec2.describe_network_interfaces(**args)
-
-        network_interfaces += network_interfaces_result['NetworkInterfaces']
-
-        next_token = network_interfaces_result.get('NextToken')
-        has_next = next_token is not None
-
-    eni_attached_groups = [security_group['GroupId']
-                           for network_interface in network_interfaces
-                           for security_group in network_interface['Groups']]
+    scoped_params = panoptes.aws.scope.generate_scoped_params(
+        inventory, 'group-id',
+        PaginationConfig={'PageSize': 1000},
+    )
+    for params in scoped_params:
+        for page in inventory.iter_pages('ec2', 'describe_network_interfaces', **params):
+            for network_interface in page['NetworkInterfaces']:
+                for security_group in network_interface['Groups']:
+                    yield security_group['GroupId']
 
-    return eni_attached_groups
 
-
-def list_rds_attached_secgroups(rds) -> list:
+def list_rds_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
     List security groups attached to RDS instances
     """
-    rds_attached_groups = []
-    boto_rds_instances = rds.describe_db_instances()
-    for db_instance_obj in boto_rds_instances['DBInstances']:
-        for security_group in db_instance_obj['VpcSecurityGroups']:
-            rds_attached_groups.append(
-                security_group['VpcSecurityGroupId']
-            )
-    return rds_attached_groups
+    for page in inventory.iter_pages('rds', 'describe_db_instances'):
+        for db_instance_obj in page['DBInstances']:
+            for security_group in db_instance_obj['VpcSecurityGroups']:
+                yield security_group['VpcSecurityGroupId']
 
 
-def list_elb_attached_secgroups(elb) -> list:
+def list_elb_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
     List security groups attached to Elastic Load Balancers
     """
-    elb_attached_groups = []
-    boto_load_balancers = elb.describe_load_balancers()
-    for elb_obj in boto_load_balancers['LoadBalancerDescriptions']:
-        for security_group in elb_obj['SecurityGroups']:
-            elb_attached_groups.append(
-                security_group
-            )
-    return elb_attached_groups
+    for page in inventory.iter_pages('elb', 'describe_load_balancers'):
+        for elb_obj in page['LoadBalancerDescriptions']:
+            yield from elb_obj['SecurityGroups']
 
 
-def list_elbv2_attached_secgroups(elbv2) -> list:
+def list_elbv2_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
     List security groups attached to Elastic Load Balancers V2
     """
-    elbv2_attached_groups = []
-    boto_load_balancers = elbv2.describe_load_balancers()
-    for elbv2_obj in boto_load_balancers['LoadBalancers']:
-        if 'SecurityGroups' in elbv2_obj:
-            for security_group in elbv2_obj['SecurityGroups']:
-                elbv2_attached_groups.append(
-                    security_group
-                )
-    return elbv2_attached_groups
+    for page in inventory.iter_pages('elbv2', 'describe_load_balancers'):
+        for elbv2_obj in page['LoadBalancers']:
+            if 'SecurityGroups' in elbv2_obj:
+                yield from elbv2_obj['SecurityGroups']
 
 
-def list_lambda_attached_secgroups(lambda_aws) -> list:
+def list_lambda_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
     List security groups attached to Lambda functions
     """
-    lambda_attached_groups = []
-    boto_lambda = lambda_aws.list_functions()
-    for lambda_obj in boto_lambda['Functions']:
-        if 'VpcConfig' in lambda_obj:
-            for security_group in (
-                    lambda_obj['VpcConfig']['SecurityGroupIds']
-            ):
-                lambda_attached_groups.append(
-                    security_group
-                )
-    return lambda_attached_groups
+    for page in inventory.iter_pages('lambda', 'list_functions'):
+        for lambda_obj in page['Functions']:
+            if 'VpcConfig' in lambda_obj:
+                yield from lambda_obj['VpcConfig']['SecurityGroupIds']
 
 
-def list_elasticache_attached_secgroups(ecache) -> list:
+def list_elasticache_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
     List security groups attached to ElastiCache
     """
-    elasticache_attached_groups = []
-    boto_elasticache = ecache.describe_cache_clusters()
-    for elasticache_obj in boto_elasticache['CacheClusters']:
-        for security_group in elasticache_obj['CacheSecurityGroups']:
-            elasticache_attached_groups.append(
-                security_group['CacheSecurityGroupName']
-            )
-        if 'SecurityGroups' in elasticache_obj:
-            for security_group in elasticache_obj['SecurityGroups']:
-                elasticache_attached_groups.append(
-                    security_group['SecurityGroupId']
-                )
+    for page in inventory.iter_pages('elasticache', 'describe_cache_clusters'):
+        for elasticache_obj in page['CacheClusters']:
+            for security_group in elasticache_obj['CacheSecurityGroups']:
+                yield security_group['CacheSecurityGroupName']
+            if 'SecurityGroups' in elasticache_obj:
+                for security_group in elasticache_obj['SecurityGroups']:
+                    yield security_group['SecurityGroupId']
     try:
-        boto_elasticache = ecache.describe_cache_security_groups()
-        for elasticache_obj in boto_elasticache['CacheSecurityGroups']:
-            for security_group in elasticache_obj['EC2SecurityGroups']:
-                elasticache_attached_groups.append(
-                    security_group['EC2SecurityGroupName']
-                )
+        for page in inventory.iter_pages('elasticache', 'describe_cache_security_groups'):
+            for elasticache_obj in page['CacheSecurityGroups']:
+                for security_group in elasticache_obj['EC2SecurityGroups']:
+                    yield security_group['EC2SecurityGroupName']
     except Exception as e:
         pass
-    return elasticache_attached_groups
 
 
-def list_ecs_attached_secgroups(ecs) -> list:
-    """
-    List security groups attached to ECS Services
+def list_ecs_attached_secgroups(inventory) -> typing.Iterator[str]:
     """
-    ecs_attached_groups = []
+    List security groups attached to ECS Services. Services of every cluster
+    are listed and then described in batches concurrently.
 
-    ecs_clusters = [
-        ecs_clusters for ecs_clusters in ecs.list_clusters()['clusterArns']
-    ]
-
-    ecs_cluster_services = []
-    for cluster in ecs_clusters:
-        boto_services = ecs.list_services(cluster=cluster)
-        if boto_services['serviceArns']:
-            ecs_cluster_services.append(
-                {
-                    'ClusterName': cluster,
-                    'Services': boto_services['serviceArns'],
-                }
-            )
+    Standalone tasks aren't described: every awsvpc task has its own network
+    interface, whose groups are already listed by list_eni_attached_secgroups
+    """
+    def list_service_batches(cluster) -> list:
+        return [
+            (cluster, services_page['serviceArns'][i:i+ECS_SERVICE_API_LIMIT])
+            for services_page in inventory.iter_pages('ecs', 'list_services', cluster=cluster)
+            for i in range(0, len(services_page['serviceArns']), ECS_SERVICE_API_LIMIT)
+        ]
 
-    ECS_SERVICE_API_LIMIT = 10
-    for cluster in ecs_cluster_services:
-        for i in range(0, len(cluster['Services']), ECS_SERVICE_API_LIMIT):
-            boto_ecs = ecs.describe_services(
-                cluster=cluster['ClusterName'],
-                services=cluster['Services'][i:i+ECS_SERVICE_API_LIMIT]
+    def describe_service_batch(cluster, services) -> list:
+        return [
+            service
+            for page in inventory.iter_pages(
+                'ecs', 'describe_services',
+                cluster=cluster,
+                services=services,
             )
-            for ecs_obj in boto_ecs['services']:
+            for service in page['services']
+        ]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=inventory.max_workers) as executor:
+        listing_workers = [
+            executor.submit(list_service_batches, cluster)
+            for clusters_page in inventory.iter_pages('ecs', 'list_clusters')
+            for cluster in clusters_page['clusterArns']
+        ]
+        describing_workers = [
+            executor.submit(describe_service_batch, cluster, services)
+            for future in concurrent.futures.as_completed(listing_workers)
+            for cluster, services in future.result()
+        ]
+        for future in concurrent.futures.as_completed(describing_workers):
+            for ecs_obj in future.result():
                 if 'networkConfiguration' in ecs_obj:
-                    for security_group in (
+                    yield from (
                         ecs_obj['networkConfiguration']['awsvpcConfiguration']['securityGroups']
-                    ):
-                        ecs_attached_groups.append(
-                            security_group
-                        )
-    return ecs_attached_groups
+                    )
@@ -4,10 +4,18 @@ Using AWS best practices forcing the user to write Named Profiles instead of
 direct IAM credentials through CLI.
 """
 
+import threading
 import boto3
+import botocore.credentials
+import botocore.session
 import panoptes
 
 
+ALL_REGIONS = "all"
+DEFAULT_REGION = "us-east-1"
+DEFAULT_ROLE_SESSION_NAME = "panoptes"
+
+
 def create_session(
         region: str,
         profile: str = None,
@@ -28,26 +36,158 @@ def create_session(
     return session
 
 
+def create_assumed_role_session(
+        session: boto3.session.Session,
+        account_id: str,
+        role_name: str,
+        role_session_name: str = DEFAULT_ROLE_SESSION_NAME) -> boto3.session.Session:
+    """
+    Generates a Boto3 session assuming the role inside the account. The STS
+    credentials are fetched on first use and refreshed automatically before
+    they expire
+    """
+    with panoptes.aws.inventory.CLIENT_CREATION_LOCK:
+        sts = session.client(
+            'sts',
+            region_name=session.region_name or DEFAULT_REGION,
+        )
+
+    botocore_session = botocore.session.get_session()
+    botocore_session.register_component(
+        'credential_provider',
+        botocore.credentials.CredentialResolver(providers=[
+            AssumeRoleCredentialProvider(
+                sts=sts,
+                role_arn=f"arn:aws:iam::{account_id}:role/{role_name}",
+                role_session_name=role_session_name,
+            ),
+        ]),
+    )
+    return boto3.Session(
+        botocore_session=botocore_session,
+        region_name=session.region_name,
+    )
+
+
+class AssumeRoleCredentialProvider(botocore.credentials.CredentialProvider):
+    """
+    Botocore credential provider assuming a role through the STS client of
+    another session. The credentials are fetched on first use and refreshed
+    automatically before they expire
+    """
+
+    METHOD = 'sts-assume-role'
+
+    def __init__(self, sts, role_arn: str, role_session_name: str):
+        super().__init__()
+        self.sts = sts
+        self.role_arn = role_arn
+        self.role_session_name = role_session_name
+
+    def load(self) -> botocore.credentials.DeferredRefreshableCredentials:
+        return botocore.credentials.DeferredRefreshableCredentials(
+            refresh_using=self.refresh_credentials,
+            method=self.METHOD,
+        )
+
+    def refresh_credentials(self) -> dict:
+        """
+        Assumes the role, returning the credentials in the format of
+        botocore's refreshable credentials
+        """
+        credentials = self.sts.assume_role(
+            RoleArn=self.role_arn,
+            RoleSessionName=self.role_session_name,
+        )['Credentials']
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': credentials['Expiration'].isoformat(),
+        }
+
+
+class SessionPool:
+    """
+    Caches one assumed role session per account, built from the same base
+    session. Safe to share between worker threads.
+    """
+
+    def __init__(
+            self,
+            session: boto3.session.Session,
+            role_name: str,
+            role_session_name: str = DEFAULT_ROLE_SESSION_NAME):
+        self.session = session
+        self.role_name = role_name
+        self.role_session_name = role_session_name
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, account_id: str) -> boto3.session.Session:
+        """
+        Returns the cached assumed role session of the account
+        """
+        with self._lock:
+            if account_id not in self._sessions:
+                self._sessions[account_id] = create_assumed_role_session(
+                    session=self.session,
+                    account_id=account_id,
+                    role_name=self.role_name,
+                    role_session_name=self.role_session_name,
+                )
+            return self._sessions[account_id]
+
+    def assume(self, account_id: str) -> boto3.session.Session:
+        """
+        Returns the cached session of the account after assuming its role,
+        raising when the role can't be assumed
+        """
+        session = self.get(account_id)
+        session.get_credentials().get_frozen_credentials()
+        return session
+
+    def get_base_identity(self) -> str:
+        """
+        Get ARN from the base session assuming the roles
+        """
+        return get_session_info(self.session)
+
+
 def get_session_info(session: boto3.session.Session) -> str:
     """
     Get ARN from the current session
     """
-    return session.client('sts').get_caller_identity()['Arn']
+    with panoptes.aws.inventory.CLIENT_CREATION_LOCK:
+        sts = session.client('sts', region_name=session.region_name or DEFAULT_REGION)
+    return sts.get_caller_identity()['Arn']
+
+
+def list_regions(session: boto3.session.Session) -> list:
+    """
+    List all regions enabled in the account
+    """
+    ec2 = session.client(
+        'ec2',
+        region_name=session.region_name or DEFAULT_REGION,
+    )
+    boto_regions = ec2.describe_regions()
+    return sorted(region['RegionName'] for region in boto_regions['Regions'])
 
 
-def get_boto_clients(session: boto3.session.Session) -> dict:
+def resolve_regions(session: boto3.session.Session, regions: str) -> list:
     """
-    Receives the session, and return all Panoptes used Boto3 Clients
+    Receives a comma separated list of regions or "all", and returns the list
+    of regions which will be analyzed
     """
-    return {
-        'ec2': session.client('ec2'),
-        'rds': session.client('rds'),
-        'elb': session.client('elb'),
-        'elbv2': session.client('elbv2'),
-        'lambda': session.client('lambda'),
-        'elasticache': session.client('elasticache'),
-        'ecs': session.client('ecs'),
-    }
+    if regions.strip().lower() == ALL_REGIONS:
+        return list_regions(session)
+    resolved_regions = []
+    for region in regions.split(','):
+        region = region.strip()
+        if region and region not in resolved_regions:
+            resolved_regions.append(region)
+    return resolved_regions
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+""" Panoptes - AWS - Cache
+
+On-disk cache of the dynamic whitelist. The ranges listed by every source of
+panoptes.aws.whitelist are stored per account, region and source, and reused
+until their time to live expires, so slow-changing resources like VPCs and
+subnets aren't listed again on every run.
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 10000
+# Seconds the ranges of every source are reused, 0 never caches them
+DEFAULT_TTLS = {
+    'get_vpc_ranges': 86400,
+    'get_subnet_ranges': 86400,
+    'get_elastic_ips': 3600,
+    'get_vpc_instance_ips': 0,
+}
+
+
+class WhitelistCache:
+    """
+    Ranges of the dynamic whitelist sources keyed by account, region and
+    source. Safe to share between the threads analyzing several regions or
+    accounts. Beyond max_entries the oldest entries are evicted, and with
+    refresh every cached entry is ignored and stored again.
+    """
+
+    def __init__(
+            self,
+            entries: dict = None,
+            ttls: dict = None,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            refresh: bool = False):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.refresh = refresh
+        # Oldest entries first
+        self._entries = collections.OrderedDict(
+            sorted((entries or {}).items(), key=lambda entry: entry[1]['StoredAt'])
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, cache_path: str, **kwargs) -> 'WhitelistCache':
+        """
+        Reads a cache file, starting an empty cache when it doesn't exist or
+        belongs to another version
+        """
+        if not os.path.exists(cache_path):
+            return cls(**kwargs)
+        with open(cache_path, 'r') as cache_file:
+            cache = json.load(cache_file)
+        if cache.get('Version') != CACHE_VERSION:
+            return cls(**kwargs)
+        return cls(entries=cache['Entries'], **kwargs)
+
+    def save(self, cache_path: str):
+        """
+        Writes the entries which didn't expire to the cache file
+        """
+        with self._lock:
+            entries = {
+                key: entry for key, entry in self._entries.items()
+                if self._is_fresh(key.rsplit(':', 1)[1], entry)
+            }
+        temporary_path = f"{cache_path}.tmp"
+        with open(temporary_path, 'w') as cache_file:
+            json.dump(
+                {
+                    'Version': CACHE_VERSION,
+                    'Entries': entries,
+                },
+                cache_file,
+                separators=(',', ':'),
+            )
+        os.replace(temporary_path, cache_path)
+
+    def get(self, account: str, region: str, source: str):
+        """
+        Returns the cached ranges of the source, or None when they expired
+        or were never cached
+        """
+        with self._lock:
+            entry = self._entries.get(generate_cache_key(account, region, source))
+            if self.refresh or entry is None or not self._is_fresh(source, entry):
+                return None
+            return entry['Ranges']
+
+    def put(self, account: str, region: str, source: str, ranges: list):
+        """
+        Stores the ranges freshly listed by the source, evicting the oldest
+        entries beyond max_entries
+        """
+        if self.ttls.get(source, 0) <= 0:
+            return
+        key = generate_cache_key(account, region, source)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {
+                'StoredAt': time.time(),
+                'Ranges': list(ranges),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_fresh_sources(self, account: str, region: str) -> list:
+        """
+        Returns the sources whose cached ranges can be reused
+        """
+        return [
+            source for source in self.ttls
+            if self.get(account, region, source) is not None
+        ]
+
+    def _is_fresh(self, source: str, entry: dict) -> bool:
+        return time.time() - entry['StoredAt'] < self.ttls.get(source, 0)
+
+
+def generate_cache_key(account: str, region: str, source: str) -> str:
+    """
+    Generates the key of a cache entry
+    """
+    return f"{account}:{region}:{source}"
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,197 @@
+""" Panoptes - AWS - Columnar
+
+Columnar evaluation engine for huge accounts, requiring the optional numpy
+dependency, imported the first time the engine runs. Every ingress range of
+the evaluated groups is flattened into arrays, whitelist containment and the
+all-traffic and anywhere checks run as batched array operations, and output
+entries are built only for the unsafe rows.
+
+IPv4 ranges are checked against the sorted address intervals of the
+whitelisted networks. IPv6 or unusual ranges fall back to the whitelist index.
+"""
+
+import importlib.util
+import re
+import typing
+import panoptes
+
+
+IPV4_MAX_PREFIX = 32
+# Decimal numbers without leading zeros, the same accepted by ipaddress
+IPV4_CIDR_PATTERN = re.compile(
+    r"(0|[1-9][0-9]{0,2})\.(0|[1-9][0-9]{0,2})\.(0|[1-9][0-9]{0,2})\.(0|[1-9][0-9]{0,2})"
+    r"(?:/(0|[1-9][0-9]?))?\Z"
+)
+
+
+def is_available() -> bool:
+    """
+    Returns if numpy is installed, without importing it
+    """
+    return importlib.util.find_spec("numpy") is not None
+
+
+def evaluate_security_groups(
+        security_groups: typing.List[dict],
+        attached: typing.List[bool],
+        whitelist_index: 'panoptes.generic.network.WhitelistIndex') -> typing.List[tuple]:
+    """
+    Evaluates every security group at once, returning their (unused_entry,
+    unsafe_entry) findings in order, the same as
+    panoptes.aws.analysis.evaluate_security_group
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The columnar engine requires numpy") from None
+
+    group_rows = []
+    ingress_entries = []
+    ingress_rows = []
+    cidr_codes = []
+    all_traffic_rows = []
+    cidrs = {}
+    for group_index, security_group in enumerate(security_groups):
+        for ingress_entry in security_group['IpPermissions']:
+            ingress_index = len(ingress_entries)
+            ingress_entries.append(ingress_entry)
+            all_traffic = ingress_entry['IpProtocol'] == "-1"
+            allowed_ips = [
+                allowed_ip['CidrIp'] for allowed_ip in ingress_entry['IpRanges']
+            ] + [
+                allowed_ip['CidrIpv6'] for allowed_ip in ingress_entry.get('Ipv6Ranges', [])
+            ]
+            for cidr in allowed_ips:
+                group_rows.append(group_index)
+                ingress_rows.append(ingress_index)
+                cidr_codes.append(cidrs.setdefault(cidr, len(cidrs)))
+                all_traffic_rows.append(all_traffic)
+
+    # Every distinct CIDR is parsed and checked once, rows refer to it by code
+    unique_cidrs = list(cidrs)
+    unique_anywhere = numpy.array(
+        [cidr in panoptes.aws.graph.ANYWHERE_CIDRS for cidr in unique_cidrs],
+        dtype=bool,
+    )
+    unique_whitelisted = numpy.zeros(len(unique_cidrs), dtype=bool)
+    ipv4_codes = []
+    addresses = []
+    prefixes = []
+    for code, cidr in enumerate(unique_cidrs):
+        parsed_cidr = parse_ipv4_cidr(cidr)
+        if parsed_cidr is None:
+            unique_whitelisted[code] = cidr in whitelist_index
+        else:
+            ipv4_codes.append(code)
+            addresses.append(parsed_cidr[0])
+            prefixes.append(parsed_cidr[1])
+    if ipv4_codes:
+        unique_whitelisted[numpy.array(ipv4_codes, dtype=numpy.int64)] = contains_ipv4(
+            whitelist_index,
+            numpy.array(addresses, dtype=numpy.int64),
+            numpy.array(prefixes, dtype=numpy.int64),
+        )
+
+    cidr_codes = numpy.array(cidr_codes, dtype=numpy.int64)
+    whitelisted = unique_whitelisted[cidr_codes]
+    alert = numpy.array(all_traffic_rows, dtype=bool) | unique_anywhere[cidr_codes]
+
+    unsafe_ingress_entries = {}
+    for row in numpy.flatnonzero(~whitelisted).tolist():
+        unsafe_ingress = panoptes.aws.analysis.generate_unsafe_ingress_entry(
+            ingress_entry=ingress_entries[ingress_rows[row]],
+            unsafe_ip=unique_cidrs[cidr_codes[row]],
+        )
+        if alert[row]:
+            unsafe_ingress['Status'] = "alert"
+        unsafe_ingress_entries.setdefault(group_rows[row], []).append(unsafe_ingress)
+
+    findings = []
+    for group_index, security_group in enumerate(security_groups):
+        unused_entry = None
+        unsafe_entry = None
+        if not attached[group_index]:
+            unused_entry = panoptes.aws.analysis.generate_unused_secgroup_entry(
+                security_group=security_group
+            )
+        if group_index in unsafe_ingress_entries:
+            unsafe_entry = panoptes.aws.analysis.generate_unsafe_secgroup_entry(
+                security_group=security_group,
+                unsafe_ingress_entries=panoptes.aws.exposure.merge_unsafe_ingress(
+                    unsafe_ingress_entries[group_index]
+                ),
+            )
+        findings.append((unused_entry, unsafe_entry))
+    return findings
+
+
+def contains_ipv4(
+        whitelist_index: 'panoptes.generic.network.WhitelistIndex',
+        addresses: 'numpy.ndarray',
+        prefixes: 'numpy.ndarray') -> 'numpy.ndarray':
+    """
+    Returns which IPv4 networks are contained in a whitelisted network, with
+    a binary search over the whitelist intervals
+    """
+    import numpy
+    interval_starts, interval_ends = generate_ipv4_intervals(whitelist_index)
+    if interval_starts.size == 0:
+        return numpy.zeros(len(addresses), dtype=bool)
+    host_bits = IPV4_MAX_PREFIX - prefixes
+    starts = (addresses >> host_bits) << host_bits
+    ends = starts + (numpy.int64(1) << host_bits) - 1
+    positions = numpy.searchsorted(interval_starts, starts, side='right') - 1
+    return (positions >= 0) & (interval_ends[numpy.maximum(positions, 0)] >= ends)
+
+
+def generate_ipv4_intervals(
+        whitelist_index: 'panoptes.generic.network.WhitelistIndex') -> tuple:
+    """
+    Returns the address intervals of the outermost whitelisted IPv4
+    networks, sorted. Networks are either nested or disjoint, so dropping
+    the nested ones leaves disjoint intervals. Adjacent networks are kept
+    apart, as a range must be contained in a single whitelisted network
+    """
+    import numpy
+    intervals = []
+    for cidr in whitelist_index.networks():
+        network = panoptes.generic.network.parse_network(cidr)
+        if network.version == 4:
+            intervals.append(
+                (int(network.network_address), -int(network.broadcast_address))
+            )
+    intervals.sort()
+
+    interval_starts = []
+    interval_ends = []
+    for start, negative_end in intervals:
+        if interval_ends and -negative_end <= interval_ends[-1]:
+            continue
+        interval_starts.append(start)
+        interval_ends.append(-negative_end)
+    return (
+        numpy.array(interval_starts, dtype=numpy.int64),
+        numpy.array(interval_ends, dtype=numpy.int64),
+    )
+
+
+def parse_ipv4_cidr(cidr: str):
+    """
+    Parses a plain "a.b.c.d/n" CIDR into its (address, prefix length),
+    returning None for anything else, like IPv6 ranges
+    """
+    match = IPV4_CIDR_PATTERN.match(cidr)
+    if match is None:
+        return None
+    first, second, third, fourth, prefix = match.groups()
+    octets = (int(first), int(second), int(third), int(fourth))
+    prefix_length = IPV4_MAX_PREFIX if prefix is None else int(prefix)
+    if max(octets) > 255 or prefix_length > IPV4_MAX_PREFIX:
+        return None
+    return (
+        (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+    ), prefix_length
+
+
+if __name__ == "__main__":
+    pass
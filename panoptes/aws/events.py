@@ -0,0 +1,715 @@
+""" Panoptes - AWS - Events
+
+Event-driven incremental analysis. An in-memory model of the security groups,
+their attachments and the whitelist is built once from an inventory, and
+CloudTrail events, as found in CloudTrail log files or EventBridge "AWS API
+Call via CloudTrail" events, update only the groups they affect. Every
+finding which changed is emitted, without listing the whole account again.
+
+Instance events also update the whitelist with the IPs of the instances, and
+exposure through group references is walked again after every change, so
+exposed groups are emitted like the other findings.
+"""
+
+import collections
+import copy
+import gzip
+import json
+import os
+import sys
+import time
+import typing
+import panoptes
+
+
+NEW_CHANGE = "New"
+UPDATED_CHANGE = "Updated"
+RESOLVED_CHANGE = "Resolved"
+DEFAULT_POLL_INTERVAL = 5
+PROTOCOL_NAMES = {
+    "6": "tcp",
+    "17": "udp",
+    "1": "icmp",
+    "58": "icmpv6",
+}
+PERMISSION_SOURCES = {
+    'IpRanges': ('ipRanges', {'cidrIp': 'CidrIp'}),
+    'Ipv6Ranges': ('ipv6Ranges', {'cidrIpv6': 'CidrIpv6'}),
+    'UserIdGroupPairs': ('groups', {'groupId': 'GroupId', 'userId': 'UserId'}),
+    'PrefixListIds': ('prefixListIds', {'prefixListId': 'PrefixListId'}),
+}
+RULE_EVENTS = {
+    'ModifySecurityGroupRules',
+}
+RESOURCE_EVENTS = {
+    'RunInstances',
+    'TerminateInstances',
+    'ModifyInstanceAttribute',
+    'CreateNetworkInterface',
+    'DeleteNetworkInterface',
+    'ModifyNetworkInterfaceAttribute',
+}
+
+
+class SecurityGroupModel:
+    """
+    Security groups of a region with their current findings. Groups are
+    attached when a tracked EC2 instance or network interface uses them, or
+    when any other collected resource, like RDS or ELB, does, or when rules
+    of another group reference them. Network
+    interfaces deleted on termination are linked to their instance, and
+    primary_interfaces maps each instance to its primary network interface.
+    Groups are kept as panoptes.aws.model.SecurityGroup records, indexed by
+    name and in a panoptes.aws.graph.SecurityGroupGraph.
+
+    The whitelist is the given index plus instance_ips, the IPs of every
+    tracked instance, which instance events add and remove. Only rules
+    allowing a single host can change with an instance IP, so those are
+    indexed to find the groups affected by an instance event.
+
+    When given, the inventory describes again the groups whose changes can't
+    be applied from the event alone, like rules modified by their rule ID.
+    """
+
+    def __init__(
+            self,
+            region: str,
+            security_groups: list,
+            whitelist_index: 'panoptes.generic.network.WhitelistIndex',
+            static_attached: set,
+            resources: dict,
+            resource_parents: dict = None,
+            primary_interfaces: dict = None,
+            inventory: 'panoptes.aws.inventory.Inventory' = None,
+            instance_ips: dict = None):
+        self.region = region
+        self.base_whitelist_index = whitelist_index
+        self.instance_ips = {
+            instance_id: list(ips) for instance_id, ips in (instance_ips or {}).items()
+        }
+        self.whitelist_index = self.generate_whitelist_index()
+        self.static_attached = static_attached
+        self.inventory = inventory
+        self.security_groups = {}
+        self.group_ids_by_name = {}
+        self.host_rule_groups = collections.defaultdict(set)
+        self.graph = panoptes.aws.graph.SecurityGroupGraph()
+        for security_group in security_groups:
+            self.set_group(security_group['GroupId'], security_group)
+        self.resources = {}
+        self.resource_parents = dict(resource_parents or {})
+        self.primary_interfaces = dict(primary_interfaces or {})
+        self.attachment_counts = {}
+        for resource_id, groups in resources.items():
+            self.set_resource(resource_id, groups)
+        self.findings = {
+            group_id: self.evaluate(group_id) for group_id in self.security_groups
+        }
+        self.exposed_groups = self.generate_exposed_groups()
+
+    @classmethod
+    def from_inventory(
+            cls,
+            inventory: 'panoptes.aws.inventory.Inventory',
+            whitelist: typing.Optional[list] = None) -> 'SecurityGroupModel':
+        """
+        Builds the model from the same calls used by
+        panoptes.aws.analysis.analyze_security_groups. Calls memoized by an
+        analysis which already ran on the inventory are served from the memo
+        """
+        # Instance IPs are kept apart, to follow the instance events
+        whitelist_index = panoptes.generic.network.WhitelistIndex(whitelist or [])
+        for list_safe_ips_function in [
+                panoptes.aws.whitelist.get_vpc_ranges,
+                panoptes.aws.whitelist.get_subnet_ranges,
+                panoptes.aws.whitelist.get_elastic_ips]:
+            whitelist_index.update(list_safe_ips_function(inventory))
+
+        static_attached = set()
+        for list_attached_function in [
+                panoptes.aws.attached.list_rds_attached_secgroups,
+                panoptes.aws.attached.list_elb_attached_secgroups,
+                panoptes.aws.attached.list_elbv2_attached_secgroups,
+                panoptes.aws.attached.list_lambda_attached_secgroups,
+                panoptes.aws.attached.list_elasticache_attached_secgroups,
+                panoptes.aws.attached.list_ecs_attached_secgroups]:
+            static_attached.update(list_attached_function(inventory))
+
+        resources = {}
+        resource_parents = {}
+        primary_interfaces = {}
+        instance_ips = {}
+        for page in inventory.iter_pages('ec2', 'describe_instances'):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    resources[instance['InstanceId']] = {
+                        group['GroupId'] for group in instance['SecurityGroups']
+                    }
+                    instance_ips[instance['InstanceId']] = (
+                        panoptes.aws.whitelist.list_instance_ips(instance)
+                    )
+        for page in inventory.iter_pages('ec2', 'describe_network_interfaces',
+                                         PaginationConfig={'PageSize': 1000}):
+            for network_interface in page['NetworkInterfaces']:
+                interface_id = network_interface['NetworkInterfaceId']
+                resources[interface_id] = {
+                    group['GroupId'] for group in network_interface['Groups']
+                }
+                attachment = network_interface.get('Attachment', {})
+                if 'InstanceId' not in attachment:
+                    continue
+                if attachment.get('DeleteOnTermination'):
+                    resource_parents[interface_id] = attachment['InstanceId']
+                if attachment.get('DeviceIndex') == 0:
+                    primary_interfaces[attachment['InstanceId']] = interface_id
+
+        return cls(
+            region=inventory.region,
+            security_groups=[
+                security_group
+                for page in inventory.iter_pages('ec2', 'describe_security_groups')
+                for security_group in page['SecurityGroups']
+            ],
+            whitelist_index=whitelist_index,
+            static_attached=static_attached,
+            resources=resources,
+            resource_parents=resource_parents,
+            primary_interfaces=primary_interfaces,
+            inventory=inventory,
+            instance_ips=instance_ips,
+        )
+
+    def generate_whitelist_index(self) -> 'panoptes.generic.network.WhitelistIndex':
+        """
+        Returns a copy of the given whitelist with the IPs of every tracked
+        instance
+        """
+        whitelist_index = self.base_whitelist_index.copy()
+        for ips in self.instance_ips.values():
+            whitelist_index.update(ips)
+        return whitelist_index
+
+    def is_resource_attached(self, group_id: str) -> bool:
+        """
+        Returns if any resource, not counting the rules of other groups,
+        uses the group
+        """
+        return (
+            self.attachment_counts.get(group_id, 0) > 0
+            or group_id in self.static_attached
+            or self.security_groups[group_id]['GroupName'] in self.static_attached
+        )
+
+    def is_attached(self, group_id: str) -> bool:
+        """
+        Returns if any resource uses the group
+        """
+        return self.is_resource_attached(group_id) or self.graph.is_referenced(group_id)
+
+    def evaluate(self, group_id: str) -> tuple:
+        """
+        Evaluates the group, returning its (unused_entry, unsafe_entry)
+        """
+        return panoptes.aws.analysis.evaluate_security_group(
+            security_group=self.security_groups[group_id],
+            attached=self.is_attached(group_id),
+            whitelist_index=self.whitelist_index,
+        )
+
+    def set_group(self, group_id: str, security_group: dict = None) -> set:
+        """
+        Replaces a security group, or deletes it when None, returning the
+        groups whose findings may have changed: the group and the ones its
+        rules referenced before and after
+        """
+        affected_groups = {group_id}
+        previous_group = self.security_groups.pop(group_id, None)
+        if previous_group is not None:
+            affected_groups.update(panoptes.aws.graph.iter_group_references(previous_group))
+            self.graph.remove(group_id)
+            if self.group_ids_by_name.get(previous_group['GroupName']) == group_id:
+                del self.group_ids_by_name[previous_group['GroupName']]
+            for network in iter_host_networks(previous_group):
+                self.host_rule_groups[network].discard(group_id)
+        if security_group is not None:
+            security_group = panoptes.aws.model.parse_security_group(security_group)
+            self.security_groups[group_id] = security_group
+            affected_groups.update(panoptes.aws.graph.iter_group_references(security_group))
+            self.graph.add(security_group)
+            self.group_ids_by_name[security_group['GroupName']] = group_id
+            for network in iter_host_networks(security_group):
+                self.host_rule_groups[network].add(group_id)
+        return affected_groups
+
+    def set_instance_ips(self, instance_id: str, ips: list = None) -> set:
+        """
+        Replaces the whitelisted IPs of an instance, or deletes them when
+        None, returning the groups with rules allowing any of those IPs
+        """
+        previous_ips = self.instance_ips.pop(instance_id, [])
+        if ips:
+            self.instance_ips[instance_id] = list(ips)
+        changed_ips = set(previous_ips) ^ set(ips or [])
+        if not changed_ips:
+            return set()
+        self.whitelist_index = self.generate_whitelist_index()
+        affected_groups = set()
+        for ip in changed_ips:
+            affected_groups |= self.host_rule_groups.get(
+                panoptes.generic.network.parse_network(ip), set()
+            )
+        return affected_groups
+
+    def set_resource(self, resource_id: str, groups: set) -> set:
+        """
+        Tracks the groups used by an instance or network interface, returning
+        the groups whose attachment may have changed
+        """
+        previous_groups = self.untrack_resource(resource_id)
+        self.resources[resource_id] = set(groups)
+        for group_id in groups:
+            self.attachment_counts[group_id] = self.attachment_counts.get(group_id, 0) + 1
+        return previous_groups | set(groups)
+
+    def untrack_resource(self, resource_id: str) -> set:
+        """
+        Stops counting the groups of a resource, returning them
+        """
+        groups = self.resources.pop(resource_id, set())
+        for group_id in groups:
+            self.attachment_counts[group_id] -= 1
+        return groups
+
+    def remove_resource(self, resource_id: str) -> set:
+        """
+        Stops tracking an instance or network interface, together with the
+        network interfaces deleted on its termination, returning the groups
+        they used
+        """
+        groups = set(self.untrack_resource(resource_id))
+        self.resource_parents.pop(resource_id, None)
+        self.primary_interfaces.pop(resource_id, None)
+        children = [
+            child_id for child_id, parent_id in self.resource_parents.items()
+            if parent_id == resource_id
+        ]
+        for child_id in children:
+            groups |= self.remove_resource(child_id)
+        return groups
+
+    def resolve_group_id(self, group: str) -> str:
+        """
+        Returns the ID of a group referenced by ID or by name
+        """
+        if group in self.security_groups:
+            return group
+        return self.group_ids_by_name.get(group, group)
+
+    def refresh_group(self, group_id: str) -> set:
+        """
+        Describes the group again through the inventory
+        """
+        if self.inventory is None:
+            return set()
+        pages = self.inventory.fetch(
+            'ec2', 'describe_security_groups', GroupIds=[group_id]
+        )
+        affected_groups = set()
+        for page in pages:
+            for security_group in page['SecurityGroups']:
+                affected_groups |= self.set_group(security_group['GroupId'], security_group)
+        return affected_groups
+
+    def apply(self, event: dict) -> typing.List[dict]:
+        """
+        Applies a CloudTrail event record to the model, returning the
+        findings which changed. Failed calls and other regions are ignored.
+        """
+        if event.get('errorCode') or event.get('awsRegion', self.region) != self.region:
+            return []
+        event_name = event.get('eventName')
+        request = event.get('requestParameters') or {}
+        response = event.get('responseElements') or {}
+
+        if event_name == 'AuthorizeSecurityGroupIngress':
+            affected_groups = self.update_ingress(request, revoke=False)
+        elif event_name == 'RevokeSecurityGroupIngress':
+            affected_groups = self.update_ingress(request, revoke=True)
+        elif event_name == 'CreateSecurityGroup':
+            group_id = response.get('groupId')
+            if not group_id:
+                return []
+            affected_groups = self.set_group(group_id, {
+                'GroupId': group_id,
+                'GroupName': request.get('groupName', ''),
+                'Description': request.get('groupDescription', ''),
+                'VpcId': request.get('vpcId'),
+                'IpPermissions': [],
+            })
+        elif event_name == 'DeleteSecurityGroup':
+            group_id = self.resolve_group_id(
+                request.get('groupId') or request.get('groupName', '')
+            )
+            affected_groups = self.set_group(group_id, None)
+        elif event_name in RULE_EVENTS:
+            affected_groups = self.refresh_group(request.get(
+                'ModifySecurityGroupRulesRequest', request
+            ).get('GroupId', ''))
+        elif event_name in RESOURCE_EVENTS:
+            affected_groups = self.update_resources(event_name, request, response)
+        else:
+            return []
+        return self.update_findings(affected_groups)
+
+    def update_ingress(self, request: dict, revoke: bool) -> set:
+        """
+        Authorizes or revokes the ingress permissions of the request
+        """
+        group_id = self.resolve_group_id(
+            request.get('groupId') or request.get('groupName', '')
+        )
+        if group_id not in self.security_groups:
+            return set()
+        if request.get('securityGroupRuleIds'):
+            return self.refresh_group(group_id)
+
+        # Copied, the inventory pages are left as they were fetched
+        security_group = copy.deepcopy(self.security_groups[group_id])
+        permissions = security_group['IpPermissions']
+        for requested_permission in parse_event_permissions(request):
+            key = get_permission_key(requested_permission)
+            permission = next(
+                (item for item in permissions if get_permission_key(item) == key),
+                None,
+            )
+            if permission is None:
+                if not revoke:
+                    permissions.append(requested_permission)
+                continue
+            for source in PERMISSION_SOURCES:
+                current_items = permission.setdefault(source, [])
+                for item in requested_permission[source]:
+                    if revoke:
+                        current_items[:] = [
+                            current_item for current_item in current_items
+                            if not is_same_source(current_item, item)
+                        ]
+                    elif not any(is_same_source(current_item, item)
+                                 for current_item in current_items):
+                        current_items.append(item)
+            if revoke and not any(permission.get(source) for source in PERMISSION_SOURCES):
+                permissions.remove(permission)
+        return self.set_group(group_id, security_group)
+
+    def update_resources(self, event_name: str, request: dict, response: dict) -> set:
+        """
+        Tracks the instances and network interfaces created, modified or
+        deleted by the event
+        """
+        affected_groups = set()
+        if event_name == 'RunInstances':
+            for instance in get_items(response.get('instancesSet')):
+                affected_groups |= self.set_resource(
+                    instance['instanceId'],
+                    {group['groupId'] for group in get_items(instance.get('groupSet'))},
+                )
+                affected_groups |= self.set_instance_ips(
+                    instance['instanceId'], list_event_instance_ips(instance)
+                )
+                for network_interface in get_items(instance.get('networkInterfaceSet')):
+                    interface_id = network_interface['networkInterfaceId']
+                    affected_groups |= self.set_resource(
+                        interface_id,
+                        {
+                            group['groupId']
+                            for group in get_items(network_interface.get('groupSet'))
+                        },
+                    )
+                    attachment = network_interface.get('attachment', {})
+                    if attachment.get('deleteOnTermination', True):
+                        self.resource_parents[interface_id] = instance['instanceId']
+                    if attachment.get('deviceIndex', 0) == 0:
+                        self.primary_interfaces[instance['instanceId']] = interface_id
+        elif event_name == 'TerminateInstances':
+            for instance in get_items(request.get('instancesSet')):
+                affected_groups |= self.remove_resource(instance['instanceId'])
+                affected_groups |= self.set_instance_ips(instance['instanceId'], None)
+        elif event_name == 'CreateNetworkInterface':
+            network_interface = response.get('networkInterface', {})
+            if 'networkInterfaceId' in network_interface:
+                affected_groups |= self.set_resource(
+                    network_interface['networkInterfaceId'],
+                    {
+                        group['groupId']
+                        for group in get_items(network_interface.get('groupSet'))
+                    },
+                )
+        elif event_name == 'DeleteNetworkInterface':
+            affected_groups |= self.remove_resource(request.get('networkInterfaceId', ''))
+        elif request.get('groupSet'):
+            # ModifyInstanceAttribute changes the groups of the primary
+            # network interface, ModifyNetworkInterfaceAttribute of any
+            groups = {group['groupId'] for group in get_items(request['groupSet'])}
+            instance_id = request.get('instanceId')
+            resource_ids = [
+                instance_id,
+                self.primary_interfaces.get(instance_id),
+                request.get('networkInterfaceId'),
+            ]
+            for resource_id in resource_ids:
+                if resource_id:
+                    affected_groups |= self.set_resource(resource_id, groups)
+        return affected_groups
+
+    def generate_exposed_groups(self) -> dict:
+        """
+        Walks the exposure through group references, returning the entry of
+        every exposed group by its ID
+        """
+        exposure_paths = self.graph.compute_exposure(self.is_resource_attached)
+        return {
+            group_id: panoptes.aws.analysis.generate_exposed_secgroup_entry(
+                security_group=self.security_groups[group_id],
+                exposure_path=exposure_path,
+            )
+            for group_id, exposure_path in exposure_paths.items()
+        }
+
+    def update_findings(self, affected_groups: set) -> typing.List[dict]:
+        """
+        Evaluates the affected groups again, returning the findings which
+        changed. Exposure may change beyond the affected groups, through the
+        references of their rules, so it is walked again for the whole model
+        """
+        changes = []
+
+        def add_change(finding_type: str, previous_entry, current_entry):
+            if previous_entry == current_entry:
+                return
+            if current_entry is None:
+                change, entry = RESOLVED_CHANGE, previous_entry
+            elif previous_entry is None:
+                change, entry = NEW_CHANGE, current_entry
+            else:
+                change, entry = UPDATED_CHANGE, current_entry
+            finding = panoptes.aws.analysis.generate_finding(
+                finding_type, self.region, entry
+            )
+            finding['Change'] = change
+            changes.append(finding)
+
+        for group_id in sorted(affected_groups):
+            previous_findings = self.findings.pop(group_id, (None, None))
+            if group_id in self.security_groups:
+                current_findings = self.evaluate(group_id)
+                self.findings[group_id] = current_findings
+            else:
+                current_findings = (None, None)
+            finding_types = (
+                panoptes.aws.analysis.UNUSED_FINDING,
+                panoptes.aws.analysis.UNSAFE_FINDING,
+            )
+            for finding_type, previous_entry, current_entry in zip(
+                    finding_types, previous_findings, current_findings):
+                add_change(finding_type, previous_entry, current_entry)
+
+        if not affected_groups:
+            return changes
+        previous_exposed_groups = self.exposed_groups
+        self.exposed_groups = self.generate_exposed_groups()
+        for group_id in sorted(previous_exposed_groups.keys() | self.exposed_groups.keys()):
+            add_change(
+                panoptes.aws.analysis.EXPOSED_FINDING,
+                previous_exposed_groups.get(group_id),
+                self.exposed_groups.get(group_id),
+            )
+        return changes
+
+
+def iter_changed_findings(
+        model: SecurityGroupModel,
+        events: typing.Iterable[dict]) -> typing.Iterator[dict]:
+    """
+    Applies every event to the model, yielding the findings which changed.
+    An event which can't be applied yields an error finding instead of
+    stopping the stream
+    """
+    for event in events:
+        try:
+            changes = model.apply(event)
+        except Exception as error:
+            changes = [{
+                'Type': panoptes.aws.analysis.ERROR_FINDING,
+                'Region': model.region,
+                'Message': f"{event.get('eventName')}: {error}",
+            }]
+        yield from changes
+
+
+def list_event_instance_ips(instance: dict) -> list:
+    """
+    List Public and Private IPs of an instance of a RunInstances response,
+    like panoptes.aws.whitelist.list_instance_ips
+    """
+    instance_ips = []
+    for address in (instance.get('ipAddress'), instance.get('privateIpAddress')):
+        if address:
+            instance_ips.append(address + '/32')
+    for network_interface in get_items(instance.get('networkInterfaceSet')):
+        private_ips = [network_interface] + get_items(
+            network_interface.get('privateIpAddressesSet')
+        )
+        for private_ip in private_ips:
+            public_ip = (private_ip.get('association') or {}).get('publicIp')
+            if public_ip:
+                instance_ips.append(public_ip + '/32')
+            if private_ip.get('privateIpAddress'):
+                instance_ips.append(private_ip['privateIpAddress'] + '/32')
+    return instance_ips
+
+
+def iter_host_networks(security_group: dict) -> typing.Iterator:
+    """
+    Yields the parsed networks of the rules of the group allowing a single
+    host, the only ones an instance IP can whitelist
+    """
+    for ingress_entry in security_group['IpPermissions']:
+        cidrs = [ip_range['CidrIp'] for ip_range in ingress_entry.get('IpRanges', [])]
+        cidrs += [ip_range['CidrIpv6'] for ip_range in ingress_entry.get('Ipv6Ranges', [])]
+        for cidr in cidrs:
+            network = panoptes.generic.network.parse_network(cidr)
+            if network is not None and network.prefixlen == network.max_prefixlen:
+                yield network
+
+
+def get_items(value) -> list:
+    """
+    Returns the list of a CloudTrail {"items": [...]} set
+    """
+    if not value:
+        return []
+    return value.get('items', [])
+
+
+def parse_event_permissions(request: dict) -> typing.List[dict]:
+    """
+    Converts the ingress permissions of a CloudTrail request into the
+    describe_security_groups format
+    """
+    event_permissions = get_items(request.get('ipPermissions'))
+    if not event_permissions and request.get('ipProtocol'):
+        event_permissions = [{
+            'ipProtocol': request['ipProtocol'],
+            'fromPort': request.get('fromPort'),
+            'toPort': request.get('toPort'),
+            'ipRanges': {'items': [{'cidrIp': request['cidrIp']}]} if request.get('cidrIp') else {},
+        }]
+
+    permissions = []
+    for event_permission in event_permissions:
+        protocol = str(event_permission['ipProtocol']).lower()
+        permission = {'IpProtocol': PROTOCOL_NAMES.get(protocol, protocol)}
+        if permission['IpProtocol'] != "-1":
+            if event_permission.get('fromPort') is not None:
+                permission['FromPort'] = int(event_permission['fromPort'])
+            if event_permission.get('toPort') is not None:
+                permission['ToPort'] = int(event_permission['toPort'])
+        for source, (event_source, fields) in PERMISSION_SOURCES.items():
+            permission[source] = [
+                {
+                    field: item[event_field]
+                    for event_field, field in fields.items() if event_field in item
+                }
+                for item in get_items(event_permission.get(event_source))
+            ]
+        permissions.append(permission)
+    return permissions
+
+
+def get_permission_key(permission: dict) -> tuple:
+    """
+    Returns what identifies a permission within its group
+    """
+    return (
+        permission['IpProtocol'],
+        permission.get('FromPort'),
+        permission.get('ToPort'),
+    )
+
+
+def is_same_source(current_item: dict, item: dict) -> bool:
+    """
+    Compares two sources of a permission, ignoring their descriptions
+    """
+    return all(
+        current_item.get(field) == value
+        for field, value in item.items() if field != 'Description'
+    )
+
+
+def parse_event_records(content: str) -> typing.Iterator[dict]:
+    """
+    Yields the CloudTrail records of a CloudTrail log file, of an
+    EventBridge event, or of a JSON record per line
+    """
+    content = content.strip()
+    if not content:
+        return
+    try:
+        documents = [json.loads(content)]
+    except ValueError:
+        documents = [json.loads(line) for line in content.splitlines() if line.strip()]
+    for document in documents:
+        if 'Records' in document:
+            yield from document['Records']
+        elif 'detail' in document:
+            yield document['detail']
+        else:
+            yield document
+
+
+def read_event_file(event_path: str) -> typing.Iterator[dict]:
+    """
+    Yields the CloudTrail records of a file, gzip compressed or not
+    """
+    opener = gzip.open if event_path.endswith('.gz') else open
+    with opener(event_path, 'rt') as event_file:
+        yield from parse_event_records(event_file.read())
+
+
+def iter_events(
+        events_path: str,
+        follow: bool = False,
+        poll_interval: float = DEFAULT_POLL_INTERVAL) -> typing.Iterator[dict]:
+    """
+    Yields CloudTrail records from a file, a directory of files in name order,
+    or stdin when the path is "-". When following, directories are polled
+    for new files and stdin is read line by line.
+    """
+    if events_path == '-':
+        if follow:
+            for line in sys.stdin:
+                yield from parse_event_records(line)
+        else:
+            yield from parse_event_records(sys.stdin.read())
+        return
+
+    if not os.path.isdir(events_path):
+        yield from read_event_file(events_path)
+        return
+
+    read_files = set()
+    while True:
+        new_files = sorted(set(os.listdir(events_path)) - read_files)
+        for file_name in new_files:
+            read_files.add(file_name)
+            file_path = os.path.join(events_path, file_name)
+            if os.path.isfile(file_path):
+                yield from read_event_file(file_path)
+        if not follow:
+            return
+        time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,278 @@
+""" Panoptes - AWS - Exposure
+
+Port range engine over the unsafe ingress entries of the analysis. Entries
+of a group are collapsed into its effective exposure: overlapping or
+adjacent port ranges of the same protocol and CIDR are merged, and entries
+covered by a wider CIDR allowing the same ports, or all traffic, are dropped.
+ICMP and other protocols store a type and code in FromPort and ToPort, which
+are never handled as ranges.
+
+The exposure index answers which groups expose a port, like 22/tcp to the
+internet, with a binary search over port segments and a segment tree of the
+intervals covering them.
+"""
+
+import bisect
+import collections
+import copy
+import typing
+import panoptes
+
+
+ALL_TRAFFIC_PROTOCOL = "-1"
+PORT_PROTOCOLS = {
+    "tcp",
+    "udp",
+}
+MIN_PORT = 0
+MAX_PORT = 65535
+# FromPort or ToPort of the protocols without ports, like ICMP, allowing any
+# type or code
+ANY_TYPE = -1
+
+
+def merge_unsafe_ingress(unsafe_ingress_entries: list) -> list:
+    """
+    Collapses the unsafe ingress entries of a group into its effective
+    exposure, keeping the order of the first entry of every protocol and CIDR
+    """
+    entries_by_source = collections.OrderedDict()
+    for unsafe_ingress in unsafe_ingress_entries:
+        source = (unsafe_ingress['IpProtocol'], unsafe_ingress['CidrIp'])
+        entries_by_source.setdefault(source, []).append(unsafe_ingress)
+
+    networks = {}
+    if len(entries_by_source) > 1:
+        networks = {
+            cidr: panoptes.generic.network.parse_network(cidr)
+            for cidr in {cidr for _, cidr in entries_by_source}
+        }
+        entries_by_source = group_equal_networks(entries_by_source, networks)
+
+    merged_by_source = collections.OrderedDict()
+    for (protocol, cidr), entries in entries_by_source.items():
+        if protocol == ALL_TRAFFIC_PROTOCOL:
+            merged_by_source[(protocol, cidr)] = entries[:1]
+        elif protocol in PORT_PROTOCOLS and all(has_port_range(entry) for entry in entries):
+            merged_by_source[(protocol, cidr)] = merge_port_ranges(entries)
+        else:
+            merged_by_source[(protocol, cidr)] = list({
+                (entry.get('FromPort'), entry.get('ToPort')): entry for entry in entries
+            }.values())
+
+    if len(merged_by_source) == 1:
+        return next(iter(merged_by_source.values()))
+
+    effective_entries = []
+    for (protocol, cidr), entries in merged_by_source.items():
+        for entry in entries:
+            if not is_covered(entry, protocol, cidr, merged_by_source, networks):
+                effective_entries.append(entry)
+    return effective_entries
+
+
+def group_equal_networks(entries_by_source: dict, networks: dict) -> dict:
+    """
+    Groups the sources whose CIDRs are the same network written differently,
+    like 10.0.0.1/24 and 10.0.0.0/24, under the CIDR of the first one. They
+    would cover each other otherwise, dropping both
+    """
+    first_cidrs = {}
+    grouped_entries = collections.OrderedDict()
+    for (protocol, cidr), entries in entries_by_source.items():
+        network = networks[cidr]
+        if network is not None:
+            cidr = first_cidrs.setdefault((protocol, network), cidr)
+        grouped_entries.setdefault((protocol, cidr), []).extend(entries)
+    return grouped_entries
+
+
+def merge_port_ranges(entries: list) -> list:
+    """
+    Merges overlapping or adjacent port ranges of entries sharing the same
+    protocol and CIDR
+    """
+    merged_entries = []
+    for entry in sorted(entries, key=lambda entry: (entry['FromPort'], entry['ToPort'])):
+        if merged_entries and entry['FromPort'] <= merged_entries[-1]['ToPort'] + 1:
+            if entry['ToPort'] > merged_entries[-1]['ToPort']:
+                merged_entries[-1] = copy.copy(merged_entries[-1])
+                merged_entries[-1]['ToPort'] = entry['ToPort']
+            continue
+        merged_entries.append(entry)
+    return merged_entries
+
+
+def is_covered(
+        entry: dict,
+        protocol: str,
+        cidr: str,
+        merged_by_source: dict,
+        networks: dict) -> bool:
+    """
+    Returns if another source of the group allows a CIDR containing the
+    entry CIDR, on every port of the entry or on all traffic
+    """
+    network = networks[cidr]
+    if network is None:
+        return False
+    for (other_protocol, other_cidr), other_entries in merged_by_source.items():
+        if other_protocol not in (protocol, ALL_TRAFFIC_PROTOCOL):
+            continue
+        if (other_protocol, other_cidr) == (protocol, cidr):
+            continue
+        other_network = networks[other_cidr]
+        if other_network is None or other_network.version != network.version:
+            continue
+        if not network.subnet_of(other_network):
+            continue
+        if other_protocol == ALL_TRAFFIC_PROTOCOL:
+            return True
+        for other_entry in other_entries:
+            if covers_ports(other_entry, entry, protocol):
+                return True
+    return False
+
+
+def covers_ports(other_entry: dict, entry: dict, protocol: str) -> bool:
+    """
+    Returns if other_entry allows everything the entry allows of the same
+    protocol. Only TCP and UDP ports are ranges, the type and code of ICMP
+    or other protocols must match, unless other_entry allows any of them
+    """
+    if protocol in PORT_PROTOCOLS:
+        return (
+            has_port_range(entry) and has_port_range(other_entry)
+            and other_entry['FromPort'] <= entry['FromPort']
+            and entry['ToPort'] <= other_entry['ToPort']
+        )
+    if not has_port_range(other_entry):
+        return True
+    if not has_port_range(entry):
+        return False
+    return all(
+        other_entry[key] in (ANY_TYPE, entry[key]) for key in ('FromPort', 'ToPort')
+    )
+
+
+def has_port_range(entry: dict) -> bool:
+    """
+    Returns if the entry is limited to a port range
+    """
+    return 'FromPort' in entry and 'ToPort' in entry
+
+
+class PortIntervalIndex:
+    """
+    Static index of values over port intervals. The port space is split into
+    segments at every interval boundary, and a segment tree over them keeps
+    every interval in the O(log n) nodes spanning it, so building takes
+    O(n log n) and a port lookup walks a single leaf to root path.
+    """
+
+    def __init__(self, intervals: typing.Iterable[tuple]):
+        intervals = list(intervals)
+        self._boundaries = sorted(
+            {from_port for from_port, _, _ in intervals}
+            | {to_port + 1 for _, to_port, _ in intervals}
+        )
+        self._size = len(self._boundaries)
+        self._nodes = collections.defaultdict(list)
+        for from_port, to_port, value in intervals:
+            left = bisect.bisect_left(self._boundaries, from_port) + self._size
+            right = bisect.bisect_left(self._boundaries, to_port + 1) + self._size
+            while left < right:
+                if left & 1:
+                    self._nodes[left].append(value)
+                    left += 1
+                if right & 1:
+                    right -= 1
+                    self._nodes[right].append(value)
+                left >>= 1
+                right >>= 1
+
+    def query(self, port: int) -> tuple:
+        """
+        Returns the values of every interval containing the port
+        """
+        position = bisect.bisect_right(self._boundaries, port) - 1
+        if position < 0:
+            return ()
+        values = {}
+        node = position + self._size
+        while node:
+            values.update(dict.fromkeys(self._nodes.get(node, ())))
+            node >>= 1
+        return tuple(values)
+
+
+class ExposureIndex:
+    """
+    Index of the unsafe groups by protocol and port, built once from an
+    analysis report of a region, several regions or several accounts.
+    Every target is a dictionary identifying the group, with its Account and
+    Region when known.
+    """
+
+    def __init__(self, analysis: dict):
+        intervals = collections.defaultdict(list)
+        self._all_ports = collections.defaultdict(list)
+        for target, unsafe_group in iter_unsafe_groups(analysis):
+            target_key = tuple(sorted(target.items()))
+            for unsafe_ingress in unsafe_group['UnsafePorts']:
+                internet = unsafe_ingress['CidrIp'] in panoptes.aws.graph.ANYWHERE_CIDRS
+                protocol = unsafe_ingress['IpProtocol']
+                if protocol not in PORT_PROTOCOLS or not has_port_range(unsafe_ingress) or (
+                        unsafe_ingress['FromPort'] <= MIN_PORT
+                        and unsafe_ingress['ToPort'] >= MAX_PORT):
+                    self._all_ports[(protocol, internet)].append(target_key)
+                else:
+                    intervals[(protocol, internet)].append(
+                        (unsafe_ingress['FromPort'], unsafe_ingress['ToPort'], target_key)
+                    )
+        self._indexes = {
+            key: PortIntervalIndex(key_intervals)
+            for key, key_intervals in intervals.items()
+        }
+
+    def query(self, port: int, protocol: str = "tcp", internet: bool = False) -> list:
+        """
+        Returns the groups exposing the port of the protocol to unknown IPs,
+        or only to the whole internet
+        """
+        scopes = [True] if internet else [True, False]
+        target_keys = set()
+        for scope in scopes:
+            for key_protocol in (protocol, ALL_TRAFFIC_PROTOCOL):
+                target_keys.update(self._all_ports.get((key_protocol, scope), ()))
+                if (key_protocol, scope) in self._indexes:
+                    target_keys.update(self._indexes[(key_protocol, scope)].query(port))
+        return [dict(target_key) for target_key in sorted(target_keys)]
+
+
+def iter_unsafe_groups(analysis: dict) -> typing.Iterator[tuple]:
+    """
+    Yields (target, unsafe_group) for every unsafe group of an analysis
+    report of a region, several regions or several accounts
+    """
+    if 'Accounts' in analysis:
+        for account, account_analysis in analysis['Accounts'].items():
+            for target, unsafe_group in iter_unsafe_groups(account_analysis):
+                yield dict(target, Account=account), unsafe_group
+        return
+
+    if 'Regions' in analysis:
+        for region, region_analysis in analysis['Regions'].items():
+            for target, unsafe_group in iter_unsafe_groups(region_analysis):
+                yield dict(target, Region=region), unsafe_group
+        return
+
+    for unsafe_group in analysis['SecurityGroups']['UnsafeGroups']:
+        yield {
+            'GroupId': unsafe_group['GroupId'],
+            'GroupName': unsafe_group['GroupName'],
+        }, unsafe_group
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,134 @@
+""" Panoptes - AWS - Graph
+
+Index of the references between security groups. Nodes are groups and every
+ingress rule allowing another group of the account (UserIdGroupPairs) is an
+edge from the allowed group into the group owning the rule: members of the
+allowed group can reach members of the other one.
+
+Referenced groups are in use, and exposure spreads from internet-open groups
+into every group they grant access to, computed in one breadth-first pass.
+"""
+
+import collections
+import typing
+
+
+ANYWHERE_CIDRS = {
+    "0.0.0.0/0",
+    "::/0",
+}
+
+
+class SecurityGroupGraph:
+    """
+    References between the security groups of an account
+    """
+
+    def __init__(self, security_groups: typing.Iterable[dict] = ()):
+        self.security_groups = {}
+        self.grants = collections.defaultdict(set)
+        self.reference_counts = collections.Counter()
+        self.internet_open = set()
+        for security_group in security_groups:
+            self.add(security_group)
+
+    def add(self, security_group: dict):
+        """
+        Indexes a security group and the groups allowed by its rules,
+        replacing the group when it was already indexed
+        """
+        group_id = security_group['GroupId']
+        self.remove(group_id)
+        self.security_groups[group_id] = security_group
+        for allowed_group_id in iter_group_references(security_group):
+            self.grants[allowed_group_id].add(group_id)
+            self.reference_counts[allowed_group_id] += 1
+        if is_internet_open(security_group):
+            self.internet_open.add(group_id)
+
+    def remove(self, group_id: str):
+        """
+        Stops indexing a security group and the groups allowed by its rules
+        """
+        security_group = self.security_groups.pop(group_id, None)
+        if security_group is None:
+            return
+        for allowed_group_id in iter_group_references(security_group):
+            self.grants[allowed_group_id].discard(group_id)
+            self.reference_counts[allowed_group_id] -= 1
+            if not self.reference_counts[allowed_group_id]:
+                del self.reference_counts[allowed_group_id]
+        self.internet_open.discard(group_id)
+
+    def add_references(self, security_group: dict):
+        """
+        Indexes only the groups allowed by the rules of a group which isn't
+        analyzed, like one outside the scope of the scan
+        """
+        self.reference_counts.update(iter_group_references(security_group))
+
+    def is_referenced(self, group_id: str) -> bool:
+        """
+        Returns if rules of another group allow this group
+        """
+        return self.reference_counts[group_id] > 0
+
+    def compute_exposure(self, is_attached: typing.Callable[[str], bool]) -> dict:
+        """
+        Walks from every attached internet-open group into the groups it
+        grants access to. Exposure only spreads through attached groups,
+        which have members able to reach further.
+
+        DesiredReturn:
+            {
+                str[GroupId]: list[GroupIds from the internet-open group to
+                    the one granting access],
+            }
+        """
+        paths = {}
+        queue = collections.deque()
+        for group_id in self.security_groups:
+            if group_id in self.internet_open and is_attached(group_id):
+                paths[group_id] = []
+                queue.append(group_id)
+
+        while queue:
+            group_id = queue.popleft()
+            path = paths[group_id] + [group_id]
+            for granted_group_id in sorted(self.grants.get(group_id, ())):
+                if granted_group_id in paths or granted_group_id not in self.security_groups:
+                    continue
+                paths[granted_group_id] = path
+                if is_attached(granted_group_id):
+                    queue.append(granted_group_id)
+
+        return {group_id: path for group_id, path in paths.items() if path}
+
+
+def is_internet_open(security_group: dict) -> bool:
+    """
+    Returns if any ingress rule of the group allows the whole internet
+    """
+    for ingress_entry in security_group['IpPermissions']:
+        for allowed_ip in ingress_entry.get('IpRanges', []):
+            if allowed_ip['CidrIp'] in ANYWHERE_CIDRS:
+                return True
+        for allowed_ip in ingress_entry.get('Ipv6Ranges', []):
+            if allowed_ip['CidrIpv6'] in ANYWHERE_CIDRS:
+                return True
+    return False
+
+
+def iter_group_references(security_group: dict) -> typing.Iterator[str]:
+    """
+    Yields the IDs of the other groups allowed by the rules of the group
+    """
+    for ingress_entry in security_group['IpPermissions']:
+        for group_pair in ingress_entry.get('UserIdGroupPairs', []):
+            allowed_group_id = group_pair.get('GroupId')
+            if allowed_group_id and allowed_group_id != security_group['GroupId']:
+                yield allowed_group_id
+
+
+if __name__ == "__main__":
+    pass
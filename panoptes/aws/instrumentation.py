@@ -0,0 +1,194 @@
+""" Panoptes - AWS - Instrumentation
+
+Records how long every AWS API call and every analysis phase takes, to find
+which service is the bottleneck of a scan. Each inventory owns a recorder,
+optionally forwarding everything into a parent recorder aggregating the
+whole run.
+"""
+
+import contextlib
+import threading
+import time
+
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "BandwidthLimitExceeded",
+    "SlowDown",
+    "PriorRequestNotComplete",
+    "EC2ThrottledException",
+}
+
+
+class Recorder:
+    """
+    Thread-safe aggregation of API call statistics and phase durations
+    """
+
+    def __init__(self, parent: 'Recorder' = None):
+        self.parent = parent
+        self._calls = {}
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def record_call(
+            self,
+            service: str,
+            operation: str,
+            seconds: float,
+            pages: int = 0,
+            items: int = 0,
+            retries: int = 0):
+        """
+        Adds the statistics of a describe/list call, which may span many pages
+        """
+        with self._lock:
+            call = self._get_call(service, operation)
+            call['Calls'] += 1
+            call['Seconds'] += seconds
+            call['Pages'] += pages
+            call['Items'] += items
+            call['Retries'] += retries
+        if self.parent is not None:
+            self.parent.record_call(service, operation, seconds, pages, items, retries)
+
+    def record_throttle(self, service: str, operation: str):
+        """
+        Adds a throttling event to the call
+        """
+        with self._lock:
+            self._get_call(service, operation)['Throttles'] += 1
+        if self.parent is not None:
+            self.parent.record_throttle(service, operation)
+
+    def record_phase(self, phase: str, seconds: float):
+        """
+        Adds the duration of an analysis phase
+        """
+        with self._lock:
+            self._phases[phase] = self._phases.get(phase, 0.0) + seconds
+        if self.parent is not None:
+            self.parent.record_phase(phase, seconds)
+
+    @contextlib.contextmanager
+    def phase(self, phase: str):
+        """
+        Times the block as an analysis phase
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(phase, time.perf_counter() - started)
+
+    def handle_retry_event(self, service: str, response=None, event_name: str = "", **kwargs):
+        """
+        Botocore "needs-retry" handler counting throttling responses. It
+        never asks for a retry itself
+        """
+        if response is None:
+            return None
+        error_code = response[1].get('Error', {}).get('Code')
+        if error_code in THROTTLING_ERROR_CODES:
+            import botocore
+            self.record_throttle(service, botocore.xform_name(event_name.split('.')[-1]))
+        return None
+
+    def to_dict(self) -> dict:
+        """
+        Returns the recorded timings
+
+        DesiredReturn:
+            {
+                "Phases": {
+                    str[Phase]: float,
+                },
+                "Calls": {
+                    str[service:operation]: {
+                        "Calls": int,
+                        "Seconds": float,
+                        "Pages": int,
+                        "Items": int,
+                        "Retries": int,
+                        "Throttles": int,
+                    },
+                },
+            }
+        """
+        with self._lock:
+            return {
+                'Phases': {
+                    phase: round(seconds, 6)
+                    for phase, seconds in self._phases.items()
+                },
+                'Calls': {
+                    key: dict(call, Seconds=round(call['Seconds'], 6))
+                    for key, call in sorted(self._calls.items())
+                },
+            }
+
+    def _get_call(self, service: str, operation: str) -> dict:
+        key = f"{service}:{operation}"
+        if key not in self._calls:
+            self._calls[key] = {
+                'Calls': 0,
+                'Seconds': 0.0,
+                'Pages': 0,
+                'Items': 0,
+                'Retries': 0,
+                'Throttles': 0,
+            }
+        return self._calls[key]
+
+
+def count_page_items(page: dict) -> int:
+    """
+    Counts the resources returned in a response page
+    """
+    return sum(
+        len(value) for key, value in page.items()
+        if isinstance(value, list) and key != 'ResponseMetadata'
+    )
+
+
+def count_page_retries(page: dict) -> int:
+    """
+    Returns how many times botocore retried the request of the page
+    """
+    return page.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+
+
+def format_profile_report(timings: dict) -> str:
+    """
+    Formats the recorded timings into a table, slowest calls first
+    """
+    lines = [f"{'Phase':<44}{'Seconds':>10}"]
+    for phase, seconds in timings['Phases'].items():
+        lines.append(f"{phase:<44}{seconds:>10.3f}")
+    lines.append("")
+    lines.append(
+        f"{'Call':<44}{'Seconds':>10}{'Calls':>8}{'Pages':>8}"
+        f"{'Items':>10}{'Retries':>9}{'Throttles':>11}"
+    )
+    calls = sorted(
+        timings['Calls'].items(),
+        key=lambda call: call[1]['Seconds'],
+        reverse=True,
+    )
+    for key, call in calls:
+        lines.append(
+            f"{key:<44}{call['Seconds']:>10.3f}{call['Calls']:>8}{call['Pages']:>8}"
+            f"{call['Items']:>10}{call['Retries']:>9}{call['Throttles']:>11}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,223 @@
+""" Panoptes - AWS - Inventory
+
+Per-run snapshot of the AWS resources used by the analysis. Calls shared
+by several collectors, like describe_instances, are fetched at most once,
+memoized, and the same parsed pages are handed to every collector that
+needs them. Calls read by a single collector are streamed page by page
+instead, so their pages are freed as soon as they are consumed.
+"""
+
+import functools
+import json
+import threading
+import time
+import typing
+import panoptes
+
+
+DEFAULT_MAX_WORKERS = 16
+# Boto3 sessions are not thread-safe while creating clients, and the same
+# session is shared by the inventories of every scanned region
+CLIENT_CREATION_LOCK = threading.Lock()
+
+
+class Inventory:
+    """
+    Memoizes Boto3 clients and the pages of the describe/list calls asked
+    for through pages. Safe to share between collector threads: concurrent
+    callers asking for the same call wait for a single fetch. Calls asked
+    for through iter_pages are streamed, unless recording, which memoizes
+    every call, like for snapshots.
+
+    When region is omitted the session region is used. Every call is
+    timed into the recorder, a new one being created when omitted, and
+    paced by the scheduler. max_workers is the number of collector threads
+    sharing the inventory, and the connection pool size of its clients.
+    Collectors only list the resources needed by the scope, when given.
+    """
+
+    def __init__(
+            self,
+            session: 'boto3.session.Session',
+            region: str = None,
+            recorder: 'panoptes.aws.instrumentation.Recorder' = None,
+            scheduler: 'panoptes.aws.scheduler.Scheduler' = None,
+            max_workers: int = DEFAULT_MAX_WORKERS,
+            scope: 'panoptes.aws.scope.Scope' = None,
+            recording: bool = False):
+        self.session = session
+        self.region = region or getattr(session, 'region_name', None)
+        self.recorder = recorder or panoptes.aws.instrumentation.Recorder()
+        self.scheduler = scheduler or panoptes.aws.scheduler.SCHEDULER
+        self.max_workers = max_workers
+        self.scope = scope
+        self.recording = recording
+        self._clients = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._call_locks = {}
+
+    def client(self, service: str):
+        """
+        Returns the memoized Boto3 client of the service
+        """
+        with self._lock:
+            if service not in self._clients:
+                with CLIENT_CREATION_LOCK:
+                    client = self.session.client(
+                        service,
+                        region_name=self.region,
+                        config=panoptes.aws.scheduler.generate_client_config(
+                            self.max_workers
+                        ),
+                    )
+                self.scheduler.register(client, self.session, service, self.region)
+                client.meta.events.register(
+                    'needs-retry',
+                    functools.partial(self.handle_retry_event, service),
+                )
+                self._clients[service] = client
+            return self._clients[service]
+
+    def handle_retry_event(self, service: str, **kwargs):
+        """
+        Forwards the botocore retry events to the current recorder
+        """
+        return self.recorder.handle_retry_event(service, **kwargs)
+
+    def release(self):
+        """
+        Drops every memoized page, so the raw responses are freed once the
+        analysis is done with them
+        """
+        with self._lock:
+            self._pages = {}
+            self._call_locks = {}
+
+    def refresh(self):
+        """
+        Drops every memoized page and starts a new recorder, keeping the
+        clients warm for the next analysis
+        """
+        self.release()
+        with self._lock:
+            self.recorder = panoptes.aws.instrumentation.Recorder(
+                parent=self.recorder.parent
+            )
+
+    def pages(self, service: str, operation: str, **params) -> typing.List[dict]:
+        """
+        Returns every response page of the call, fetching it only the first
+        time it is asked for. Non-paginated operations return a single page.
+        """
+        key = generate_call_key(service, operation, params)
+        with self._lock:
+            if key in self._pages:
+                return self._pages[key]
+            call_lock = self._call_locks.setdefault(key, threading.Lock())
+
+        with call_lock:
+            with self._lock:
+                if key in self._pages:
+                    return self._pages[key]
+            pages = self.fetch(service, operation, **params)
+            with self._lock:
+                self._pages[key] = pages
+                self._call_locks.pop(key, None)
+            return pages
+
+    def iter_pages(self, service: str, operation: str, **params) -> typing.Iterator[dict]:
+        """
+        Yields the response pages of a call read by a single collector as
+        they arrive, without memoizing them. Calls already memoized, like the
+        ones stored by the asyncio collector or replayed from a snapshot,
+        are served from the memo, and every call is memoized while recording
+        """
+        key = generate_call_key(service, operation, params)
+        with self._lock:
+            pages = self._pages.get(key)
+        if pages is None and self.recording:
+            pages = self.pages(service, operation, **params)
+        if pages is not None:
+            yield from pages
+            return
+        yield from self.stream(service, operation, **params)
+
+    def store(self, service: str, operation: str, pages: typing.List[dict], **params):
+        """
+        Memoizes the pages of a call fetched elsewhere, like by the asyncio
+        collector, unless the call was already fetched
+        """
+        key = generate_call_key(service, operation, params)
+        with self._lock:
+            self._pages.setdefault(key, pages)
+
+    def export(self) -> dict:
+        """
+        Returns every memoized call, keyed by generate_call_key
+        """
+        with self._lock:
+            return dict(self._pages)
+
+    def fetch(self, service: str, operation: str, **params) -> typing.List[dict]:
+        """
+        Calls AWS directly, returning every page
+        """
+        return list(self.stream(service, operation, **params))
+
+    def stream(self, service: str, operation: str, **params) -> typing.Iterator[dict]:
+        """
+        Calls AWS directly, walking the paginator when the operation has one
+        and yielding every page as it arrives. The call is recorded once its
+        last page is read, timing only the requests
+        """
+        client = self.client(service)
+        if client.can_paginate(operation):
+            responses = iter(client.get_paginator(operation).paginate(**params))
+        else:
+            responses = iter_call(getattr(client, operation), params)
+        seconds = 0.0
+        pages = 0
+        items = 0
+        retries = 0
+        while True:
+            started = time.perf_counter()
+            page = next(responses, None)
+            seconds += time.perf_counter() - started
+            if page is None:
+                break
+            pages += 1
+            items += panoptes.aws.instrumentation.count_page_items(page)
+            retries += panoptes.aws.instrumentation.count_page_retries(page)
+            yield page
+        self.recorder.record_call(
+            service=service,
+            operation=operation,
+            seconds=seconds,
+            pages=pages,
+            items=items,
+            retries=retries,
+        )
+
+
+def iter_call(method: typing.Callable, params: dict) -> typing.Iterator[dict]:
+    """
+    Yields the single response of a non-paginated call, made only once the
+    response is asked for
+    """
+    yield method(**params)
+
+
+def generate_call_key(service: str, operation: str, params: dict) -> str:
+    """
+    Generates the memoization key of a call from its service, operation and
+    parameters
+    """
+    return (
+        f"{service}:{operation}:"
+        + json.dumps(params, sort_keys=True, default=str, separators=(',', ':'))
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,166 @@
+""" Panoptes - AWS - Model
+
+Compact records of the analysis. Findings are kept in slotted objects
+instead of dictionaries until they are written, in the reports, the
+findings streams and the state, which matters when every region of every
+account is analyzed in one process. Strings repeated across many records,
+like protocols and VPC IDs, are interned. The writers of
+panoptes.generic.output serialize records like dictionaries, and to_dict
+converts them for callers needing plain dictionaries, like
+yaml.safe_dump.
+
+Records are mappings with the same keys as the documented dictionaries,
+so they are compared and read like them. Their keys are fixed, while the
+values of those keys can be set, like the status of an ingress rule while
+it is analyzed. Keys which don't apply, like the ports of an all traffic
+rule, are left unset.
+
+Security groups are parsed into records too, holding only the fields the
+analysis reads, so the raw responses can be released once parsed.
+"""
+
+import collections.abc
+import sys
+
+
+class Record(collections.abc.Mapping):
+    """
+    Mapping over the slots of the record, in their declared order
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        for key in self.__slots__:
+            if hasattr(self, key):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def items(self) -> list:
+        # Faster than the mixin, which looks every key up again
+        items = []
+        for key in self.__slots__:
+            try:
+                items.append((key, getattr(self, key)))
+            except AttributeError:
+                continue
+        return items
+
+    def to_dict(self) -> dict:
+        """
+        Converts the record, and the records nested in it, to the
+        documented dictionary
+        """
+        return to_dict(self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class SecurityGroup(Record):
+    """
+    Security group as read by the analysis
+    """
+
+    __slots__ = ('GroupName', 'GroupId', 'Description', 'VpcId', 'IpPermissions')
+
+
+class UnusedGroup(Record):
+    """
+    Entry of "UnusedGroups"
+    """
+
+    __slots__ = ('GroupName', 'GroupId', 'Description', 'VpcId')
+
+
+class UnsafeGroup(Record):
+    """
+    Entry of "UnsafeGroups"
+    """
+
+    __slots__ = ('GroupName', 'GroupId', 'Description', 'UnsafePorts')
+
+
+class ExposedGroup(Record):
+    """
+    Entry of "ExposedGroups"
+    """
+
+    __slots__ = ('GroupName', 'GroupId', 'Description', 'ExposedFrom', 'ExposurePath')
+
+
+class IngressRule(Record):
+    """
+    Entry of the "UnsafePorts" of an unsafe group
+    """
+
+    __slots__ = ('IpProtocol', 'CidrIp', 'Status', 'FromPort', 'ToPort')
+
+
+class Finding(Record):
+    """
+    Finding of the streaming analysis
+    """
+
+    __slots__ = ('Type', 'Region', 'Account', 'SecurityGroup', 'Change')
+
+
+def parse_security_group(security_group: dict) -> SecurityGroup:
+    """
+    Keeps only the fields of a described security group read by the
+    analysis, dropping the rest of the response, like its egress rules
+    and tags
+    """
+    parsed_group = SecurityGroup(
+        GroupName=security_group['GroupName'],
+        GroupId=security_group['GroupId'],
+        Description=security_group['Description'],
+        IpPermissions=security_group['IpPermissions'],
+    )
+    if security_group.get('VpcId'):
+        parsed_group['VpcId'] = intern(security_group['VpcId'])
+    return parsed_group
+
+
+def to_dict(value):
+    """
+    Converts records, like the entries kept by the state, to plain
+    dictionaries and lists, returning any other value as it is
+    """
+    if isinstance(value, collections.abc.Mapping):
+        return {key: to_dict(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_dict(item) for item in value]
+    return value
+
+
+def intern(value):
+    """
+    Interns a repeated string, returning any other value as it is
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+if __name__ == "__main__":
+    pass
@@ -1,8 +1,14 @@
 """ Panoptes - AWS - Output
 
 Functions to print specific AWS analysis output.
+
+The human output is rendered by a template compiled only once, streaming
+every security group section straight to the output file instead of
+building the whole report in memory.
 """
 
+import functools
+import typing
 import colorama
 import jinja2
 import panoptes
@@ -11,13 +17,22 @@ import panoptes
 ALL_TRAFFIC_PROTOCOL = "-1"
 COLOR_ALERT = colorama.Fore.LIGHTRED_EX
 COLOR_WARNING = colorama.Fore.LIGHTYELLOW_EX
+COLOR_PALETTE = {
+    "reset": colorama.Style.RESET_ALL,
+    "alert": colorama.Style.RESET_ALL + colorama.Style.BRIGHT + COLOR_ALERT,
+    "warning": colorama.Style.RESET_ALL + colorama.Style.BRIGHT + COLOR_WARNING,
+    "group_id": colorama.Style.RESET_ALL + colorama.Style.BRIGHT + colorama.Fore.MAGENTA,
+    "group_name": colorama.Fore.WHITE,
+}
+NO_COLOR_PALETTE = dict.fromkeys(COLOR_PALETTE, "")
 TEMPLATE = """{{ HEADER }}
 
 
 
 Cloud provider  ->  {{ CLOUD_PROVIDER_NAME }}
 Authentication  ->  {{ CLOUD_PROVIDER_AUTH }}
-Started at      ->  {{ ANALYSIS_START_TIME }}
+{% if REGION %}Region          ->  {{ REGION }}
+{% endif %}Started at      ->  {{ ANALYSIS_START_TIME }}
 Finished at     ->  {{ ANALYSIS_END_TIME }}
 
 
@@ -35,124 +50,234 @@ Finished at     ->  {{ ANALYSIS_END_TIME }}
 {{ rules }}
 {% endfor %}
 {% for notification in UNSAFE_RULES_NOTIFICATIONS %}{{ notification }}
+{% endfor %}
+
+
+{{ THIRD_SECTION }}
+{% for secgroup,path in EXPOSED_SECGROUPS %}{{ secgroup }}
+{{ path }}
+{% endfor %}
+{% for notification in EXPOSED_SECGROUP_NOTIFICATIONS %}{{ notification }}
 {% endfor %}"""
 
 
-def print_human(analysis):
+@functools.lru_cache(maxsize=None)
+def get_human_template() -> jinja2.Template:
+    """
+    Compiles the human output template only once
+    """
+    return jinja2.Template(TEMPLATE)
+
+
+@functools.lru_cache(maxsize=None)
+def init_colors():
+    """
+    Initializes colorama only once, as every call wraps stdout again
+    """
+    colorama.init()
+
+
+def print_human(analysis: dict, color: bool = True) -> str:
     """
     Converts the AWS analysis dictionary into human readable output
     """
-    def generate_ingress_message(protocol, range, cidr_ip, color):
+    return "".join(generate_human(analysis, color=color))
+
+
+def write_human(analysis: dict, output_file: typing.TextIO, color: bool = True):
+    """
+    Streams the human readable output of the AWS analysis into a file
+    """
+    for chunk in generate_human(analysis, color=color):
+        output_file.write(chunk)
+    output_file.write("\n")
+
+
+def generate_human(analysis: dict, color: bool = True) -> typing.Iterator[str]:
+    """
+    Yields the human readable output of any AWS analysis in chunks, with a
+    section per account and region
+    """
+    if 'Accounts' in analysis:
+        separator = ""
+        for account_analysis in analysis['Accounts'].values():
+            yield separator
+            yield from generate_human(account_analysis, color=color)
+            separator = "\n\n"
+        for account, errors in analysis['Metadata']['Errors'].items():
+            if account in analysis['Accounts']:
+                # Failed regions are shown in the section of the account
+                continue
+            yield separator
+            yield panoptes.generic.output.generate_alert_message(
+                f"Account {account} could not be analyzed: "
+                f"{next(iter(errors.values()), '')}",
+                color=color,
+            )
+            separator = "\n\n"
+        return
+
+    if 'Regions' in analysis:
+        separator = ""
+        for region in analysis['Regions']:
+            yield separator
+            yield from generate_human(
+                split_region_analysis(analysis, region),
+                color=color,
+            )
+            separator = "\n\n"
+        for region, error in analysis['Metadata']['Errors'].items():
+            yield separator
+            yield panoptes.generic.output.generate_alert_message(
+                f"Region {region} could not be analyzed: {error}",
+                color=color,
+            )
+            separator = "\n\n"
+        return
+
+    yield from generate_human_section(analysis, color=color)
+
+
+def generate_human_section(analysis: dict, color: bool = True) -> typing.Iterator[str]:
+    """
+    Yields the human readable output of a single region AWS analysis
+    """
+    palette = COLOR_PALETTE if color else NO_COLOR_PALETTE
+
+    def generate_ingress_message(protocol, range, cidr_ip, status):
         return (
-            colorama.Style.RESET_ALL
-            + colorama.Style.BRIGHT
-            + color
-            + "    "
-            + protocol + "   " + range + "   " + cidr_ip
-            + colorama.Style.RESET_ALL
+            f"{palette[status]}    {protocol}   {range}   {cidr_ip}{palette['reset']}"
         )
 
     def generate_security_group_message(security_group):
         return (
-            colorama.Style.RESET_ALL
-            + colorama.Style.BRIGHT
-            + colorama.Fore.MAGENTA + security_group['GroupId']
-            + "   "
-            + colorama.Fore.WHITE + security_group['GroupName']
-            + colorama.Style.RESET_ALL
+            f"{palette['group_id']}{security_group['GroupId']}"
+            f"   {palette['group_name']}{security_group['GroupName']}{palette['reset']}"
         )
 
-    human_output_template = jinja2.Template(TEMPLATE)
+    def generate_unsafe_secgroups():
+        for unsafe_group in unsafe_groups_list:
+            rules = []
+            for ingress in unsafe_group['UnsafePorts']:
+                # Prettifying "protocol"
+                protocol = ingress['IpProtocol'].upper()
+                if protocol == ALL_TRAFFIC_PROTOCOL:
+                    protocol = "All"
+
+                # Prettifying "range"
+                if 'FromPort' in ingress or 'ToPort' in ingress:
+                    if ingress['FromPort'] == ingress["ToPort"]:
+                        range = f"{ingress['FromPort']}"
+                    else:
+                        range = f"{ingress['FromPort']}-{ingress['ToPort']}"
+                else:
+                    range = "All"
+
+                rules.append(
+                    generate_ingress_message(
+                        protocol=protocol,
+                        cidr_ip=ingress['CidrIp'],
+                        range=range,
+                        status=ingress['Status'],
+                    )
+                )
+            rules.append("")
+            yield generate_security_group_message(unsafe_group), "\n".join(rules)
+
+    def generate_exposed_secgroups():
+        for exposed_group in exposed_groups_list:
+            path = " -> ".join(
+                ["internet"] + exposed_group['ExposurePath'] + [exposed_group['GroupId']]
+            )
+            yield (
+                generate_security_group_message(exposed_group),
+                f"{palette['warning']}    {path}{palette['reset']}\n",
+            )
+
     unused_groups_list = analysis['SecurityGroups']['UnusedGroups']
     unsafe_groups_list = analysis['SecurityGroups']['UnsafeGroups']
+    exposed_groups_list = analysis['SecurityGroups']['ExposedGroups']
 
-    colorama.init()
+    if color:
+        init_colors()
     HEADER = panoptes.generic.output.generate_header_message(
-        "PANOPTES Analysis"
+        "PANOPTES Analysis",
+        color=color,
     )
 
     FIRST_SECTION = panoptes.generic.output.generate_section_message(
-        "01. UNUSED SECURITY GROUPS"
+        "01. UNUSED SECURITY GROUPS",
+        color=color,
     )
+    UNUSED_SECGROUPS = map(generate_security_group_message, unused_groups_list)
     UNUSED_SECGROUP_NOTIFICATIONS = []
     if unused_groups_list:
-        UNUSED_SECGROUPS = list(map(generate_security_group_message, unused_groups_list))
         UNUSED_SECGROUP_NOTIFICATIONS.append(
             panoptes.generic.output.generate_warning_message(
-                f"{len(unused_groups_list)} security groups found not being used"
+                f"{len(unused_groups_list)} security groups found not being used",
+                color=color,
             )
         )
     else:
         UNUSED_SECGROUP_NOTIFICATIONS.append(
             panoptes.generic.output.generate_info_message(
-                "All security groups are attached and being used"
+                "All security groups are attached and being used",
+                color=color,
             )
         )
 
     SECOND_SECTION = panoptes.generic.output.generate_section_message(
-        "02. SECURITY GROUPS WITH UNSAFE INGRESS RULES"
+        "02. SECURITY GROUPS WITH UNSAFE INGRESS RULES",
+        color=color,
     )
+    UNSAFE_SECGROUPS = generate_unsafe_secgroups()
     UNSAFE_RULES_NOTIFICATIONS = []
     if unsafe_groups_list:
-        alert_rules = 0
-        warning_rules = 0
-        UNSAFE_SECGROUPS = []
+        rules_by_status = {"alert": 0, "warning": 0}
         for unsafe_group in unsafe_groups_list:
-            secgroup = generate_security_group_message(unsafe_group)
-            rules = ""
-
             for ingress in unsafe_group['UnsafePorts']:
-                # Prettifying "protocol"
-                protocol = ingress['IpProtocol'].upper()
-                if protocol == ALL_TRAFFIC_PROTOCOL:
-                    protocol = "All"
+                rules_by_status[ingress['Status']] += 1
 
-                # Prettifying "range"
-                if any(k in ingress for k in ['FromPort', 'ToPort']):
-                    if ingress['FromPort'] == ingress["ToPort"]:
-                        range = (
-                            f"{ingress['FromPort']}"
-                        )
-                    else:
-                        range = (
-                            f"{ingress['FromPort']}-{ingress['ToPort']}"
-                        )
-                else:
-                    range = "All"
-
-                if ingress['Status'] == "warning":
-                    color = COLOR_WARNING
-                    warning_rules += 1
-                elif ingress['Status'] == "alert":
-                    color = COLOR_ALERT
-                    alert_rules += 1
-
-                rules += (
-                    generate_ingress_message(
-                        protocol=protocol,
-                        cidr_ip=ingress['CidrIp'],
-                        range=range,
-                        color=color,
-                    )+'\n'
-                )
-            UNSAFE_SECGROUPS.append((secgroup, rules))
-    
-        if warning_rules:
+        if rules_by_status["warning"]:
             UNSAFE_RULES_NOTIFICATIONS.append(
                 panoptes.generic.output.generate_warning_message(
-                    f"{warning_rules} rules found with unknown IPs"
+                    f"{rules_by_status['warning']} rules found with unknown IPs",
+                    color=color,
                 )
             )
-        if alert_rules:
+        if rules_by_status["alert"]:
             UNSAFE_RULES_NOTIFICATIONS.append(
                 panoptes.generic.output.generate_alert_message(
-                    f"{alert_rules} rules found with public IPs or all traffic enabled"
+                    f"{rules_by_status['alert']} rules found with public IPs or all traffic enabled",
+                    color=color,
                 )
             )
     else:
         UNSAFE_RULES_NOTIFICATIONS.append(
             panoptes.generic.output.generate_info_message(
-                "All security groups have safe rules"
+                "All security groups have safe rules",
+                color=color,
+            )
+        )
+
+    THIRD_SECTION = panoptes.generic.output.generate_section_message(
+        "03. SECURITY GROUPS EXPOSED THROUGH OTHER GROUPS",
+        color=color,
+    )
+    EXPOSED_SECGROUPS = generate_exposed_secgroups()
+    EXPOSED_SECGROUP_NOTIFICATIONS = []
+    if exposed_groups_list:
+        EXPOSED_SECGROUP_NOTIFICATIONS.append(
+            panoptes.generic.output.generate_warning_message(
+                f"{len(exposed_groups_list)} security groups reachable from internet-open groups",
+                color=color,
+            )
+        )
+    else:
+        EXPOSED_SECGROUP_NOTIFICATIONS.append(
+            panoptes.generic.output.generate_info_message(
+                "No security group is reachable through internet-open groups",
+                color=color,
             )
         )
 
@@ -171,14 +296,33 @@ def print_human(analysis):
         "SECOND_SECTION": SECOND_SECTION,
         "UNSAFE_SECGROUPS": UNSAFE_SECGROUPS,
         "UNSAFE_RULES_NOTIFICATIONS": UNSAFE_RULES_NOTIFICATIONS,
+        "THIRD_SECTION": THIRD_SECTION,
+        "EXPOSED_SECGROUPS": EXPOSED_SECGROUPS,
+        "EXPOSED_SECGROUP_NOTIFICATIONS": EXPOSED_SECGROUP_NOTIFICATIONS,
         "CLOUD_PROVIDER_NAME": analysis["Metadata"]["CloudProvider"]["Name"].upper(),
         "CLOUD_PROVIDER_AUTH": analysis["Metadata"]["CloudProvider"]["Auth"],
+        "REGION": analysis["Metadata"].get("Region"),
         "ANALYSIS_START_TIME": start_time,
         "ANALYSIS_END_TIME": end_time,
     }
 
-    human_output = human_output_template.render(**template_variables)
-    return human_output
+    yield from get_human_template().generate(**template_variables)
+
+
+def split_region_analysis(analysis: dict, region: str) -> dict:
+    """
+    Extracts a single region analysis from a multi-region analysis
+    """
+    region_metadata = analysis['Metadata']['Regions'][region]
+    return {
+        'SecurityGroups': analysis['Regions'][region]['SecurityGroups'],
+        'Metadata': {
+            'StartedAt': region_metadata['StartedAt'],
+            'FinishedAt': region_metadata['FinishedAt'],
+            'CloudProvider': analysis['Metadata']['CloudProvider'],
+            'Region': region,
+        },
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+""" Panoptes - AWS - Scheduler
+
+Throttle-aware pacing of AWS API requests. Every account, service and
+region pair shares a token bucket whose rate follows AIMD: it grows slowly
+while requests succeed and is halved on throttling responses, keeping the
+throughput close to the API limit instead of collapsing under retries.
+
+Botocore's "adaptive" retry mode rate limits each client on its own, while
+every region and account scan creates its own clients. Buckets are shared
+by every client, thread and region scan of the same session instead, and
+clients keep the "standard" retry mode, which retries throttled requests
+with backoff. Quota errors, like LimitExceededException, are not
+throttling and don't slow requests down.
+
+Clients of the asyncio collector wait for their tokens on the event loop
+instead of blocking it, sharing the same buckets as the threaded clients.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+import panoptes
+
+
+INITIAL_RATE = 20.0
+MIN_RATE = 1.0
+MAX_RATE = 200.0
+ADDITIVE_INCREASE = 1.0
+MULTIPLICATIVE_DECREASE = 0.5
+DECREASE_COOLDOWN = 1.0
+MAX_ATTEMPTS = 10
+
+
+class TokenBucket:
+    """
+    Token bucket with an adaptive refill rate, in requests per second. The
+    capacity follows the rate, allowing bursts of one second of requests.
+    """
+
+    def __init__(self, rate: float = INITIAL_RATE):
+        self.rate = rate
+        self.tokens = rate
+        self._updated_at = time.monotonic()
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token when a request is allowed to be sent, returning 0, or
+        else the seconds to wait before trying again
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """
+        Blocks until a request is allowed to be sent
+        """
+        wait = self.try_acquire()
+        while wait:
+            time.sleep(wait)
+            wait = self.try_acquire()
+
+    async def acquire_async(self):
+        """
+        Waits on the running event loop until a request is allowed to be sent
+        """
+        wait = self.try_acquire()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = self.try_acquire()
+
+    def on_success(self):
+        """
+        Additive increase: about one request per second more for every
+        second of requests sent at the current rate
+        """
+        with self._lock:
+            self.rate = min(MAX_RATE, self.rate + ADDITIVE_INCREASE / self.rate)
+
+    def on_throttle(self):
+        """
+        Multiplicative decrease. Concurrent requests throttled by the same
+        burst only decrease the rate once per cooldown
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decreased_at < DECREASE_COOLDOWN:
+                return
+            self._decreased_at = now
+            self._refill()
+            self.rate = max(MIN_RATE, self.rate * MULTIPLICATIVE_DECREASE)
+            self.tokens = min(self.tokens, 0.0)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+class Scheduler:
+    """
+    Hands out the token bucket of every session, service and region. AWS
+    throttles per account, and every scanned account has its own session,
+    so buckets are shared by the inventories of every region and thread
+    using the same session.
+    """
+
+    def __init__(self):
+        self._buckets = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def bucket(self, session, service: str, region: str) -> TokenBucket:
+        """
+        Returns the token bucket of the session, service and region
+        """
+        with self._lock:
+            session_buckets = self._buckets.setdefault(session, {})
+            key = (service, region)
+            if key not in session_buckets:
+                session_buckets[key] = TokenBucket()
+            return session_buckets[key]
+
+    def register(self, client, session, service: str, region: str):
+        """
+        Paces every request attempt of the Boto3 client through its bucket,
+        retries included, and adapts the rate to the responses
+        """
+        bucket = self.bucket(session, service, region)
+
+        def before_send(**kwargs):
+            bucket.acquire()
+
+        client.meta.events.register('before-send', before_send)
+        self.register_feedback(client, bucket)
+
+    def register_async(self, client, session, service: str, region: str):
+        """
+        Same as register for an aiobotocore client, which awaits its event
+        handlers, so requests wait for their tokens without blocking the loop
+        """
+        bucket = self.bucket(session, service, region)
+
+        async def before_send(**kwargs):
+            await bucket.acquire_async()
+
+        client.meta.events.register('before-send', before_send)
+        self.register_feedback(client, bucket)
+
+    def register_feedback(self, client, bucket: TokenBucket):
+        """
+        Adapts the rate of the bucket to the responses of the client
+        """
+        def needs_retry(response=None, **kwargs):
+            if response is None:
+                return None
+            error_code = response[1].get('Error', {}).get('Code')
+            if error_code in panoptes.aws.instrumentation.THROTTLING_ERROR_CODES:
+                bucket.on_throttle()
+            elif error_code is None:
+                bucket.on_success()
+            return None
+
+        client.meta.events.register('needs-retry', needs_retry)
+
+
+def generate_client_config(max_workers: int) -> 'botocore.config.Config':
+    """
+    Generates the Boto3 client config with a connection pool as large as
+    the number of threads sharing the client
+    """
+    import botocore.config
+    return botocore.config.Config(
+        max_pool_connections=max_workers,
+        retries={
+            'mode': 'standard',
+            'max_attempts': MAX_ATTEMPTS,
+        },
+    )
+
+
+SCHEDULER = Scheduler()
+
+
+if __name__ == "__main__":
+    pass
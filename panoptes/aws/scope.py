@@ -0,0 +1,163 @@
+""" Panoptes - AWS - Scope
+
+Scoped scans. Analyzing a subset of the security groups of a region, by
+VPC, group ID or tag, is pushed down to the EC2 API as Filters, so only the
+groups of the scope are listed, and only the network interfaces of their
+VPCs or using them are listed to find their attachments.
+
+The whitelist is never scoped: ranges of other VPCs, like peered ones, keep
+their ingress rules safe, so a scope must not change any verdict.
+"""
+
+import panoptes
+
+
+# Values allowed in a single EC2 filter
+FILTER_VALUES_LIMIT = 200
+
+
+class Scope:
+    """
+    VPC IDs, security group IDs and tags a scan is limited to. Tags map a
+    key to its accepted values, an empty list accepting any value. Groups
+    must match every kind of restriction given, and any value of each one.
+    An empty scope analyzes every group of the region.
+    """
+
+    def __init__(self, vpc_ids: list = None, group_ids: list = None, tags: dict = None):
+        self.vpc_ids = sorted(set(vpc_ids or []))
+        self.group_ids = sorted(set(group_ids or []))
+        self.tags = {key: sorted(set(values)) for key, values in (tags or {}).items()}
+
+    def __bool__(self) -> bool:
+        return bool(self.vpc_ids or self.group_ids or self.tags)
+
+    def generate_vpc_filters(self) -> list:
+        """
+        Generates the EC2 Filters limiting resources to the VPCs of the scope
+        """
+        if not self.vpc_ids:
+            return []
+        return [{'Name': 'vpc-id', 'Values': self.vpc_ids}]
+
+    def generate_security_group_filters(self) -> list:
+        """
+        Generates the EC2 Filters of describe_security_groups
+        """
+        filters = self.generate_vpc_filters()
+        if self.group_ids:
+            filters.append({'Name': 'group-id', 'Values': self.group_ids})
+        for key, values in sorted(self.tags.items()):
+            if values:
+                filters.append({'Name': f'tag:{key}', 'Values': values})
+            else:
+                filters.append({'Name': 'tag-key', 'Values': [key]})
+        return filters
+
+
+def parse_tags(tags: list) -> dict:
+    """
+    Parses "Key=Value" or "Key" entries into the tags of a Scope, a key
+    alone accepting any value
+    """
+    parsed_tags = {}
+    any_value_keys = set()
+    for tag in tags:
+        key, separator, value = tag.partition('=')
+        key = key.strip()
+        parsed_tags.setdefault(key, [])
+        if separator:
+            parsed_tags[key].append(value.strip())
+        else:
+            any_value_keys.add(key)
+    for key in any_value_keys:
+        parsed_tags[key] = []
+    return parsed_tags
+
+
+def list_security_groups(inventory: 'panoptes.aws.inventory.Inventory') -> list:
+    """
+    Lists the security groups of the inventory scope
+    """
+    params = {}
+    if inventory.scope:
+        params['Filters'] = inventory.scope.generate_security_group_filters()
+    return [
+        security_group
+        for page in inventory.pages('ec2', 'describe_security_groups', **params)
+        for security_group in page['SecurityGroups']
+    ]
+
+
+def list_referencing_security_groups(inventory: 'panoptes.aws.inventory.Inventory') -> list:
+    """
+    Lists the security groups whose rules allow any group of the inventory
+    scope, so groups only referenced from outside the scope are still in
+    use. Without a scope every group is already listed
+    """
+    referencing_groups = {}
+    for params in generate_referencing_params(inventory):
+        for page in inventory.pages('ec2', 'describe_security_groups', **params):
+            for security_group in page['SecurityGroups']:
+                referencing_groups[security_group['GroupId']] = security_group
+    return list(referencing_groups.values())
+
+
+def generate_referencing_params(inventory: 'panoptes.aws.inventory.Inventory') -> list:
+    """
+    Generates the parameters of every describe_security_groups call listing
+    the groups which reference the groups of the inventory scope
+    """
+    if not inventory.scope:
+        return []
+    group_ids = [
+        security_group['GroupId'] for security_group in list_security_groups(inventory)
+    ]
+    return [
+        {
+            'Filters': [{
+                'Name': 'ip-permission.group-id',
+                'Values': group_ids[i:i+FILTER_VALUES_LIMIT],
+            }],
+        }
+        for i in range(0, len(group_ids), FILTER_VALUES_LIMIT)
+    ]
+
+
+def generate_scoped_params(
+        inventory: 'panoptes.aws.inventory.Inventory',
+        group_filter: str = None,
+        **params) -> list:
+    """
+    Generates the parameters of every call listing the resources needed by
+    the inventory scope. Resources are filtered by the VPCs of the scope,
+    and by the groups of the scope through group_filter, the filter name of
+    the operation matching resources using a security group. Without a scope
+    a single call with the given parameters is made
+    """
+    scope = inventory.scope
+    if not scope:
+        return [params]
+
+    filters = scope.generate_vpc_filters()
+    if group_filter and (scope.group_ids or scope.tags):
+        group_ids = [
+            security_group['GroupId'] for security_group in list_security_groups(inventory)
+        ]
+        return [
+            dict(
+                params,
+                Filters=filters + [{
+                    'Name': group_filter,
+                    'Values': group_ids[i:i+FILTER_VALUES_LIMIT],
+                }],
+            )
+            for i in range(0, len(group_ids), FILTER_VALUES_LIMIT)
+        ]
+    if filters:
+        return [dict(params, Filters=filters)]
+    return [params]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,116 @@
+""" Panoptes - AWS - Snapshot
+
+Records every raw describe/list response used by the analysis into a
+compressed file, and replays it later without touching AWS. This separates
+the slow API fetch from the analysis itself.
+"""
+
+import gzip
+import json
+import typing
+import panoptes
+
+
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotInventory(panoptes.aws.inventory.Inventory):
+    """
+    Inventory serving the pages recorded in a snapshot, never calling AWS
+    """
+
+    def __init__(
+            self,
+            snapshot: dict,
+            recorder: 'panoptes.aws.instrumentation.Recorder' = None):
+        super().__init__(
+            session=None,
+            region=snapshot['Region'],
+            recorder=recorder,
+        )
+        self._pages = dict(snapshot['Calls'])
+
+    def client(self, service: str):
+        raise panoptes.aws.exceptions.PanoptesAWSSnapshotError(
+            f"Snapshots can't create Boto3 clients, asked for {service}"
+        )
+
+    def release(self):
+        # The snapshot is the only source of its pages
+        pass
+
+    def stream(self, service: str, operation: str, **params) -> typing.Iterator[dict]:
+        raise panoptes.aws.exceptions.PanoptesAWSSnapshotError(
+            "Call not recorded in the snapshot: "
+            + panoptes.aws.inventory.generate_call_key(service, operation, params)
+        )
+
+
+def create_snapshot(session: 'boto3.session.Session', region: str = None) -> dict:
+    """
+    Runs the analysis collection against AWS and records every response
+
+    DesiredReturn:
+        {
+            "Version": int,
+            "Region": str,
+            "CreatedAt": str[ISO 8601 Date],
+            "Calls": {
+                str[service:operation:params]: list[Response pages],
+            },
+        }
+    """
+    inventory = panoptes.aws.inventory.Inventory(session, region=region, recording=True)
+    panoptes.aws.analysis.analyze_security_groups(
+        session=session,
+        inventory=inventory,
+    )
+    calls = {
+        key: [strip_response_metadata(page) for page in pages]
+        for key, pages in inventory.export().items()
+    }
+    return {
+        'Version': SNAPSHOT_VERSION,
+        'Region': inventory.region,
+        'CreatedAt': panoptes.generic.helpers.get_current_time(),
+        'Calls': calls,
+    }
+
+
+def strip_response_metadata(page: dict) -> dict:
+    """
+    Removes request information which is useless for the analysis
+    """
+    return {
+        key: value for key, value in page.items() if key != 'ResponseMetadata'
+    }
+
+
+def save_snapshot(snapshot: dict, snapshot_path: str):
+    """
+    Writes the snapshot as compact gzip compressed JSON
+    """
+    with gzip.open(snapshot_path, 'wt', encoding='utf-8') as snapshot_file:
+        json.dump(
+            snapshot,
+            snapshot_file,
+            separators=(',', ':'),
+            default=str,
+        )
+
+
+def load_snapshot(snapshot_path: str) -> dict:
+    """
+    Reads a snapshot written by save_snapshot
+    """
+    with gzip.open(snapshot_path, 'rt', encoding='utf-8') as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    if snapshot.get('Version') != SNAPSHOT_VERSION:
+        raise panoptes.aws.exceptions.PanoptesAWSSnapshotError(
+            f"Unsupported snapshot version: {snapshot.get('Version')}"
+        )
+    return snapshot
+
+
+if __name__ == "__main__":
+    pass
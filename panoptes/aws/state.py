@@ -0,0 +1,127 @@
+""" Panoptes - AWS - State
+
+Incremental analysis state. Stores a content hash per security group, built
+from its ingress rules, the whitelist digest and its attachment status,
+together with the findings computed for it. Groups whose hash did not change
+since the previous run reuse their cached findings instead of being
+evaluated again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import panoptes
+
+
+STATE_VERSION = 2
+
+
+class AnalysisState:
+    """
+    Cached findings per security group ID. Safe to share between the
+    threads analyzing several regions or accounts.
+    """
+
+    def __init__(self, groups: dict = None):
+        self._previous_groups = groups or {}
+        self._current_groups = {}
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.evaluated = 0
+
+    @classmethod
+    def load(cls, state_path: str) -> 'AnalysisState':
+        """
+        Reads a state file, starting an empty state when it doesn't exist
+        or belongs to another version
+        """
+        if not os.path.exists(state_path):
+            return cls()
+        with open(state_path, 'r') as state_file:
+            state = json.load(state_file)
+        if state.get('Version') != STATE_VERSION:
+            return cls()
+        return cls(groups=state['Groups'])
+
+    def save(self, state_path: str):
+        """
+        Writes the groups seen in this run to the state file, dropping the
+        ones which no longer exist
+        """
+        with self._lock:
+            state = {
+                'Version': STATE_VERSION,
+                'Groups': self._current_groups,
+            }
+        temporary_path = f"{state_path}.tmp"
+        with open(temporary_path, 'w') as state_file:
+            json.dump(
+                state,
+                state_file,
+                separators=(',', ':'),
+                default=panoptes.generic.output.serialize_mapping,
+            )
+        os.replace(temporary_path, state_path)
+
+    def rotate(self):
+        """
+        Starts a new run over the groups seen in the current one, for
+        long-running processes analyzing again without saving the file
+        """
+        with self._lock:
+            self._previous_groups = self._current_groups
+            self._current_groups = {}
+            self.reused = 0
+            self.evaluated = 0
+
+    def get(self, group_id: str, group_hash: str):
+        """
+        Returns the cached (unused_entry, unsafe_entry) findings of the group
+        when its hash didn't change, otherwise None
+        """
+        with self._lock:
+            cached_group = self._previous_groups.get(group_id)
+            if cached_group is None or cached_group['Hash'] != group_hash:
+                return None
+            self._current_groups[group_id] = cached_group
+            self.reused += 1
+        return cached_group['UnusedGroup'], cached_group['UnsafeGroup']
+
+    def put(self, group_id: str, group_hash: str, unused_entry, unsafe_entry):
+        """
+        Stores the findings freshly evaluated for the group
+        """
+        with self._lock:
+            self._current_groups[group_id] = {
+                'Hash': group_hash,
+                'UnusedGroup': unused_entry,
+                'UnsafeGroup': unsafe_entry,
+            }
+            self.evaluated += 1
+
+
+def generate_group_hash(security_group: dict, attached: bool, whitelist_digest: str) -> str:
+    """
+    Generates the content hash of a security group, covering every field
+    used by its findings
+    """
+    content = json.dumps(
+        [
+            security_group['GroupId'],
+            security_group['GroupName'],
+            security_group['Description'],
+            security_group.get('VpcId'),
+            security_group['IpPermissions'],
+            attached,
+            whitelist_digest,
+        ],
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+if __name__ == "__main__":
+    pass
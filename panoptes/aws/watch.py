@@ -0,0 +1,298 @@
+""" Panoptes - AWS - Watch
+
+Long-running analysis. The session, Boto3 clients and incremental state
+are kept warm between scans, and the latest report is served on a local
+HTTP endpoint both as JSON and in the Prometheus text format.
+"""
+
+import http.server
+import json
+import threading
+import time
+import typing
+import panoptes
+
+
+METRICS_PATH = "/metrics"
+ANALYSIS_PATH = "/analysis"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+JSON_CONTENT_TYPE = "application/json"
+
+
+class Watcher:
+    """
+    Analyzes the regions again on every scan through
+    panoptes.aws.analysis.analyze_regions, reusing one inventory per region.
+    Inventories drop their pages before each scan but keep their clients,
+    the whitelist is parsed once, and unchanged security groups reuse the
+    findings of the previous scan through the state, starting with the ones
+    loaded from a state file. max_workers defaults to the one of
+    panoptes.aws.analysis.analyze_regions
+    """
+
+    def __init__(
+            self,
+            session: 'boto3.session.Session',
+            regions: list,
+            whitelist: typing.Optional[list] = None,
+            max_workers: int = None,
+            state: 'panoptes.aws.state.AnalysisState' = None,
+            whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None,
+            engine: str = None,
+            collector: str = None,
+            scope: 'panoptes.aws.scope.Scope' = None):
+        self.session = session
+        self.whitelist_index = panoptes.generic.network.WhitelistIndex(whitelist or [])
+        self.whitelist_cache = whitelist_cache
+        self.max_workers = max_workers or panoptes.aws.analysis.DEFAULT_MAX_WORKERS
+        self.state = state or panoptes.aws.state.AnalysisState()
+        self.engine = engine or panoptes.aws.analysis.PYTHON_ENGINE
+        self.collector = collector or panoptes.aws.analysis.THREADS_COLLECTOR
+        self.scope = scope
+        self.inventories = {
+            region: panoptes.aws.inventory.Inventory(session, region=region, scope=scope)
+            for region in regions
+        }
+        self.report = None
+        self.scans = 0
+        self.failures = 0
+        self.last_error = ""
+        self.last_scan_seconds = 0.0
+        self.last_scan_timestamp = 0.0
+        self._lock = threading.Lock()
+        # The groups of a completed scan are the previous ones of the next
+        self._rotate_state = False
+
+    def scan(self) -> dict:
+        """
+        Runs the analysis of every region, replacing the latest report
+        """
+        started = time.monotonic()
+        if self._rotate_state:
+            self.state.rotate()
+            self._rotate_state = False
+        try:
+            for inventory in self.inventories.values():
+                inventory.refresh()
+            report = panoptes.aws.analysis.analyze_regions(
+                session=self.session,
+                regions=list(self.inventories),
+                whitelist=self.whitelist_index,
+                max_workers=self.max_workers,
+                state=self.state,
+                engine=self.engine,
+                collector=self.collector,
+                whitelist_cache=self.whitelist_cache,
+                scope=self.scope,
+                inventories=self.inventories,
+            )
+        except Exception as error:
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(error)
+            raise
+        finally:
+            # Raw responses are fetched again on the next scan
+            for inventory in self.inventories.values():
+                inventory.release()
+
+        self._rotate_state = True
+        with self._lock:
+            self.report = report
+            self.scans += 1
+            self.last_error = ""
+            self.last_scan_seconds = time.monotonic() - started
+            self.last_scan_timestamp = time.time()
+        return report
+
+    def status(self) -> dict:
+        """
+        Returns the latest report together with the scan statistics
+
+        DesiredReturn:
+            {
+                "Scans": int,
+                "Failures": int,
+                "LastError": str,
+                "LastScanSeconds": float,
+                "LastScanTimestamp": float,
+                "ReusedGroups": int,
+                "EvaluatedGroups": int,
+                "Analysis": dict[Same as panoptes.aws.analysis.analyze_regions] or None,
+            }
+        """
+        with self._lock:
+            return {
+                'Scans': self.scans,
+                'Failures': self.failures,
+                'LastError': self.last_error,
+                'LastScanSeconds': round(self.last_scan_seconds, 3),
+                'LastScanTimestamp': round(self.last_scan_timestamp, 3),
+                'ReusedGroups': self.state.reused,
+                'EvaluatedGroups': self.state.evaluated,
+                'Analysis': self.report,
+            }
+
+
+def generate_prometheus_metrics(status: dict) -> str:
+    """
+    Formats the status of a watcher in the Prometheus text format
+    """
+    metrics = []
+
+    def add_metric(name: str, metric_type: str, help: str, samples: list):
+        metrics.append(f"# HELP {name} {help}")
+        metrics.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_pairs = ",".join(
+                f'{key}="{escape_label_value(label)}"' for key, label in labels.items()
+            )
+            metrics.append(f"{name}{{{label_pairs}}} {value}" if labels else f"{name} {value}")
+
+    add_metric(
+        "panoptes_scans_total", "counter",
+        "Scans finished since the watcher started",
+        [({}, status['Scans'])],
+    )
+    add_metric(
+        "panoptes_scan_failures_total", "counter",
+        "Scans which failed since the watcher started",
+        [({}, status['Failures'])],
+    )
+    add_metric(
+        "panoptes_last_scan_seconds", "gauge",
+        "Duration of the latest scan",
+        [({}, status['LastScanSeconds'])],
+    )
+    add_metric(
+        "panoptes_last_scan_timestamp_seconds", "gauge",
+        "Unix time when the latest scan finished",
+        [({}, status['LastScanTimestamp'])],
+    )
+    add_metric(
+        "panoptes_state_groups", "gauge",
+        "Security groups of the latest scan by how their findings were computed",
+        [
+            ({'source': 'reused'}, status['ReusedGroups']),
+            ({'source': 'evaluated'}, status['EvaluatedGroups']),
+        ],
+    )
+
+    analysis = status['Analysis']
+    if analysis is None:
+        return "\n".join(metrics) + "\n"
+
+    unused_samples = []
+    unsafe_samples = []
+    exposed_samples = []
+    rule_samples = []
+    for region, region_analysis in analysis['Regions'].items():
+        security_groups = region_analysis['SecurityGroups']
+        unused_samples.append(({'region': region}, len(security_groups['UnusedGroups'])))
+        unsafe_samples.append(({'region': region}, len(security_groups['UnsafeGroups'])))
+        exposed_samples.append(({'region': region}, len(security_groups['ExposedGroups'])))
+        rules_by_status = {"alert": 0, "warning": 0}
+        for unsafe_group in security_groups['UnsafeGroups']:
+            for ingress in unsafe_group['UnsafePorts']:
+                rules_by_status[ingress['Status']] += 1
+        for rule_status, count in rules_by_status.items():
+            rule_samples.append(({'region': region, 'status': rule_status}, count))
+
+    region_seconds_samples = []
+    call_seconds_samples = []
+    call_throttles_samples = []
+    for region, region_metadata in analysis['Metadata']['Regions'].items():
+        region_seconds_samples.append(({'region': region}, region_metadata['ElapsedSeconds']))
+        for call, call_timings in region_metadata['Timings']['Calls'].items():
+            labels = {'region': region, 'call': call}
+            call_seconds_samples.append((labels, call_timings['Seconds']))
+            call_throttles_samples.append((labels, call_timings['Throttles']))
+
+    add_metric(
+        "panoptes_unused_security_groups", "gauge",
+        "Security groups not attached to any resource",
+        unused_samples,
+    )
+    add_metric(
+        "panoptes_unsafe_security_groups", "gauge",
+        "Security groups with unsafe ingress rules",
+        unsafe_samples,
+    )
+    add_metric(
+        "panoptes_exposed_security_groups", "gauge",
+        "Security groups reachable from internet-open groups through references",
+        exposed_samples,
+    )
+    add_metric(
+        "panoptes_unsafe_rules", "gauge",
+        "Unsafe ingress rules by status",
+        rule_samples,
+    )
+    add_metric(
+        "panoptes_failed_regions", "gauge",
+        "Regions which could not be analyzed in the latest scan",
+        [({}, len(analysis['Metadata']['Errors']))],
+    )
+    add_metric(
+        "panoptes_region_scan_seconds", "gauge",
+        "Duration of the latest scan of the region",
+        region_seconds_samples,
+    )
+    add_metric(
+        "panoptes_api_call_seconds", "gauge",
+        "Time spent on the AWS call in the latest scan",
+        call_seconds_samples,
+    )
+    add_metric(
+        "panoptes_api_call_throttles", "gauge",
+        "Throttling responses of the AWS call in the latest scan",
+        call_throttles_samples,
+    )
+    return "\n".join(metrics) + "\n"
+
+
+def escape_label_value(value: str) -> str:
+    """
+    Escapes a Prometheus label value
+    """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def start_metrics_server(watcher: Watcher, host: str, port: int) -> http.server.HTTPServer:
+    """
+    Serves the watcher status on a background thread, in the Prometheus
+    text format on /metrics and as JSON on /analysis
+    """
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == METRICS_PATH:
+                body = generate_prometheus_metrics(watcher.status())
+                content_type = PROMETHEUS_CONTENT_TYPE
+            elif path == ANALYSIS_PATH:
+                body = json.dumps(
+                    watcher.status(),
+                    default=panoptes.generic.output.serialize_mapping,
+                )
+                content_type = JSON_CONTENT_TYPE
+            else:
+                self.send_error(404)
+                return
+            encoded_body = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(encoded_body)))
+            self.end_headers()
+            self.wfile.write(encoded_body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    pass
@@ -5,99 +5,139 @@ and known resources
 """
 
 import concurrent.futures
-import boto3
 import panoptes
 
 
-def list_all_safe_ips(session: boto3.session.Session) -> list:
+# Call listing the resources of every source
+SOURCE_CALLS = {
+    'get_vpc_ranges': ('ec2', 'describe_vpcs'),
+    'get_subnet_ranges': ('ec2', 'describe_subnets'),
+    'get_vpc_instance_ips': ('ec2', 'describe_instances'),
+    'get_elastic_ips': ('ec2', 'describe_addresses'),
+}
+
+
+def list_all_safe_ips(
+        session: 'boto3.session.Session',
+        inventory: 'panoptes.aws.inventory.Inventory' = None,
+        whitelist_cache: 'panoptes.aws.cache.WhitelistCache' = None) -> list:
     """
-    Function responsible for aggregating all methods and removing duplicates
+    Function responsible for aggregating all methods and removing duplicates.
+    Sources whose ranges are in the whitelist cache aren't listed again.
+    The whitelist always covers the whole region, even for scoped
+    inventories, so the scope never changes the verdict of a group
     """
     all_safe_ips = []
-    boto_clients = panoptes.aws.authentication.get_boto_clients(session)
+    if inventory is None:
+        inventory = panoptes.aws.inventory.Inventory(session)
+    if whitelist_cache is not None:
+        account = inventory.pages('sts', 'get_caller_identity')[0]['Account']
+
+    def list_safe_ips(whitelist_function) -> list:
+        if whitelist_cache is None:
+            return whitelist_function(inventory)
+        source = whitelist_function.__name__
+        safe_ips = whitelist_cache.get(account, inventory.region, source)
+        if safe_ips is None:
+            safe_ips = whitelist_function(inventory)
+            whitelist_cache.put(account, inventory.region, source, safe_ips)
+        return safe_ips
+
     resources_to_whitelist = [
-        (get_vpc_ranges, boto_clients['ec2']),
-        (get_subnet_ranges, boto_clients['ec2']),
-        (get_vpc_instance_ips, boto_clients['ec2']),
-        (get_elastic_ips, boto_clients['ec2']),
+        get_vpc_ranges,
+        get_subnet_ranges,
+        get_vpc_instance_ips,
+        get_elastic_ips,
     ]
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=inventory.max_workers) as executor:
         running_workers = []
         for whitelist_function in resources_to_whitelist:
-            running_workers.append(executor.submit(*whitelist_function))
+            running_workers.append(executor.submit(list_safe_ips, whitelist_function))
 
         for future in concurrent.futures.as_completed(running_workers):
             all_safe_ips += future.result()
     return all_safe_ips
 
 
-def get_vpc_ranges(ec2) -> list:
+def get_vpc_ranges(inventory) -> list:
     """
     List VPCs CIDR ranges in the account
     """
-    boto_vpcs = ec2.describe_vpcs()
     vpc_ranges = [
-        vpc['CidrBlock'] for vpc in boto_vpcs['Vpcs']
+        vpc['CidrBlock']
+        for page in inventory.iter_pages('ec2', 'describe_vpcs')
+        for vpc in page['Vpcs']
     ]
     return vpc_ranges
 
 
-def get_subnet_ranges(ec2) -> list:
+def get_subnet_ranges(inventory) -> list:
     """
     List Subnets CIDR ranges in the account
     """
-    boto_subnets = ec2.describe_subnets()
     subnet_ranges = [
-        subnet['CidrBlock'] for subnet in boto_subnets['Subnets']
+        subnet['CidrBlock']
+        for page in inventory.iter_pages('ec2', 'describe_subnets')
+        for subnet in page['Subnets']
     ]
     return subnet_ranges
 
 
-def get_vpc_instance_ips(ec2) -> list:
+def get_vpc_instance_ips(inventory) -> list:
     """
     List Public and Private IPs from EC2 instances inside a VPC in the
     account
     """
-    boto_instances = ec2.describe_instances()
     vpc_instances_ips = []
-    for instance_obj in boto_instances['Reservations']:
-        for instance in instance_obj['Instances']:
-            for instance_net in instance['NetworkInterfaces']:
-                if 'Association' in instance_net:
-                    vpc_instances_ips.append(
-                        instance_net['Association']['PublicIp'] + '/32'
+    for page in inventory.pages('ec2', 'describe_instances'):
+        for instance_obj in page['Reservations']:
+            for instance in instance_obj['Instances']:
+                vpc_instances_ips += list_instance_ips(instance)
+    return vpc_instances_ips
+
+
+def list_instance_ips(instance: dict) -> list:
+    """
+    List Public and Private IPs of the network interfaces of a single EC2
+    instance
+    """
+    instance_ips = []
+    for instance_net in instance['NetworkInterfaces']:
+        if 'Association' in instance_net:
+            instance_ips.append(
+                instance_net['Association']['PublicIp'] + '/32'
+            )
+        if 'PrivateIpAddress' in instance_net:
+            instance_ips.append(
+                instance_net['PrivateIpAddress'] + '/32'
+            )
+        if 'PrivateIpAddresses' in instance_net:
+            for priv_ip in instance_net['PrivateIpAddresses']:
+                if 'Association' in priv_ip:
+                    instance_ips.append(
+                        priv_ip['Association']['PublicIp'] + '/32'
                     )
-                if 'PrivateIpAddress' in instance_net:
-                    vpc_instances_ips.append(
-                        instance_net['PrivateIpAddress'] + '/32'
+                if 'PrivateIpAddress' in priv_ip:
+                    instance_ips.append(
+                        priv_ip['PrivateIpAddress'] + '/32'
                     )
-                if 'PrivateIpAddresses' in instance_net:
-                    for priv_ip in instance_net['PrivateIpAddresses']:
-                        if 'Association' in priv_ip:
-                            vpc_instances_ips.append(
-                                priv_ip['Association']['PublicIp'] + '/32'
-                            )
-                        if 'PrivateIpAddress' in priv_ip:
-                            vpc_instances_ips.append(
-                                priv_ip['PrivateIpAddress'] + '/32'
-                            )
-    return vpc_instances_ips
+    return instance_ips
 
 
-def get_elastic_ips(ec2) -> list:
+def get_elastic_ips(inventory) -> list:
     """
     List all Elastic IPs reserved in the account
     """
-    boto_elastic_ips = ec2.describe_addresses()
     elastic_ips = []
-    for elastic_ip in boto_elastic_ips['Addresses']:
-        if 'PrivateIpAddress' in elastic_ip:
+    for boto_elastic_ips in inventory.iter_pages('ec2', 'describe_addresses'):
+        for elastic_ip in boto_elastic_ips['Addresses']:
+            if 'PrivateIpAddress' in elastic_ip:
+                elastic_ips.append(
+                    elastic_ip['PrivateIpAddress'] + '/32'
+                )
             elastic_ips.append(
-                elastic_ip['PrivateIpAddress'] + '/32'
+                elastic_ip['PublicIp'] + '/32'
             )
-        elastic_ips.append(
-            elastic_ip['PublicIp'] + '/32'
-        )
     return elastic_ips
 
 
@@ -2,8 +2,15 @@
 Responsible for organizing the CLI created by Click
 """
 
-from panoptes.cli import aws
-from panoptes.cli import gcp
+import panoptes
+
+
+SUBMODULES = [
+    "aws",
+    "gcp",
+]
+
+__getattr__, __dir__ = panoptes.lazy_submodules(__name__, SUBMODULES)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 Responsible for organizing commands from Panoptes AWS CLI
 """
 
+import time
 import click
 import panoptes
 
@@ -10,7 +11,11 @@ AWS_AVAILABLE_OUTPUT_OPTIONS = [
     'human',
     'json',
     'yml',
+    'ndjson',
 ]
+DEFAULT_WATCH_INTERVAL = 300
+DEFAULT_WATCH_HOST = "127.0.0.1"
+DEFAULT_WATCH_PORT = 9742
 
 
 @click.command(
@@ -20,8 +25,9 @@ AWS_AVAILABLE_OUTPUT_OPTIONS = [
 @click.option(
     '-r', '--region',
     'region',
-    required=True,
-    help='AWS Region to list the security groups',
+    help='(Required unless --from-snapshot) AWS Region to list the security '
+         'groups. Accepts a comma separated list of regions or "all" to '
+         'analyze them concurrently',
     metavar='<region_id>',
 )
 @click.option(
@@ -43,15 +49,132 @@ AWS_AVAILABLE_OUTPUT_OPTIONS = [
     help='Path to whitelist with declared safe IPs and CIDR',
     metavar='<path>',
 )
-def aws_analyze_command(region, profile, output, whitelist_path):
+@click.option(
+    '--max-workers',
+    'max_workers',
+    default=panoptes.aws.analysis.DEFAULT_MAX_WORKERS,
+    show_default=True,
+    help='Maximum number of regions (or account and region pairs) '
+         'analyzed concurrently',
+    type=click.IntRange(min=1),
+)
+@click.option(
+    '--accounts',
+    'accounts',
+    help='Comma separated list of account IDs to analyze assuming --role-name',
+    metavar='<account_id,...>',
+)
+@click.option(
+    '--accounts-file',
+    'accounts_path',
+    help='Path to a file with 1 account ID per line to analyze assuming --role-name',
+    metavar='<path>',
+)
+@click.option(
+    '--role-name',
+    'role_name',
+    help='IAM role assumed into every account from --accounts or --accounts-file',
+    metavar='<role_name>',
+)
+@click.option(
+    '--from-snapshot',
+    'snapshot_path',
+    help='Analyze a file generated by "panoptes aws snapshot" without calling AWS',
+    metavar='<path>',
+)
+@click.option(
+    '--state-file',
+    'state_path',
+    help='Path to the incremental state file. Groups unchanged since the '
+         'previous run reuse its findings, and the file is updated afterwards',
+    metavar='<path>',
+)
+@click.option(
+    '--output-file',
+    'output_path',
+    help='Path to write the analysis output to, instead of stdout',
+    metavar='<path>',
+)
+@click.option(
+    '--no-color',
+    'no_color',
+    is_flag=True,
+    help='Disable colors of the human output, which are already disabled '
+         'when it is not written to a terminal',
+)
+@click.option(
+    '--profile-report',
+    'profile_report',
+    is_flag=True,
+    help='Print a table with the time of every AWS call and analysis phase to stderr',
+)
+@click.option(
+    '--engine',
+    'engine',
+    default=panoptes.aws.analysis.PYTHON_ENGINE,
+    show_default=True,
+    help='Evaluation engine. "columnar" evaluates huge accounts in batched '
+         'array operations and requires numpy',
+    type=click.Choice(panoptes.aws.analysis.ENGINES),
+)
+@click.option(
+    '--collector',
+    'collector',
+    default=panoptes.aws.analysis.THREADS_COLLECTOR,
+    show_default=True,
+    help='How AWS calls are fetched. "asyncio" runs every call as a coroutine '
+         'on one event loop, for many accounts, and requires aiobotocore',
+    type=click.Choice(panoptes.aws.analysis.COLLECTORS),
+)
+@click.option(
+    '--whitelist-cache',
+    'whitelist_cache_path',
+    help='Path to the dynamic whitelist cache. VPC, subnet and Elastic IP '
+         'ranges are reused until they expire, and the file is updated afterwards',
+    metavar='<path>',
+)
+@click.option(
+    '--refresh',
+    'refresh',
+    is_flag=True,
+    help='List every --whitelist-cache source again, ignoring the cached ranges',
+)
+@click.option(
+    '--vpc',
+    'vpc_ids',
+    multiple=True,
+    help='Only analyze the security groups of these VPCs. Accepts a comma '
+         'separated list and can be repeated',
+    metavar='<vpc_id,...>',
+)
+@click.option(
+    '--group-id',
+    'group_ids',
+    multiple=True,
+    help='Only analyze these security groups. Accepts a comma separated list '
+         'and can be repeated',
+    metavar='<group_id,...>',
+)
+@click.option(
+    '--tag',
+    'tags',
+    multiple=True,
+    help='Only analyze the security groups with this tag, any value when '
+         'the value is omitted. Can be repeated',
+    metavar='<key[=value]>',
+)
+def aws_analyze_command(
+        region, profile, output, whitelist_path, max_workers,
+        accounts, accounts_path, role_name, snapshot_path, state_path,
+        output_path, no_color, profile_report, engine, collector,
+        whitelist_cache_path, refresh, vpc_ids, group_ids, tags):
     """
     This function is called when the user types
     "panoptes aws analyze"
     """
     aws_output_options = {
-        "human": panoptes.aws.output.print_human,
-        "json": panoptes.generic.output.print_json,
-        "yml": panoptes.generic.output.print_yml,
+        "json": panoptes.generic.output.write_json,
+        "yml": panoptes.generic.output.write_yml,
     }
 
     if whitelist_path:
@@ -61,17 +184,546 @@ def aws_analyze_command(region, profile, output, whitelist_path):
     else:
         whitelist = []
 
+    state = None
+    if state_path:
+        state = panoptes.aws.state.AnalysisState.load(state_path)
+
+    if snapshot_path and (region or accounts or accounts_path):
+        raise click.UsageError(
+            "--region, --accounts and --accounts-file can't be used with --from-snapshot"
+        )
+    if snapshot_path and (whitelist_cache_path or refresh):
+        raise click.UsageError(
+            "--whitelist-cache and --refresh can't be used with --from-snapshot"
+        )
+    if refresh and not whitelist_cache_path:
+        raise click.UsageError("--refresh requires --whitelist-cache")
+    whitelist_cache = None
+    if whitelist_cache_path:
+        whitelist_cache = panoptes.aws.cache.WhitelistCache.load(
+            whitelist_cache_path,
+            refresh=refresh,
+        )
+
+    scope = generate_scope(vpc_ids, group_ids, tags)
+    if scope and snapshot_path:
+        raise click.UsageError(
+            "--vpc, --group-id and --tag can't be used with --from-snapshot"
+        )
+
+    if collector == panoptes.aws.analysis.ASYNCIO_COLLECTOR and snapshot_path:
+        raise click.UsageError("--collector asyncio can't be used with --from-snapshot")
+
+    recorder = None
+    if profile_report:
+        recorder = panoptes.aws.instrumentation.Recorder()
+
+    check_engine(engine)
+    check_collector(collector)
+
+    if snapshot_path:
+        analyze_function = panoptes.aws.analysis.analyze_security_groups
+        iter_function = panoptes.aws.analysis.iter_findings
+        analysis_arguments = {
+            'session': None,
+            'inventory': panoptes.aws.snapshot.SnapshotInventory(
+                panoptes.aws.snapshot.load_snapshot(snapshot_path),
+                recorder=panoptes.aws.instrumentation.Recorder(parent=recorder),
+            ),
+        }
+    else:
+        if not region:
+            raise click.UsageError("Missing option '-r' / '--region'")
+
+        account_ids = []
+        if accounts:
+            account_ids += [
+                account.strip() for account in accounts.split(',') if account.strip()
+            ]
+        if accounts_path:
+            account_ids += panoptes.generic.helpers.parse_accounts_file(
+                accounts_path=accounts_path
+            )
+        if account_ids and not role_name:
+            raise click.UsageError(
+                "--role-name is required when analyzing --accounts or --accounts-file"
+            )
+
+        multi_region = (
+            region.strip().lower() == panoptes.aws.authentication.ALL_REGIONS
+            or ',' in region
+        )
+        session = panoptes.aws.authentication.create_session(
+            region=None if multi_region else region,
+            profile=profile,
+        )
+
+        if account_ids:
+            analyze_function = panoptes.aws.analysis.analyze_accounts
+            iter_function = panoptes.aws.analysis.iter_accounts_findings
+            analysis_arguments = {
+                'session_pool': panoptes.aws.authentication.SessionPool(
+                    session=session,
+                    role_name=role_name,
+                ),
+                'accounts': list(dict.fromkeys(account_ids)),
+                'regions': panoptes.aws.authentication.resolve_regions(session, region),
+                'max_workers': max_workers,
+            }
+        elif multi_region:
+            analyze_function = panoptes.aws.analysis.analyze_regions
+            iter_function = panoptes.aws.analysis.iter_regions_findings
+            analysis_arguments = {
+                'session': session,
+                'regions': panoptes.aws.authentication.resolve_regions(session, region),
+                'max_workers': max_workers,
+            }
+        else:
+            analyze_function = panoptes.aws.analysis.analyze_security_groups
+            iter_function = panoptes.aws.analysis.iter_findings
+            analysis_arguments = {
+                'session': session,
+            }
+
+    analysis_arguments['whitelist'] = whitelist
+    analysis_arguments['state'] = state
+    analysis_arguments['recorder'] = recorder
+    analysis_arguments['engine'] = engine
+    analysis_arguments['collector'] = collector
+    analysis_arguments['whitelist_cache'] = whitelist_cache
+    analysis_arguments['scope'] = scope
+
+    if output_path:
+        output_context = panoptes.generic.output.open_output_file(output_path)
+    else:
+        output_context = click.open_file('-', 'w')
+    with output_context as output_file:
+        if output == 'ndjson':
+            panoptes.generic.output.write_ndjson(
+                findings=iter_function(**analysis_arguments),
+                output_file=output_file,
+            )
+        else:
+            analysis = analyze_function(**analysis_arguments)
+            render_started = time.perf_counter()
+            if output == 'human':
+                panoptes.aws.output.write_human(
+                    analysis=analysis,
+                    output_file=output_file,
+                    color=not no_color and output_file.isatty(),
+                )
+            else:
+                aws_output_options.get(output)(
+                    analysis=analysis,
+                    output_file=output_file,
+                )
+                output_file.write("\n")
+            if recorder is not None:
+                recorder.record_phase('Render', time.perf_counter() - render_started)
+
+    if state is not None:
+        state.save(state_path)
+    if whitelist_cache is not None:
+        whitelist_cache.save(whitelist_cache_path)
+    if recorder is not None:
+        click.echo(
+            panoptes.aws.instrumentation.format_profile_report(recorder.to_dict()),
+            err=True,
+        )
+
+
+@click.command(
+    'events',
+    help="Apply CloudTrail events to the analysis, printing the findings they change"
+)
+@click.option(
+    '-r', '--region',
+    'region',
+    help='(Required unless --from-snapshot) AWS Region to list the security groups',
+    metavar='<region_id>',
+)
+@click.option(
+    '-p', '--profile',
+    'profile',
+    help='AWS CLI configured profile which will be used',
+    metavar='<profile_name>',
+)
+@click.option(
+    '--whitelist',
+    'whitelist_path',
+    help='Path to whitelist with declared safe IPs and CIDR',
+    metavar='<path>',
+)
+@click.option(
+    '--from-snapshot',
+    'snapshot_path',
+    help='Build the initial analysis from a file generated by "panoptes aws snapshot"',
+    metavar='<path>',
+)
+@click.option(
+    '--events',
+    'events_path',
+    required=True,
+    help='CloudTrail log file, directory of log files, or "-" to read events from stdin',
+    metavar='<path>',
+)
+@click.option(
+    '--follow',
+    'follow',
+    is_flag=True,
+    help='Keep reading new files of the directory, or stdin line by line',
+)
+@click.option(
+    '--poll-interval',
+    'poll_interval',
+    default=panoptes.aws.events.DEFAULT_POLL_INTERVAL,
+    show_default=True,
+    help='Seconds between checks for new files when following a directory',
+    type=click.IntRange(min=1),
+)
+def aws_events_command(
+        region, profile, whitelist_path, snapshot_path, events_path, follow, poll_interval):
+    """
+    This function is called when the user types
+    "panoptes aws events"
+    """
+    if whitelist_path:
+        whitelist = panoptes.generic.helpers.parse_whitelist_file(
+            whitelist_path=whitelist_path
+        )
+    else:
+        whitelist = []
+
+    if snapshot_path:
+        inventory = panoptes.aws.snapshot.SnapshotInventory(
+            panoptes.aws.snapshot.load_snapshot(snapshot_path)
+        )
+    else:
+        if not region:
+            raise click.UsageError("Missing option '-r' / '--region'")
+        session = panoptes.aws.authentication.create_session(
+            region=region,
+            profile=profile,
+        )
+        inventory = panoptes.aws.inventory.Inventory(session, region=region)
+
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(
+        inventory=inventory,
+        whitelist=whitelist,
+    )
+    with click.open_file('-', 'w') as output_file:
+        panoptes.generic.output.write_ndjson(
+            findings=panoptes.aws.events.iter_changed_findings(
+                model=model,
+                events=panoptes.aws.events.iter_events(
+                    events_path=events_path,
+                    follow=follow,
+                    poll_interval=poll_interval,
+                ),
+            ),
+            output_file=output_file,
+        )
+
+
+@click.command(
+    'query',
+    help="List the groups of an analysis exposing a port to unknown IPs"
+)
+@click.option(
+    '--report',
+    'report_path',
+    required=True,
+    help='Path to an analysis generated with "--output json" or "--output yml"',
+    metavar='<path>',
+)
+@click.option(
+    '--port',
+    'port',
+    required=True,
+    help='Port and optional protocol, tcp by default, like 22/tcp or 53/udp',
+    metavar='<port[/protocol]>',
+)
+@click.option(
+    '--internet',
+    'internet',
+    is_flag=True,
+    help='Only list groups exposing the port to the whole internet',
+)
+def aws_query_command(report_path, port, internet):
+    """
+    This function is called when the user types
+    "panoptes aws query"
+    """
+    port_number, _, protocol = port.partition('/')
+    if not port_number.isdigit():
+        raise click.BadParameter(f"{port} is not like 22/tcp", param_hint="'--port'")
+
+    exposure_index = panoptes.aws.exposure.ExposureIndex(
+        panoptes.generic.helpers.parse_report_file(report_path=report_path)
+    )
+    with click.open_file('-', 'w') as output_file:
+        panoptes.generic.output.write_ndjson(
+            findings=exposure_index.query(
+                port=int(port_number),
+                protocol=protocol.lower() or "tcp",
+                internet=internet,
+            ),
+            output_file=output_file,
+        )
+
+
+@click.command(
+    'snapshot',
+    help="Record every AWS response used by the analysis into a file"
+)
+@click.option(
+    '-r', '--region',
+    'region',
+    required=True,
+    help='AWS Region to record',
+    metavar='<region_id>',
+)
+@click.option(
+    '-p', '--profile',
+    'profile',
+    help='AWS CLI configured profile which will be used',
+    metavar='<profile_name>',
+)
+@click.option(
+    '-f', '--file',
+    'snapshot_path',
+    required=True,
+    help='Path of the compressed snapshot file which will be written',
+    metavar='<path>',
+)
+def aws_snapshot_command(region, profile, snapshot_path):
+    """
+    This function is called when the user types
+    "panoptes aws snapshot"
+    """
     session = panoptes.aws.authentication.create_session(
         region=region,
         profile=profile,
     )
 
     if session:
-        analysis = panoptes.aws.analysis.analyze_security_groups(
-            session=session,
-            whitelist=whitelist,
+        panoptes.aws.snapshot.save_snapshot(
+            snapshot=panoptes.aws.snapshot.create_snapshot(session),
+            snapshot_path=snapshot_path,
+        )
+
+
+@click.command(
+    'watch',
+    help="Analyze again on a schedule, serving the latest results over HTTP"
+)
+@click.option(
+    '-r', '--region',
+    'region',
+    required=True,
+    help='AWS Region to list the security groups. Accepts a comma separated '
+         'list of regions or "all"',
+    metavar='<region_id>',
+)
+@click.option(
+    '-p', '--profile',
+    'profile',
+    help='AWS CLI configured profile which will be used',
+    metavar='<profile_name>',
+)
+@click.option(
+    '--whitelist',
+    'whitelist_path',
+    help='Path to whitelist with declared safe IPs and CIDR',
+    metavar='<path>',
+)
+@click.option(
+    '--interval',
+    'interval',
+    default=DEFAULT_WATCH_INTERVAL,
+    show_default=True,
+    help='Seconds between the start of two scans',
+    type=click.IntRange(min=1),
+)
+@click.option(
+    '--host',
+    'host',
+    default=DEFAULT_WATCH_HOST,
+    show_default=True,
+    help='Address the HTTP endpoint listens on',
+)
+@click.option(
+    '--port',
+    'port',
+    default=DEFAULT_WATCH_PORT,
+    show_default=True,
+    help='Port the HTTP endpoint listens on',
+    type=click.IntRange(min=0, max=65535),
+)
+@click.option(
+    '--max-workers',
+    'max_workers',
+    default=panoptes.aws.analysis.DEFAULT_MAX_WORKERS,
+    show_default=True,
+    help='Maximum number of regions analyzed concurrently',
+    type=click.IntRange(min=1),
+)
+@click.option(
+    '--state-file',
+    'state_path',
+    help='Path to the incremental state file, loaded on start and updated after every scan',
+    metavar='<path>',
+)
+@click.option(
+    '--whitelist-cache',
+    'whitelist_cache_path',
+    help='Path to the dynamic whitelist cache, loaded on start and updated after every scan',
+    metavar='<path>',
+)
+@click.option(
+    '--engine',
+    'engine',
+    default=panoptes.aws.analysis.PYTHON_ENGINE,
+    show_default=True,
+    help='Evaluation engine. "columnar" evaluates huge accounts in batched '
+         'array operations and requires numpy',
+    type=click.Choice(panoptes.aws.analysis.ENGINES),
+)
+@click.option(
+    '--collector',
+    'collector',
+    default=panoptes.aws.analysis.THREADS_COLLECTOR,
+    show_default=True,
+    help='How AWS calls are fetched. "asyncio" runs every call as a coroutine '
+         'on one event loop and requires aiobotocore',
+    type=click.Choice(panoptes.aws.analysis.COLLECTORS),
+)
+@click.option(
+    '--vpc',
+    'vpc_ids',
+    multiple=True,
+    help='Only analyze the security groups of these VPCs. Accepts a comma '
+         'separated list and can be repeated',
+    metavar='<vpc_id,...>',
+)
+@click.option(
+    '--group-id',
+    'group_ids',
+    multiple=True,
+    help='Only analyze these security groups. Accepts a comma separated list '
+         'and can be repeated',
+    metavar='<group_id,...>',
+)
+@click.option(
+    '--tag',
+    'tags',
+    multiple=True,
+    help='Only analyze the security groups with this tag, any value when '
+         'the value is omitted. Can be repeated',
+    metavar='<key[=value]>',
+)
+def aws_watch_command(
+        region, profile, whitelist_path, interval, host, port, max_workers, state_path,
+        whitelist_cache_path, engine, collector, vpc_ids, group_ids, tags):
+    """
+    This function is called when the user types
+    "panoptes aws watch"
+    """
+    if whitelist_path:
+        whitelist = panoptes.generic.helpers.parse_whitelist_file(
+            whitelist_path=whitelist_path
+        )
+    else:
+        whitelist = []
+
+    state = None
+    if state_path:
+        state = panoptes.aws.state.AnalysisState.load(state_path)
+
+    whitelist_cache = None
+    if whitelist_cache_path:
+        whitelist_cache = panoptes.aws.cache.WhitelistCache.load(whitelist_cache_path)
+
+    check_engine(engine)
+    check_collector(collector)
+
+    session = panoptes.aws.authentication.create_session(
+        region=None,
+        profile=profile,
+    )
+    watcher = panoptes.aws.watch.Watcher(
+        session=session,
+        regions=panoptes.aws.authentication.resolve_regions(session, region),
+        whitelist=whitelist,
+        max_workers=max_workers,
+        state=state,
+        whitelist_cache=whitelist_cache,
+        engine=engine,
+        collector=collector,
+        scope=generate_scope(vpc_ids, group_ids, tags),
+    )
+    server = panoptes.aws.watch.start_metrics_server(watcher, host=host, port=port)
+    click.echo(
+        panoptes.generic.output.generate_info_message(
+            f"Serving http://{host}:{server.server_port}"
+            f"{panoptes.aws.watch.METRICS_PATH} and {panoptes.aws.watch.ANALYSIS_PATH}"
+        ),
+        err=True,
+    )
+
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                watcher.scan()
+            except Exception as error:
+                click.echo(
+                    panoptes.generic.output.generate_alert_message(f"Scan failed: {error}"),
+                    err=True,
+                )
+            else:
+                if state_path:
+                    watcher.state.save(state_path)
+                if whitelist_cache_path:
+                    whitelist_cache.save(whitelist_cache_path)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+def check_engine(engine: str):
+    """
+    Fails when the dependencies of the evaluation engine are missing
+    """
+    if (engine == panoptes.aws.analysis.COLUMNAR_ENGINE
+            and not panoptes.aws.columnar.is_available()):
+        raise click.UsageError(
+            'The columnar engine requires numpy, install it with "pip install panoptes[columnar]"'
+        )
+
+
+def check_collector(collector: str):
+    """
+    Fails when the dependencies of the collector are missing
+    """
+    if (collector == panoptes.aws.analysis.ASYNCIO_COLLECTOR
+            and not panoptes.aws.aio.is_available()):
+        raise click.UsageError(
+            'The asyncio collector requires aiobotocore, install it with "pip install panoptes[asyncio]"'
         )
-        print(aws_output_options.get(output)(analysis=analysis))
+
+
+def generate_scope(vpc_ids: tuple, group_ids: tuple, tags: tuple) -> 'panoptes.aws.scope.Scope':
+    """
+    Generates the scope of the --vpc, --group-id and --tag options
+    """
+    return panoptes.aws.scope.Scope(
+        vpc_ids=panoptes.generic.helpers.parse_comma_separated(vpc_ids),
+        group_ids=panoptes.generic.helpers.parse_comma_separated(group_ids),
+        tags=panoptes.aws.scope.parse_tags(tags),
+    )
 
 
 if __name__ == "__main__":
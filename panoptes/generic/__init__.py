@@ -2,8 +2,16 @@
 Responsible for generic helper functions
 """
 
-from panoptes.generic import helpers
-from panoptes.generic import output
+import panoptes
+
+
+SUBMODULES = [
+    "helpers",
+    "network",
+    "output",
+]
+
+__getattr__, __dir__ = panoptes.lazy_submodules(__name__, SUBMODULES)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
 """ Panoptes - Generic - Helpers
 
-Just a collection of generic functions to help cloud provider analysis
+Just a collection of generic functions to help cloud provider analysis.
+Parsers like dateutil and yaml are imported only by the functions using them.
 """
 
 import datetime
-import dateutil
+import json
 
 def get_current_time() -> str:
     """
@@ -24,6 +25,7 @@ def convert_string_datetime(timestr: str) -> datetime.datetime:
     """
     Converts any string into a datetime object
     """
+    import dateutil.parser
     return dateutil.parser.parse(timestr)
 
 
@@ -34,3 +36,43 @@ def parse_whitelist_file(whitelist_path: str) -> list:
     with open(whitelist_path, 'r') as whitelist_file:
         whitelist = whitelist_file.read().splitlines()
     return whitelist
+
+
+def parse_accounts_file(accounts_path: str) -> list:
+    """
+    Receives an accounts_path containing 1 account ID per line and returns a
+    list, ignoring blank lines and comments starting with "#"
+    """
+    with open(accounts_path, 'r') as accounts_file:
+        accounts = [
+            line.split('#', 1)[0].strip()
+            for line in accounts_file.read().splitlines()
+        ]
+    return [account for account in accounts if account]
+
+
+def parse_comma_separated(values: list) -> list:
+    """
+    Receives option values, each one possibly a comma separated list, and
+    returns every value stripped, ignoring empty ones
+    """
+    return [
+        value.strip()
+        for values_entry in values
+        for value in values_entry.split(',')
+        if value.strip()
+    ]
+
+
+def parse_report_file(report_path: str) -> dict:
+    """
+    Receives a report_path containing an analysis in JSON or YAML and
+    returns it as a dictionary
+    """
+    with open(report_path, 'r') as report_file:
+        content = report_file.read()
+    try:
+        return json.loads(content)
+    except ValueError:
+        import yaml
+        return yaml.safe_load(content)
@@ -0,0 +1,157 @@
+""" Panoptes - Generic - Network
+
+Network helpers shared by every cloud provider analysis. The whitelist index
+is a binary prefix trie over IPv4 and IPv6 networks, answering whether a CIDR
+is covered by any whitelisted network in O(prefix length).
+"""
+
+import functools
+import hashlib
+import ipaddress
+import typing
+
+
+PARSED_NETWORKS_CACHE_SIZE = 65536
+
+
+class WhitelistIndex:
+    """
+    Prefix trie of whitelisted networks. A CIDR is considered whitelisted
+    when it is equal to or contained in any of the indexed networks.
+
+    Each trie node is a list [zero_child, one_child, is_terminal].
+    """
+
+    def __init__(self, cidrs: typing.Iterable[str] = ()):
+        self._roots = {
+            4: [None, None, False],
+            6: [None, None, False],
+        }
+        self._size = 0
+        self.update(cidrs)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, cidr: str) -> bool:
+        return self.contains(cidr)
+
+    def update(self, cidrs: typing.Iterable[str]):
+        """
+        Adds every valid CIDR or IP from the iterable, ignoring blank or
+        malformed entries
+        """
+        for cidr in cidrs:
+            self.add(cidr)
+
+    def add(self, cidr: str) -> bool:
+        """
+        Adds a single CIDR or IP to the index, returns False when the entry
+        can't be parsed
+        """
+        network = parse_network(cidr)
+        if network is None:
+            return False
+
+        node = self._roots[network.version]
+        address = int(network.network_address)
+        max_prefix = network.max_prefixlen
+        for bit_position in range(network.prefixlen):
+            if node[2]:
+                # Already covered by a shorter whitelisted prefix
+                return True
+            bit = (address >> (max_prefix - 1 - bit_position)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        if not node[2]:
+            node[2] = True
+            self._size += 1
+        return True
+
+    def contains(self, cidr: str) -> bool:
+        """
+        Returns True when the CIDR or IP is inside any indexed network
+        """
+        network = parse_network(cidr)
+        if network is None:
+            return False
+
+        node = self._roots[network.version]
+        address = int(network.network_address)
+        max_prefix = network.max_prefixlen
+        for bit_position in range(network.prefixlen):
+            if node[2]:
+                return True
+            node = node[(address >> (max_prefix - 1 - bit_position)) & 1]
+            if node is None:
+                return False
+        return node[2]
+
+    def copy(self) -> 'WhitelistIndex':
+        """
+        Returns an independent copy of the index, so networks added to the
+        copy don't change this one
+        """
+        whitelist_index = WhitelistIndex()
+        for version, root in self._roots.items():
+            stack = [(root, whitelist_index._roots[version])]
+            while stack:
+                node, copied_node = stack.pop()
+                copied_node[2] = node[2]
+                for bit in (0, 1):
+                    if node[bit] is not None:
+                        copied_node[bit] = [None, None, False]
+                        stack.append((node[bit], copied_node[bit]))
+        whitelist_index._size = self._size
+        return whitelist_index
+
+    def networks(self) -> typing.Iterator[str]:
+        """
+        Yields every indexed network in address order
+        """
+        network_classes = (
+            (4, 32, ipaddress.IPv4Network),
+            (6, 128, ipaddress.IPv6Network),
+        )
+        for version, max_prefix, network_class in network_classes:
+            stack = [(self._roots[version], 0, 0)]
+            while stack:
+                node, address, prefix = stack.pop()
+                if node[2]:
+                    yield str(network_class(
+                        (address << (max_prefix - prefix), prefix)
+                    ))
+                    continue
+                for bit in (1, 0):
+                    if node[bit] is not None:
+                        stack.append((node[bit], (address << 1) | bit, prefix + 1))
+
+    def digest(self) -> str:
+        """
+        Returns a SHA-256 digest of the indexed networks, the same for any
+        insertion order
+        """
+        whitelist_hash = hashlib.sha256()
+        for network in self.networks():
+            whitelist_hash.update(network.encode() + b"\n")
+        return whitelist_hash.hexdigest()
+
+
+@functools.lru_cache(maxsize=PARSED_NETWORKS_CACHE_SIZE)
+def parse_network(cidr: str):
+    """
+    Parses a CIDR or IP string into an ipaddress network, returning None for
+    blank or malformed entries. Networks are immutable, so the same CIDR
+    repeated across rules is parsed only once
+    """
+    if not cidr:
+        return None
+    try:
+        return ipaddress.ip_network(cidr.strip(), strict=False)
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    pass
@@ -1,10 +1,64 @@
 """ Panoptes - Generic - Output
-Responsible for generic outputs used through Panoptes module
+Responsible for generic outputs used through Panoptes module. colorama and
+yaml are imported only by the outputs using them.
+
+YAML is written by the libyaml C emitter when PyYAML was built with it.
+JSON documents written to a file are streamed in chunks instead of being
+built in memory first, and JSON lines are written by orjson when it is
+installed, with the same bytes as without it.
 """
 
+import collections.abc
+import contextlib
+import functools
 import json
-import colorama
-import yaml
+import os
+import typing
+
+
+WRITE_CHUNK_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=None)
+def get_mapping_dumper() -> type:
+    """
+    Returns a YAML dumper writing mappings which aren't dictionaries, like
+    the records of the analysis, as plain YAML mappings. It uses the libyaml
+    C emitter when available
+    """
+    import yaml
+
+    class MappingDumper(getattr(yaml, 'CDumper', yaml.Dumper)):
+        pass
+
+    MappingDumper.add_multi_representer(
+        collections.abc.Mapping,
+        lambda dumper, mapping: dumper.represent_dict(mapping),
+    )
+    return MappingDumper
+
+
+@functools.lru_cache(maxsize=None)
+def get_fast_json():
+    """
+    Returns the optional orjson module, a faster JSON backend, or None when
+    it isn't installed
+    """
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def serialize_mapping(value) -> dict:
+    """
+    Converts mappings which aren't dictionaries, like the records of the
+    analysis, while serializing to JSON
+    """
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
 def print_json(analysis: dict):
@@ -14,7 +68,8 @@ def print_json(analysis: dict):
     return json.dumps(
         analysis,
         indent=4,
-        sort_keys=True
+        sort_keys=True,
+        default=serialize_mapping,
     )
 
 
@@ -22,17 +77,102 @@ def print_yml(analysis: dict):
     """
     Converts the any analysis dictionary into YML output
     """
+    import yaml
     return yaml.dump(
         analysis,
+        Dumper=get_mapping_dumper(),
+        allow_unicode=True,
+        default_flow_style=False,
+    )
+
+
+def write_json(analysis: dict, output_file: typing.TextIO):
+    """
+    Writes the analysis as prettified JSON with sorted keys, the same as
+    print_json, streamed without building the whole document in memory
+    """
+    encoder = json.JSONEncoder(
+        indent=4,
+        sort_keys=True,
+        default=serialize_mapping,
+    )
+    chunks = []
+    chunks_size = 0
+    for chunk in encoder.iterencode(analysis):
+        chunks.append(chunk)
+        chunks_size += len(chunk)
+        if chunks_size >= WRITE_CHUNK_SIZE:
+            output_file.write("".join(chunks))
+            chunks = []
+            chunks_size = 0
+    output_file.write("".join(chunks))
+
+
+def write_yml(analysis: dict, output_file: typing.TextIO):
+    """
+    Writes the analysis as YML, the same as print_yml, streaming it from the
+    emitter into the file
+    """
+    import yaml
+    yaml.dump(
+        analysis,
+        output_file,
+        Dumper=get_mapping_dumper(),
         allow_unicode=True,
         default_flow_style=False,
     )
 
 
-def generate_alert_message(content: str):
+def write_ndjson(findings: typing.Iterable[dict], output_file: typing.TextIO):
+    """
+    Writes every finding as one JSON line as soon as it arrives, with sorted
+    keys and non-ASCII characters as UTF-8. Lines are serialized by orjson
+    when it is installed
+    """
+    orjson = get_fast_json()
+    for finding in findings:
+        if orjson is not None:
+            line = orjson.dumps(
+                finding,
+                option=orjson.OPT_SORT_KEYS,
+                default=serialize_mapping,
+            ).decode()
+        else:
+            line = json.dumps(
+                finding,
+                sort_keys=True,
+                separators=(',', ':'),
+                ensure_ascii=False,
+                default=serialize_mapping,
+            )
+        output_file.write(line + "\n")
+        output_file.flush()
+
+
+@contextlib.contextmanager
+def open_output_file(output_path: str) -> typing.Iterator[typing.TextIO]:
+    """
+    Opens a temporary file next to the output file, replacing the output
+    file with it only once everything was written, so a failed analysis
+    leaves the previous output as it was
+    """
+    temporary_path = f"{output_path}.tmp"
+    try:
+        with open(temporary_path, 'w', encoding='utf-8') as output_file:
+            yield output_file
+        os.replace(temporary_path, output_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def generate_alert_message(content: str, color: bool = True):
     """
     Receives the ALERT message content and colorizes it
     """
+    import colorama
+    if not color:
+        return f"ALERT: {content}"
     return (
         colorama.Style.RESET_ALL
         + colorama.Fore.LIGHTRED_EX
@@ -41,10 +181,13 @@ def generate_alert_message(content: str):
     )
 
 
-def generate_info_message(content: str):
+def generate_info_message(content: str, color: bool = True):
     """
     Receives the INFO message content and colorizes it
     """
+    import colorama
+    if not color:
+        return f"INFO: {content}"
     return (
         colorama.Style.RESET_ALL
         + colorama.Fore.LIGHTCYAN_EX
@@ -53,10 +196,13 @@ def generate_info_message(content: str):
     )
 
 
-def generate_warning_message(content: str):
+def generate_warning_message(content: str, color: bool = True):
     """
     Receives the WARNING message content and colorizes it
     """
+    import colorama
+    if not color:
+        return f"WARNING: {content}"
     return (
         colorama.Style.RESET_ALL
         + colorama.Fore.YELLOW
@@ -65,10 +211,13 @@ def generate_warning_message(content: str):
     )
 
 
-def generate_section_message(content: str):
+def generate_section_message(content: str, color: bool = True):
     """
     Receives the SECTION message content and colorizes it
     """
+    import colorama
+    if not color:
+        return content
     return (
         colorama.Style.RESET_ALL
         + colorama.Style.BRIGHT
@@ -78,8 +227,22 @@ def generate_section_message(content: str):
     )
 
 
-def generate_header_message(content: str, special_char: str = "=", special_len: int = 61):
+def generate_header_message(
+        content: str,
+        special_char: str = "=",
+        special_len: int = 61,
+        color: bool = True):
+    import colorama
     horizontal = special_len * special_char
+    if not color:
+        return (
+            horizontal + "\n"
+            + centralize_content_from_base_string(
+                content=content,
+                base_string=horizontal,
+            ) + "\n"
+            + horizontal
+        )
     return(
         colorama.Style.RESET_ALL
         + colorama.Style.BRIGHT
@@ -1,8 +1,41 @@
 #!/usr/bin/env python
+import importlib
 import click
-import pkg_resources
-import panoptes.cli.aws
-import panoptes.cli.gcp
+
+
+"""
+Commands of every Click Group, imported only when the command is invoked or
+listed, so each command loads only the dependencies it needs
+"""
+AWS_COMMANDS = {
+    'analyze': "panoptes.cli.aws:aws_analyze_command",
+    'events': "panoptes.cli.aws:aws_events_command",
+    'query': "panoptes.cli.aws:aws_query_command",
+    'snapshot': "panoptes.cli.aws:aws_snapshot_command",
+    'watch': "panoptes.cli.aws:aws_watch_command",
+}
+GCP_COMMANDS = {
+    'analyze': "panoptes.cli.gcp:gcp_analyze_command",
+}
+
+
+class LazyGroup(click.Group):
+    """
+    Click Group importing the module of its commands on demand
+    """
+
+    def __init__(self, *args, lazy_commands: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: click.Context) -> list:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx: click.Context, command_name: str):
+        if command_name in self.lazy_commands:
+            module_name, attribute = self.lazy_commands[command_name].split(':')
+            return getattr(importlib.import_module(module_name), attribute)
+        return super().get_command(ctx, command_name)
 
 
 @click.group()
@@ -19,6 +52,8 @@ def main():
 
 @main.group(
     'aws',
+    cls=LazyGroup,
+    lazy_commands=AWS_COMMANDS,
     help='Amazon Web Services'
 )
 def aws_group():
@@ -27,6 +62,8 @@ def aws_group():
 
 @main.group(
     'gcp',
+    cls=LazyGroup,
+    lazy_commands=GCP_COMMANDS,
     help='Google Cloud Plataform'
 )
 def gcp_group():
@@ -38,14 +75,20 @@ def gcp_group():
     help='Show Panoptes version'
 )
 def version_command():
-    print(pkg_resources.get_distribution("panoptes").version)
+    print(get_version())
 
 
-"""
-Adding commands to Click Groups
-"""
-aws_group.add_command(panoptes.cli.aws.aws_analyze_command)
-gcp_group.add_command(panoptes.cli.gcp.gcp_analyze_command)
+def get_version() -> str:
+    """
+    Returns the installed Panoptes version
+    """
+    try:
+        import importlib.metadata
+    except ImportError:
+        # Python 3.7 has no importlib.metadata
+        import pkg_resources
+        return pkg_resources.get_distribution("panoptes").version
+    return importlib.metadata.version("panoptes")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+""" Panoptes - Tests - AWS
+
+Fixtures building in-memory snapshots, so the analysis runs through
+panoptes.aws.snapshot.SnapshotInventory without calling AWS.
+"""
+
+import pytest
+import panoptes
+from tests.aws.helpers import generate_snapshot
+
+
+@pytest.fixture
+def snapshot_inventory():
+    """
+    Returns a function building a SnapshotInventory from the resources
+    accepted by generate_snapshot
+    """
+    def build(**resources) -> 'panoptes.aws.snapshot.SnapshotInventory':
+        return panoptes.aws.snapshot.SnapshotInventory(generate_snapshot(**resources))
+    return build
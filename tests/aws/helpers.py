@@ -0,0 +1,124 @@
+""" Panoptes - Tests - AWS - Helpers
+
+Builders of the AWS resources and snapshots used by the tests.
+"""
+
+import panoptes
+
+
+ACCOUNT_ID = "123456789012"
+REGION = "us-east-1"
+
+
+def generate_call_key(service: str, operation: str, **params) -> str:
+    return panoptes.aws.inventory.generate_call_key(service, operation, params)
+
+
+def generate_security_group(
+        group_id: str,
+        ip_permissions: list = (),
+        vpc_id: str = "vpc-1",
+        tags: list = ()) -> dict:
+    return {
+        'GroupName': f"name-{group_id}",
+        'GroupId': group_id,
+        'Description': f"Description of {group_id}",
+        'VpcId': vpc_id,
+        'IpPermissions': list(ip_permissions),
+        'Tags': list(tags),
+    }
+
+
+def generate_ip_permission(
+        protocol: str = "tcp",
+        from_port: int = 22,
+        to_port: int = None,
+        cidrs: list = (),
+        ipv6_cidrs: list = (),
+        group_ids: list = ()) -> dict:
+    ip_permission = {
+        'IpProtocol': protocol,
+        'IpRanges': [{'CidrIp': cidr} for cidr in cidrs],
+        'Ipv6Ranges': [{'CidrIpv6': cidr} for cidr in ipv6_cidrs],
+        'UserIdGroupPairs': [{'GroupId': group_id} for group_id in group_ids],
+    }
+    if protocol != "-1":
+        ip_permission['FromPort'] = from_port
+        ip_permission['ToPort'] = from_port if to_port is None else to_port
+    return ip_permission
+
+
+def generate_snapshot(
+        security_groups: list = (),
+        instances: list = (),
+        network_interfaces: list = (),
+        vpcs: list = (),
+        subnets: list = (),
+        addresses: list = (),
+        region: str = REGION) -> dict:
+    """
+    Generates a snapshot replaying the calls of an unscoped analysis
+    """
+    calls = {
+        generate_call_key('ec2', 'describe_security_groups'): [
+            {'SecurityGroups': list(security_groups)}
+        ],
+        generate_call_key('ec2', 'describe_instances'): [
+            {'Reservations': [{'Instances': list(instances)}]}
+        ],
+        generate_call_key(
+            'ec2', 'describe_network_interfaces', PaginationConfig={'PageSize': 1000}
+        ): [{'NetworkInterfaces': list(network_interfaces)}],
+        generate_call_key('ec2', 'describe_vpcs'): [{'Vpcs': list(vpcs)}],
+        generate_call_key('ec2', 'describe_subnets'): [{'Subnets': list(subnets)}],
+        generate_call_key('ec2', 'describe_addresses'): [{'Addresses': list(addresses)}],
+        generate_call_key('rds', 'describe_db_instances'): [{'DBInstances': []}],
+        generate_call_key('elb', 'describe_load_balancers'): [{'LoadBalancerDescriptions': []}],
+        generate_call_key('elbv2', 'describe_load_balancers'): [{'LoadBalancers': []}],
+        generate_call_key('lambda', 'list_functions'): [{'Functions': []}],
+        generate_call_key('elasticache', 'describe_cache_clusters'): [{'CacheClusters': []}],
+        generate_call_key('elasticache', 'describe_cache_security_groups'): [
+            {'CacheSecurityGroups': []}
+        ],
+        generate_call_key('ecs', 'list_clusters'): [{'clusterArns': []}],
+        generate_call_key('sts', 'get_caller_identity'): [{
+            'Arn': f"arn:aws:iam::{ACCOUNT_ID}:user/tests",
+            'Account': ACCOUNT_ID,
+        }],
+    }
+    return {
+        'Version': panoptes.aws.snapshot.SNAPSHOT_VERSION,
+        'Region': region,
+        'CreatedAt': "2020-01-01T00:00:00",
+        'Calls': calls,
+    }
+
+
+class StubbedSession:
+    """
+    Boto3 session creating every client once, stubbed by botocore's Stubber
+    """
+
+    def __init__(self, region: str = REGION):
+        import boto3
+        self.session = boto3.session.Session(
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+            region_name=region,
+        )
+        self.region_name = region
+        self.clients = {}
+        self.stubbers = {}
+
+    def client(self, service: str, region_name: str = None, config=None):
+        if service not in self.clients:
+            import botocore.stub
+            client = self.session.client(service, region_name=region_name, config=config)
+            self.stubbers[service] = botocore.stub.Stubber(client)
+            self.stubbers[service].activate()
+            self.clients[service] = client
+        return self.clients[service]
+
+    def stub(self, service: str) -> 'botocore.stub.Stubber':
+        self.client(service, region_name=self.region_name)
+        return self.stubbers[service]
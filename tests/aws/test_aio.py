@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import panoptes
+from tests.aws.helpers import generate_security_group
+
+
+async def get_loop_thread() -> int:
+    return threading.get_ident()
+
+
+def test_run_works_inside_a_running_loop():
+    async def run_from_coroutine() -> int:
+        return panoptes.aws.aio.run(get_loop_thread())
+
+    loop_thread = asyncio.run(run_from_coroutine())
+
+    assert loop_thread != threading.get_ident()
+
+
+def test_run_shares_one_loop_between_threads():
+    loop_threads = set()
+
+    def run_in_thread():
+        loop_threads.add(panoptes.aws.aio.run(get_loop_thread()))
+
+    threads = [threading.Thread(target=run_in_thread) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loop_threads) == 1
+    assert panoptes.aws.aio.get_collector() is panoptes.aws.aio.get_collector()
+
+
+def test_snapshots_are_not_collected(snapshot_inventory):
+    inventory = snapshot_inventory(security_groups=[generate_security_group("sg-1")])
+
+    analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=inventory,
+        collector=panoptes.aws.analysis.ASYNCIO_COLLECTOR,
+    )
+
+    assert [
+        unused_group['GroupId'] for unused_group in analysis['SecurityGroups']['UnusedGroups']
+    ] == ["sg-1"]
@@ -0,0 +1,132 @@
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group, generate_snapshot
+
+
+def analyze_snapshot(region: str, **resources) -> dict:
+    return panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=panoptes.aws.snapshot.SnapshotInventory(
+            generate_snapshot(region=region, **resources)
+        ),
+    )
+
+
+def test_analyze_regions_reports_failed_regions(monkeypatch):
+    def analyze_region_timed(session, region, *args, **kwargs):
+        if region == "ap-east-1":
+            raise RuntimeError("AuthFailure")
+        return region, analyze_snapshot(
+            region, security_groups=[generate_security_group(f"sg-{region}")]
+        ), 0.1
+
+    monkeypatch.setattr(panoptes.aws.analysis, 'analyze_region_timed', analyze_region_timed)
+    report = panoptes.aws.analysis.analyze_regions(
+        session=None,
+        regions=["us-east-1", "ap-east-1", "eu-west-1"],
+    )
+
+    assert list(report['Regions']) == ["eu-west-1", "us-east-1"]
+    assert report['Metadata']['Errors'] == {"ap-east-1": "AuthFailure"}
+    assert [
+        group['GroupId'] for group in report['Regions']['eu-west-1']['SecurityGroups']['UnusedGroups']
+    ] == ["sg-eu-west-1"]
+
+
+def test_analyze_accounts_keeps_the_regions_which_succeeded(monkeypatch):
+    class SessionPool:
+        def get_base_identity(self) -> str:
+            return "arn:aws:iam::123456789012:user/tests"
+
+        def assume(self, account: str):
+            if account == "333333333333":
+                raise RuntimeError("AccessDenied")
+
+        def get(self, account: str) -> str:
+            return account
+
+    def analyze_region_timed(session, region, *args, **kwargs):
+        if region == "ap-east-1":
+            raise RuntimeError(f"AuthFailure in {session}")
+        return region, analyze_snapshot(
+            region, security_groups=[generate_security_group(f"sg-{session}")]
+        ), 0.1
+
+    monkeypatch.setattr(panoptes.aws.analysis, 'analyze_region_timed', analyze_region_timed)
+    report = panoptes.aws.analysis.analyze_accounts(
+        session_pool=SessionPool(),
+        accounts=["222222222222", "111111111111", "333333333333"],
+        regions=["us-east-1", "ap-east-1"],
+    )
+
+    assert list(report['Accounts']) == ["111111111111", "222222222222"]
+    for account, account_report in report['Accounts'].items():
+        assert list(account_report['Regions']) == ["us-east-1"]
+        assert account_report['Metadata']['Errors'] == {
+            "ap-east-1": f"AuthFailure in {account}",
+        }
+    assert report['Metadata']['Errors'] == {
+        "111111111111": {"ap-east-1": "AuthFailure in 111111111111"},
+        "222222222222": {"ap-east-1": "AuthFailure in 222222222222"},
+        "333333333333": {"ap-east-1": "AccessDenied", "us-east-1": "AccessDenied"},
+    }
+
+
+def test_iter_regions_findings_yields_failed_regions(monkeypatch):
+    def iter_findings(region, **kwargs):
+        if region == "ap-east-1":
+            raise RuntimeError("AuthFailure")
+        yield {'Type': panoptes.aws.analysis.UNUSED_FINDING, 'Region': region}
+
+    monkeypatch.setattr(panoptes.aws.analysis, 'iter_findings', iter_findings)
+    findings = panoptes.aws.analysis.iter_regions_findings(
+        session=None,
+        regions=["us-east-1", "ap-east-1"],
+    )
+
+    assert sorted((finding['Type'], finding['Region']) for finding in findings) == [
+        (panoptes.aws.analysis.ERROR_FINDING, "ap-east-1"),
+        (panoptes.aws.analysis.UNUSED_FINDING, "us-east-1"),
+    ]
+
+
+def test_findings_stream_matches_the_analysis(snapshot_inventory):
+    security_groups = [
+        generate_security_group("sg-open", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+        generate_security_group("sg-db", [generate_ip_permission(group_ids=["sg-open"])]),
+    ]
+    analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=snapshot_inventory(security_groups=security_groups),
+    )
+
+    findings = list(panoptes.aws.analysis.iter_findings(
+        session=None,
+        inventory=snapshot_inventory(security_groups=security_groups),
+    ))
+
+    for finding_type, section in panoptes.aws.analysis.FINDING_SECTIONS.items():
+        assert [
+            finding['SecurityGroup'] for finding in findings if finding['Type'] == finding_type
+        ] == analysis['SecurityGroups'][section]
+    assert {finding['Region'] for finding in findings} == {"us-east-1"}
+
+
+def test_closing_concurrent_findings_stops_the_streams():
+    drained = []
+
+    def generate_stream(stream_id: int):
+        def stream():
+            for position in range(1000):
+                drained.append(stream_id)
+                yield {'Stream': stream_id, 'Position': position}
+        return stream
+
+    findings = panoptes.aws.analysis.iter_concurrent_findings(
+        streams=[generate_stream(stream_id) for stream_id in range(3)],
+        max_workers=3,
+    )
+    first_finding = next(findings)
+    findings.close()
+
+    assert first_finding['Position'] == 0
+    assert len(drained) < 3000
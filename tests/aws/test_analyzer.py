@@ -0,0 +1,77 @@
+import pytest
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group, generate_snapshot
+
+
+@pytest.fixture
+def evaluated_groups(monkeypatch) -> list:
+    """
+    Serves every inventory of the analyzer from a snapshot, returning the
+    IDs of the groups evaluated
+    """
+    snapshot_inventory_class = panoptes.aws.snapshot.SnapshotInventory
+
+    def create_inventory(session, region=None, scope=None, **kwargs):
+        return snapshot_inventory_class(generate_snapshot(
+            region=region,
+            security_groups=[
+                generate_security_group("sg-1", [generate_ip_permission(cidrs=["52.1.2.3/32"])]),
+            ],
+        ))
+
+    evaluated_groups = []
+    evaluate_security_group = panoptes.aws.analysis.evaluate_security_group
+
+    def count_evaluation(security_group, **kwargs):
+        evaluated_groups.append(security_group['GroupId'])
+        return evaluate_security_group(security_group=security_group, **kwargs)
+
+    monkeypatch.setattr(panoptes.aws.inventory, 'Inventory', create_inventory)
+    monkeypatch.setattr(panoptes.aws.analysis, 'evaluate_security_group', count_evaluation)
+    return evaluated_groups
+
+
+def generate_analyzer() -> 'panoptes.aws.analyzer.Analyzer':
+    session = type("Session", (), {'region_name': "us-east-1"})()
+    return panoptes.aws.analyzer.Analyzer(session)
+
+
+def test_unchanged_groups_are_evaluated_once(evaluated_groups):
+    analyzer = generate_analyzer()
+
+    first_analysis = analyzer.analyze()
+    second_analysis = analyzer.analyze()
+
+    assert evaluated_groups == ["sg-1"]
+    assert second_analysis['SecurityGroups'] == first_analysis['SecurityGroups']
+
+
+def test_regions_are_analyzed_separately(evaluated_groups):
+    analyzer = generate_analyzer()
+
+    analyzer.analyze("us-east-1")
+    analysis = analyzer.analyze("eu-west-1")
+
+    assert evaluated_groups == ["sg-1", "sg-1"]
+    assert analysis['SecurityGroups']['UnsafeGroups'][0]['GroupId'] == "sg-1"
+
+
+def test_new_whitelist_evaluates_groups_again(evaluated_groups):
+    analyzer = generate_analyzer()
+    analyzer.analyze()
+
+    analyzer.set_whitelist(["52.1.2.0/24"])
+    analysis = analyzer.analyze()
+
+    assert evaluated_groups == ["sg-1", "sg-1"]
+    assert analysis['SecurityGroups']['UnsafeGroups'] == []
+
+
+def test_invalidate_drops_the_cached_findings(evaluated_groups):
+    analyzer = generate_analyzer()
+    analyzer.analyze()
+
+    analyzer.invalidate()
+    analyzer.analyze()
+
+    assert evaluated_groups == ["sg-1", "sg-1"]
@@ -0,0 +1,97 @@
+import panoptes
+from tests.aws.helpers import generate_call_key, generate_snapshot
+
+
+def generate_attachments_inventory(**calls) -> 'panoptes.aws.snapshot.SnapshotInventory':
+    snapshot = generate_snapshot(
+        instances=[{'InstanceId': "i-1", 'SecurityGroups': [{'GroupId': "sg-ec2"}]}],
+        network_interfaces=[{'NetworkInterfaceId': "eni-1", 'Groups': [{'GroupId': "sg-eni"}]}],
+    )
+    snapshot['Calls'].update(calls)
+    return panoptes.aws.snapshot.SnapshotInventory(snapshot)
+
+
+def test_collectors_walk_every_page():
+    inventory = generate_attachments_inventory(**{
+        generate_call_key('rds', 'describe_db_instances'): [
+            {'DBInstances': [{'VpcSecurityGroups': [{'VpcSecurityGroupId': "sg-rds-1"}]}]},
+            {'DBInstances': [{'VpcSecurityGroups': [{'VpcSecurityGroupId': "sg-rds-2"}]}]},
+        ],
+        generate_call_key('elb', 'describe_load_balancers'): [
+            {'LoadBalancerDescriptions': [{'SecurityGroups': ["sg-elb"]}]},
+        ],
+        generate_call_key('elbv2', 'describe_load_balancers'): [
+            {'LoadBalancers': [{'SecurityGroups': ["sg-alb"]}, {}]},
+        ],
+        generate_call_key('lambda', 'list_functions'): [
+            {'Functions': [{}]},
+            {'Functions': [{'VpcConfig': {'SecurityGroupIds': ["sg-lambda"]}}]},
+        ],
+        generate_call_key('elasticache', 'describe_cache_clusters'): [
+            {'CacheClusters': [{
+                'CacheSecurityGroups': [{'CacheSecurityGroupName': "cache-group"}],
+                'SecurityGroups': [{'SecurityGroupId': "sg-cache"}],
+            }]},
+        ],
+        generate_call_key('elasticache', 'describe_cache_security_groups'): [
+            {'CacheSecurityGroups': [{'EC2SecurityGroups': [{'EC2SecurityGroupName': "ec2-classic"}]}]},
+        ],
+    })
+
+    attached_groups = panoptes.aws.attached.list_all_attached_secgroups(None, inventory=inventory)
+
+    assert attached_groups == {
+        "sg-ec2", "sg-eni", "sg-rds-1", "sg-rds-2", "sg-elb", "sg-alb",
+        "sg-lambda", "cache-group", "sg-cache", "ec2-classic",
+    }
+
+
+def test_collectors_are_generators():
+    inventory = generate_attachments_inventory(**{
+        generate_call_key('rds', 'describe_db_instances'): [
+            {'DBInstances': [{'VpcSecurityGroups': [{'VpcSecurityGroupId': "sg-rds-1"}]}]},
+            {'DBInstances': [{'VpcSecurityGroups': [{'VpcSecurityGroupId': "sg-rds-2"}]}]},
+        ],
+    })
+
+    attached_groups = panoptes.aws.attached.list_rds_attached_secgroups(inventory)
+
+    assert next(attached_groups) == "sg-rds-1"
+    assert list(attached_groups) == ["sg-rds-2"]
+
+
+def test_missing_cache_security_groups_are_ignored():
+    snapshot = generate_snapshot()
+    del snapshot['Calls'][generate_call_key('elasticache', 'describe_cache_security_groups')]
+    inventory = panoptes.aws.snapshot.SnapshotInventory(snapshot)
+
+    assert list(panoptes.aws.attached.list_elasticache_attached_secgroups(inventory)) == []
+
+
+def test_ecs_services_are_described_in_batches():
+    service_arns = [f"service-{position}" for position in range(23)]
+    limit = panoptes.aws.attached.ECS_SERVICE_API_LIMIT
+    calls = {
+        generate_call_key('ecs', 'list_clusters'): [{'clusterArns': ["cluster-1", "cluster-2"]}],
+        generate_call_key('ecs', 'list_services', cluster="cluster-1"): [
+            {'serviceArns': service_arns[:15]},
+            {'serviceArns': service_arns[15:]},
+        ],
+        generate_call_key('ecs', 'list_services', cluster="cluster-2"): [{'serviceArns': []}],
+    }
+    for services in [service_arns[0:10], service_arns[10:15], service_arns[15:23]]:
+        assert len(services) <= limit
+        key = generate_call_key(
+            'ecs', 'describe_services', cluster="cluster-1", services=services
+        )
+        calls[key] = [{'services': [{}] + [
+            {'networkConfiguration': {'awsvpcConfiguration': {
+                'securityGroups': [f"sg-{service}"],
+            }}}
+            for service in services
+        ]}]
+    inventory = generate_attachments_inventory(**calls)
+
+    attached_groups = list(panoptes.aws.attached.list_ecs_attached_secgroups(inventory))
+
+    assert sorted(attached_groups) == sorted(f"sg-{service}" for service in service_arns)
@@ -0,0 +1,74 @@
+import datetime
+import botocore.exceptions
+import pytest
+import panoptes
+from tests.aws.helpers import ACCOUNT_ID, StubbedSession
+
+
+def stub_assume_role(session: StubbedSession, access_key: str):
+    session.stub('sts').add_response(
+        'assume_role',
+        {
+            'Credentials': {
+                'AccessKeyId': access_key,
+                'SecretAccessKey': "secret",
+                'SessionToken': "token",
+                'Expiration': datetime.datetime.now(datetime.timezone.utc)
+                + datetime.timedelta(hours=1),
+            },
+        },
+        {
+            'RoleArn': f"arn:aws:iam::{ACCOUNT_ID}:role/audit",
+            'RoleSessionName': panoptes.aws.authentication.DEFAULT_ROLE_SESSION_NAME,
+        },
+    )
+
+
+def test_assumed_role_session_assumes_the_role_on_first_use():
+    base_session = StubbedSession()
+    stub_assume_role(base_session, "ASIAASSUMEDROLEKEY")
+
+    session = panoptes.aws.authentication.create_assumed_role_session(
+        session=base_session,
+        account_id=ACCOUNT_ID,
+        role_name="audit",
+    )
+    credentials = session.get_credentials()
+
+    assert credentials.method == panoptes.aws.authentication.AssumeRoleCredentialProvider.METHOD
+    assert credentials.get_frozen_credentials().access_key == "ASIAASSUMEDROLEKEY"
+    assert credentials.get_frozen_credentials().token == "token"
+    base_session.stub('sts').assert_no_pending_responses()
+
+
+def test_session_pool_caches_one_session_per_account():
+    pool = panoptes.aws.authentication.SessionPool(
+        session=StubbedSession(),
+        role_name="audit",
+    )
+
+    session = pool.get(ACCOUNT_ID)
+
+    assert pool.get(ACCOUNT_ID) is session
+    assert pool.get("210987654321") is not session
+
+
+def test_session_pool_assume_raises_when_the_role_is_denied():
+    base_session = StubbedSession()
+    base_session.stub('sts').add_client_error('assume_role', service_error_code="AccessDenied")
+    pool = panoptes.aws.authentication.SessionPool(
+        session=base_session,
+        role_name="audit",
+    )
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        pool.assume(ACCOUNT_ID)
+
+
+def test_resolve_regions_keeps_the_given_order_without_duplicates():
+    regions = panoptes.aws.authentication.resolve_regions(
+        session=None,
+        regions="eu-west-1, us-east-1,eu-west-1,",
+    )
+
+    assert regions == ["eu-west-1", "us-east-1"]
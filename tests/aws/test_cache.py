@@ -0,0 +1,56 @@
+import panoptes
+from tests.aws.helpers import ACCOUNT_ID, REGION, generate_snapshot
+
+
+def test_sources_expire_with_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(panoptes.aws.cache.time, 'time', lambda: now[0])
+    whitelist_cache = panoptes.aws.cache.WhitelistCache(ttls={'get_vpc_ranges': 60})
+
+    whitelist_cache.put(ACCOUNT_ID, REGION, 'get_vpc_ranges', ["10.0.0.0/16"])
+    whitelist_cache.put(ACCOUNT_ID, REGION, 'get_vpc_instance_ips', ["10.0.0.1/32"])
+
+    assert whitelist_cache.get(ACCOUNT_ID, REGION, 'get_vpc_ranges') == ["10.0.0.0/16"]
+    assert whitelist_cache.get(ACCOUNT_ID, REGION, 'get_vpc_instance_ips') is None
+    now[0] += 60
+    assert whitelist_cache.get(ACCOUNT_ID, REGION, 'get_vpc_ranges') is None
+
+
+def test_oldest_entries_are_evicted():
+    whitelist_cache = panoptes.aws.cache.WhitelistCache(max_entries=2)
+
+    for region in ("us-east-1", "eu-west-1", "ap-south-1"):
+        whitelist_cache.put(ACCOUNT_ID, region, 'get_vpc_ranges', [])
+
+    assert whitelist_cache.get(ACCOUNT_ID, "us-east-1", 'get_vpc_ranges') is None
+    assert whitelist_cache.get(ACCOUNT_ID, "ap-south-1", 'get_vpc_ranges') == []
+
+
+def test_saved_cache_is_loaded_and_refreshed(tmp_path):
+    cache_path = str(tmp_path / "whitelist.json")
+    whitelist_cache = panoptes.aws.cache.WhitelistCache()
+    whitelist_cache.put(ACCOUNT_ID, REGION, 'get_subnet_ranges', ["10.0.1.0/24"])
+    whitelist_cache.save(cache_path)
+
+    loaded_cache = panoptes.aws.cache.WhitelistCache.load(cache_path)
+    refreshed_cache = panoptes.aws.cache.WhitelistCache.load(cache_path, refresh=True)
+
+    assert loaded_cache.get(ACCOUNT_ID, REGION, 'get_subnet_ranges') == ["10.0.1.0/24"]
+    assert loaded_cache.get_fresh_sources(ACCOUNT_ID, REGION) == ['get_subnet_ranges']
+    assert refreshed_cache.get(ACCOUNT_ID, REGION, 'get_subnet_ranges') is None
+
+
+def test_cached_sources_are_not_listed_again():
+    whitelist_cache = panoptes.aws.cache.WhitelistCache()
+    whitelist_cache.put(ACCOUNT_ID, REGION, 'get_vpc_ranges', ["10.0.0.0/16"])
+    snapshot = generate_snapshot()
+    # Listing the VPCs again would fail, the call isn't recorded
+    del snapshot['Calls'][panoptes.aws.inventory.generate_call_key('ec2', 'describe_vpcs', {})]
+
+    safe_ips = panoptes.aws.whitelist.list_all_safe_ips(
+        None,
+        inventory=panoptes.aws.snapshot.SnapshotInventory(snapshot),
+        whitelist_cache=whitelist_cache,
+    )
+
+    assert "10.0.0.0/16" in safe_ips
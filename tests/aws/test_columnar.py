@@ -0,0 +1,86 @@
+import random
+import pytest
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group
+
+
+numpy = pytest.importorskip("numpy")
+
+CIDRS = [
+    "0.0.0.0/0", "10.0.0.0/8", "10.1.2.3/32", "10.1.2.0/24", "192.168.0.0/16",
+    "52.1.2.3/32", "8.8.8.8", "::/0", "2001:db8::/32", "2001:db8::1/128",
+]
+WHITELISTS = {
+    'empty': [],
+    'ipv6_only': ["2001:db8::/32"],
+    'ipv4_only': ["10.0.0.0/8", "52.1.2.3/32"],
+    'mixed': ["10.1.2.0/24", "192.168.0.0/16", "2001:db8::/32", "0.0.0.0/0"],
+}
+
+
+def generate_security_groups(seed: int) -> list:
+    rng = random.Random(seed)
+    security_groups = []
+    for index in range(50):
+        ip_permissions = []
+        for _ in range(rng.randint(0, 4)):
+            cidrs = rng.sample(CIDRS, rng.randint(0, 3))
+            ip_permissions.append(generate_ip_permission(
+                protocol=rng.choice(["tcp", "udp", "icmp", "-1"]),
+                from_port=rng.choice([22, 80, 443]),
+                to_port=rng.choice([443, 1024]),
+                cidrs=[cidr for cidr in cidrs if ':' not in cidr],
+                ipv6_cidrs=[cidr for cidr in cidrs if ':' in cidr],
+            ))
+        security_groups.append(generate_security_group(f"sg-{index}", ip_permissions))
+    return security_groups
+
+
+@pytest.mark.parametrize("whitelist_name", sorted(WHITELISTS))
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_columnar_findings_match_python_engine(whitelist_name, seed):
+    security_groups = generate_security_groups(seed)
+    attached = [index % 3 != 0 for index in range(len(security_groups))]
+    whitelist_index = panoptes.generic.network.WhitelistIndex(WHITELISTS[whitelist_name])
+
+    expected = [
+        panoptes.aws.analysis.evaluate_security_group(
+            security_group, is_attached, whitelist_index
+        )
+        for security_group, is_attached in zip(security_groups, attached)
+    ]
+    findings = panoptes.aws.columnar.evaluate_security_groups(
+        security_groups, attached, whitelist_index
+    )
+
+    assert findings == expected
+
+
+def test_contains_ipv4_without_ipv4_whitelist():
+    contained = panoptes.aws.columnar.contains_ipv4(
+        panoptes.generic.network.WhitelistIndex(["2001:db8::/32"]),
+        numpy.array([0x0A000001], dtype=numpy.int64),
+        numpy.array([32], dtype=numpy.int64),
+    )
+
+    assert contained.tolist() == [False]
+
+
+def test_analysis_engines_match(snapshot_inventory):
+    security_groups = generate_security_groups(4)
+    instances = [
+        {'SecurityGroups': [{'GroupId': security_group['GroupId']}], 'NetworkInterfaces': []}
+        for security_group in security_groups[::2]
+    ]
+
+    analyses = [
+        panoptes.aws.analysis.analyze_security_groups(
+            session=None,
+            whitelist=WHITELISTS['mixed'],
+            inventory=snapshot_inventory(security_groups=security_groups, instances=instances),
+            engine=engine,
+        )['SecurityGroups']
+        for engine in panoptes.aws.analysis.ENGINES
+    ]
+
+    assert analyses[0] == analyses[1]
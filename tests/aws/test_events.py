@@ -0,0 +1,159 @@
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group
+
+
+def generate_instance(instance_id: str, group_ids: list, public_ip: str = None) -> dict:
+    network_interface = {'PrivateIpAddress': "10.0.0.10"}
+    if public_ip:
+        network_interface['Association'] = {'PublicIp': public_ip}
+    return {
+        'InstanceId': instance_id,
+        'SecurityGroups': [{'GroupId': group_id} for group_id in group_ids],
+        'NetworkInterfaces': [network_interface],
+    }
+
+
+def generate_run_instances_event(instance_id: str, group_ids: list, public_ip: str) -> dict:
+    group_set = {'items': [{'groupId': group_id} for group_id in group_ids]}
+    return {
+        'eventName': "RunInstances",
+        'responseElements': {'instancesSet': {'items': [{
+            'instanceId': instance_id,
+            'groupSet': group_set,
+            'networkInterfaceSet': {'items': [{
+                'networkInterfaceId': f"eni-{instance_id}",
+                'groupSet': group_set,
+                'privateIpAddress': "10.0.0.20",
+                'association': {'publicIp': public_ip},
+                'attachment': {'deviceIndex': 0, 'deleteOnTermination': True},
+            }]},
+        }]}},
+    }
+
+
+def generate_terminate_instances_event(instance_id: str) -> dict:
+    return {
+        'eventName': "TerminateInstances",
+        'requestParameters': {'instancesSet': {'items': [{'instanceId': instance_id}]}},
+    }
+
+
+def summarize(changes: list) -> list:
+    return [
+        (change['Type'], change['Change'], change['SecurityGroup']['GroupId'])
+        for change in changes
+    ]
+
+
+def test_instance_events_update_the_whitelist(snapshot_inventory):
+    inventory = snapshot_inventory(
+        security_groups=[
+            generate_security_group("sg-host", [
+                generate_ip_permission(cidrs=["52.1.2.3/32"]),
+            ]),
+        ],
+        instances=[generate_instance("i-existing", ["sg-host"])],
+    )
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(inventory)
+    assert model.findings["sg-host"][1] is not None
+
+    launched = model.apply(generate_run_instances_event("i-new", [], "52.1.2.3"))
+    terminated = model.apply(generate_terminate_instances_event("i-new"))
+
+    assert summarize(launched) == [
+        (panoptes.aws.analysis.UNSAFE_FINDING, panoptes.aws.events.RESOLVED_CHANGE, "sg-host"),
+    ]
+    assert summarize(terminated) == [
+        (panoptes.aws.analysis.UNSAFE_FINDING, panoptes.aws.events.NEW_CHANGE, "sg-host"),
+    ]
+
+
+def test_instances_from_the_inventory_are_whitelisted(snapshot_inventory):
+    inventory = snapshot_inventory(
+        security_groups=[
+            generate_security_group("sg-host", [
+                generate_ip_permission(cidrs=["52.1.2.3/32"]),
+            ]),
+        ],
+        instances=[generate_instance("i-existing", ["sg-host"], public_ip="52.1.2.3")],
+    )
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(inventory)
+
+    changes = model.apply(generate_terminate_instances_event("i-existing"))
+
+    assert model.findings["sg-host"][1] is not None
+    assert (
+        panoptes.aws.analysis.UNSAFE_FINDING, panoptes.aws.events.NEW_CHANGE, "sg-host"
+    ) in summarize(changes)
+
+
+def test_exposure_follows_the_attachment_of_open_groups(snapshot_inventory):
+    inventory = snapshot_inventory(security_groups=[
+        generate_security_group("sg-open", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+        generate_security_group("sg-db", [
+            generate_ip_permission(from_port=5432, group_ids=["sg-open"]),
+        ]),
+    ])
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(inventory)
+    assert model.exposed_groups == {}
+
+    launched = model.apply(generate_run_instances_event("i-web", ["sg-open"], "52.1.2.3"))
+    terminated = model.apply(generate_terminate_instances_event("i-web"))
+
+    exposed_changes = [
+        change for change in launched + terminated
+        if change['Type'] == panoptes.aws.analysis.EXPOSED_FINDING
+    ]
+    assert summarize(exposed_changes) == [
+        (panoptes.aws.analysis.EXPOSED_FINDING, panoptes.aws.events.NEW_CHANGE, "sg-db"),
+        (panoptes.aws.analysis.EXPOSED_FINDING, panoptes.aws.events.RESOLVED_CHANGE, "sg-db"),
+    ]
+    assert exposed_changes[0]['SecurityGroup']['ExposurePath'] == ["sg-open"]
+
+
+def test_revoked_reference_resolves_the_exposure(snapshot_inventory):
+    inventory = snapshot_inventory(
+        security_groups=[
+            generate_security_group("sg-open", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+            generate_security_group("sg-db", [
+                generate_ip_permission(from_port=5432, group_ids=["sg-open"]),
+            ]),
+        ],
+        instances=[generate_instance("i-web", ["sg-open"])],
+    )
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(inventory)
+    assert list(model.exposed_groups) == ["sg-db"]
+
+    changes = model.apply({
+        'eventName': "RevokeSecurityGroupIngress",
+        'requestParameters': {
+            'groupName': "name-sg-db",
+            'ipPermissions': {'items': [{
+                'ipProtocol': "tcp",
+                'fromPort': 5432,
+                'toPort': 5432,
+                'groups': {'items': [{'groupId': "sg-open"}]},
+            }]},
+        },
+    })
+
+    assert (
+        panoptes.aws.analysis.EXPOSED_FINDING, panoptes.aws.events.RESOLVED_CHANGE, "sg-db"
+    ) in summarize(changes)
+    assert model.exposed_groups == {}
+
+
+def test_groups_are_resolved_by_name(snapshot_inventory):
+    inventory = snapshot_inventory(security_groups=[generate_security_group("sg-1")])
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(inventory)
+
+    assert model.resolve_group_id("name-sg-1") == "sg-1"
+    changes = model.apply({
+        'eventName': "DeleteSecurityGroup",
+        'requestParameters': {'groupName': "name-sg-1"},
+    })
+
+    assert summarize(changes) == [
+        (panoptes.aws.analysis.UNUSED_FINDING, panoptes.aws.events.RESOLVED_CHANGE, "sg-1"),
+    ]
+    assert model.resolve_group_id("name-sg-1") == "name-sg-1"
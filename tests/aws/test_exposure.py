@@ -0,0 +1,140 @@
+import panoptes
+
+
+def generate_unsafe_ingress(protocol: str, cidr: str, from_port=None, to_port=None) -> dict:
+    unsafe_ingress = {'IpProtocol': protocol, 'CidrIp': cidr, 'Status': "warning"}
+    if from_port is not None:
+        unsafe_ingress['FromPort'] = from_port
+        unsafe_ingress['ToPort'] = from_port if to_port is None else to_port
+    return unsafe_ingress
+
+
+def test_merge_overlapping_and_adjacent_port_ranges():
+    merged = panoptes.aws.exposure.merge_unsafe_ingress([
+        generate_unsafe_ingress("tcp", "1.2.3.4/32", 20, 25),
+        generate_unsafe_ingress("tcp", "1.2.3.4/32", 22, 40),
+        generate_unsafe_ingress("tcp", "1.2.3.4/32", 41, 50),
+        generate_unsafe_ingress("tcp", "1.2.3.4/32", 80),
+    ])
+
+    assert [(entry['FromPort'], entry['ToPort']) for entry in merged] == [(20, 50), (80, 80)]
+
+
+def test_drop_ranges_covered_by_wider_cidr():
+    merged = panoptes.aws.exposure.merge_unsafe_ingress([
+        generate_unsafe_ingress("tcp", "10.0.0.0/24", 22),
+        generate_unsafe_ingress("tcp", "10.0.0.0/8", 0, 1024),
+        generate_unsafe_ingress("udp", "10.0.0.0/24", 53),
+    ])
+
+    assert [(entry['IpProtocol'], entry['CidrIp']) for entry in merged] == [
+        ("tcp", "10.0.0.0/8"),
+        ("udp", "10.0.0.0/24"),
+    ]
+
+
+def test_drop_entries_covered_by_all_traffic():
+    merged = panoptes.aws.exposure.merge_unsafe_ingress([
+        generate_unsafe_ingress("tcp", "10.0.0.0/24", 22),
+        generate_unsafe_ingress("icmp", "10.0.0.0/24", 8, 0),
+        generate_unsafe_ingress("-1", "0.0.0.0/0"),
+    ])
+
+    assert [entry['IpProtocol'] for entry in merged] == ["-1"]
+
+
+def test_icmp_type_and_code_are_not_port_ranges():
+    icmp_entry = generate_unsafe_ingress("icmp", "1.2.3.4/32", 3, 4)
+
+    merged = panoptes.aws.exposure.merge_unsafe_ingress([
+        icmp_entry,
+        generate_unsafe_ingress("icmp", "0.0.0.0/0", 0, 5),
+    ])
+
+    assert icmp_entry in merged
+
+
+def test_icmp_covered_by_same_or_any_type():
+    for covering_entry in [
+            generate_unsafe_ingress("icmp", "0.0.0.0/0", 3, 4),
+            generate_unsafe_ingress("icmp", "0.0.0.0/0", 3, -1),
+            generate_unsafe_ingress("icmp", "0.0.0.0/0", -1, -1)]:
+        merged = panoptes.aws.exposure.merge_unsafe_ingress([
+            generate_unsafe_ingress("icmp", "1.2.3.4/32", 3, 4),
+            covering_entry,
+        ])
+
+        assert merged == [covering_entry]
+
+
+def test_exposure_index_queries_port_ranges():
+    analysis = {'SecurityGroups': {'UnsafeGroups': [
+        {'GroupId': "sg-1", 'GroupName': "one", 'UnsafePorts': [
+            generate_unsafe_ingress("tcp", "0.0.0.0/0", 20, 25),
+        ]},
+        {'GroupId': "sg-2", 'GroupName': "two", 'UnsafePorts': [
+            generate_unsafe_ingress("tcp", "1.2.3.4/32", 22),
+            generate_unsafe_ingress("icmp", "0.0.0.0/0", 8, 0),
+        ]},
+        {'GroupId': "sg-3", 'GroupName': "three", 'UnsafePorts': [
+            generate_unsafe_ingress("-1", "1.2.3.4/32"),
+        ]},
+    ]}}
+    exposure_index = panoptes.aws.exposure.ExposureIndex(analysis)
+
+    def query(*args, **kwargs) -> list:
+        return [target['GroupId'] for target in exposure_index.query(*args, **kwargs)]
+
+    assert query(22) == ["sg-1", "sg-2", "sg-3"]
+    assert query(22, internet=True) == ["sg-1"]
+    assert query(26) == ["sg-3"]
+    assert query(8, protocol="icmp", internet=True) == ["sg-2"]
+    assert query(443, protocol="udp") == ["sg-3"]
+
+
+def test_equal_networks_keep_one_entry():
+    merged = panoptes.aws.exposure.merge_unsafe_ingress([
+        generate_unsafe_ingress("tcp", "10.0.0.1/24", 22),
+        generate_unsafe_ingress("tcp", "10.0.0.0/24", 22),
+    ])
+
+    assert merged == [generate_unsafe_ingress("tcp", "10.0.0.1/24", 22)]
+
+
+def test_equal_networks_merge_port_ranges():
+    merged = panoptes.aws.exposure.merge_unsafe_ingress([
+        generate_unsafe_ingress("tcp", "10.0.0.1/24", 22),
+        generate_unsafe_ingress("udp", "10.0.0.0/24", 53),
+        generate_unsafe_ingress("tcp", "10.0.0.0/24", 23),
+    ])
+
+    assert [
+        (entry['IpProtocol'], entry['FromPort'], entry['ToPort']) for entry in merged
+    ] == [("tcp", 22, 23), ("udp", 53, 53)]
+
+
+def test_same_cidr_of_several_protocols():
+    entries = [
+        generate_unsafe_ingress("tcp", "1.2.3.4/32", 22),
+        generate_unsafe_ingress("udp", "1.2.3.4/32", 53),
+    ]
+
+    assert panoptes.aws.exposure.merge_unsafe_ingress(entries) == entries
+
+
+def test_port_interval_index_matches_linear_scan():
+    intervals = [
+        (from_port, from_port + length, f"value-{index % 7}")
+        for index, (from_port, length) in enumerate(
+            (port * 37 % 1000, port * 11 % 300) for port in range(200)
+        )
+    ]
+    port_index = panoptes.aws.exposure.PortIntervalIndex(intervals)
+
+    for port in range(-1, 1400, 3):
+        expected = {value for from_port, to_port, value in intervals if from_port <= port <= to_port}
+        assert sorted(port_index.query(port)) == sorted(expected)
+
+
+def test_port_interval_index_without_intervals():
+    assert panoptes.aws.exposure.PortIntervalIndex([]).query(22) == ()
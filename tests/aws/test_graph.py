@@ -0,0 +1,56 @@
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group
+
+
+def generate_graph() -> 'panoptes.aws.graph.SecurityGroupGraph':
+    return panoptes.aws.graph.SecurityGroupGraph([
+        generate_security_group("sg-open", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+        generate_security_group("sg-app", [generate_ip_permission(group_ids=["sg-open"])]),
+        generate_security_group("sg-db", [generate_ip_permission(group_ids=["sg-app"])]),
+        generate_security_group("sg-cache", [generate_ip_permission(group_ids=["sg-db"])]),
+    ])
+
+
+def test_exposure_spreads_through_attached_groups():
+    graph = generate_graph()
+
+    exposure_paths = graph.compute_exposure(lambda group_id: group_id != "sg-db")
+
+    assert exposure_paths == {
+        "sg-app": ["sg-open"],
+        "sg-db": ["sg-open", "sg-app"],
+    }
+
+
+def test_detached_open_groups_expose_nothing():
+    graph = generate_graph()
+
+    assert graph.compute_exposure(lambda group_id: group_id != "sg-open") == {}
+
+
+def test_references_count_as_in_use():
+    graph = generate_graph()
+    graph.add_references(generate_security_group("sg-other", [
+        generate_ip_permission(group_ids=["sg-cache"]),
+    ]))
+
+    assert graph.is_referenced("sg-open")
+    assert graph.is_referenced("sg-cache")
+    assert not graph.is_referenced("sg-unknown")
+
+
+def test_replaced_and_removed_groups_update_the_references():
+    graph = generate_graph()
+
+    graph.add(generate_security_group("sg-app"))
+    graph.remove("sg-open")
+
+    assert not graph.is_referenced("sg-open")
+    assert "sg-open" not in graph.internet_open
+    assert graph.compute_exposure(lambda group_id: True) == {}
+
+
+def test_self_references_are_ignored():
+    security_group = generate_security_group("sg-1", [generate_ip_permission(group_ids=["sg-1"])])
+
+    assert list(panoptes.aws.graph.iter_group_references(security_group)) == []
@@ -0,0 +1,63 @@
+import panoptes
+from tests.aws.helpers import StubbedSession
+
+
+def test_calls_are_recorded_into_the_parent():
+    parent = panoptes.aws.instrumentation.Recorder()
+    recorder = panoptes.aws.instrumentation.Recorder(parent=parent)
+
+    recorder.record_call('ec2', 'describe_vpcs', seconds=0.5, pages=2, items=3, retries=1)
+    with recorder.phase('Whitelist'):
+        pass
+
+    for timings in (recorder.to_dict(), parent.to_dict()):
+        assert timings['Calls']['ec2:describe_vpcs'] == {
+            'Calls': 1,
+            'Seconds': 0.5,
+            'Pages': 2,
+            'Items': 3,
+            'Retries': 1,
+            'Throttles': 0,
+        }
+        assert list(timings['Phases']) == ["Whitelist"]
+
+
+def test_retry_handler_counts_throttling_responses():
+    recorder = panoptes.aws.instrumentation.Recorder()
+
+    for error_code in ("RequestLimitExceeded", "LimitExceededException"):
+        recorder.handle_retry_event(
+            'ec2',
+            response=(None, {'Error': {'Code': error_code}}),
+            event_name="needs-retry.ec2.DescribeInstances",
+        )
+    recorder.handle_retry_event('ec2', response=None)
+
+    assert recorder.to_dict()['Calls']['ec2:describe_instances']['Throttles'] == 1
+
+
+def test_inventory_times_every_call():
+    session = StubbedSession()
+    session.stub('ec2').add_response(
+        'describe_vpcs',
+        {'Vpcs': [{'VpcId': "vpc-1"}, {'VpcId': "vpc-2"}], 'NextToken': "next"},
+        {},
+    )
+    session.stub('ec2').add_response('describe_vpcs', {'Vpcs': []}, {'NextToken': "next"})
+    inventory = panoptes.aws.inventory.Inventory(session)
+
+    inventory.fetch('ec2', 'describe_vpcs')
+
+    call = inventory.recorder.to_dict()['Calls']['ec2:describe_vpcs']
+    assert (call['Calls'], call['Pages'], call['Items']) == (1, 2, 2)
+    assert call['Seconds'] >= 0
+
+
+def test_profile_report_lists_the_slowest_calls_first():
+    recorder = panoptes.aws.instrumentation.Recorder()
+    recorder.record_call('ec2', 'describe_vpcs', seconds=0.1)
+    recorder.record_call('rds', 'describe_db_instances', seconds=0.9)
+
+    report = panoptes.aws.instrumentation.format_profile_report(recorder.to_dict())
+
+    assert report.index("rds:describe_db_instances") < report.index("ec2:describe_vpcs")
@@ -0,0 +1,76 @@
+import pytest
+import panoptes
+from tests.aws.helpers import StubbedSession, generate_call_key
+
+
+def stub_vpc_pages(session: StubbedSession):
+    stubber = session.stub('ec2')
+    stubber.add_response(
+        'describe_vpcs',
+        {'Vpcs': [{'VpcId': "vpc-1", 'CidrBlock': "10.0.0.0/16"}], 'NextToken': "next"},
+        {},
+    )
+    stubber.add_response(
+        'describe_vpcs',
+        {'Vpcs': [{'VpcId': "vpc-2", 'CidrBlock': "10.1.0.0/16"}]},
+        {'NextToken': "next"},
+    )
+
+
+def test_pages_fetches_shared_calls_once():
+    session = StubbedSession()
+    session.stub('ec2').add_response('describe_instances', {'Reservations': []}, {})
+    inventory = panoptes.aws.inventory.Inventory(session)
+
+    first_pages = inventory.pages('ec2', 'describe_instances')
+    second_pages = inventory.pages('ec2', 'describe_instances')
+
+    assert first_pages is second_pages
+    session.stub('ec2').assert_no_pending_responses()
+    assert generate_call_key('ec2', 'describe_instances') in inventory.export()
+
+
+def test_iter_pages_streams_without_memoizing():
+    session = StubbedSession()
+    stub_vpc_pages(session)
+    inventory = panoptes.aws.inventory.Inventory(session)
+
+    pages = inventory.iter_pages('ec2', 'describe_vpcs')
+    first_page = next(pages)
+
+    # The second page is requested only once the first one is consumed
+    assert first_page['Vpcs'][0]['VpcId'] == "vpc-1"
+    with pytest.raises(AssertionError):
+        session.stub('ec2').assert_no_pending_responses()
+    assert [page['Vpcs'][0]['VpcId'] for page in pages] == ["vpc-2"]
+    assert inventory.export() == {}
+    calls = inventory.recorder.to_dict()['Calls']
+    assert calls['ec2:describe_vpcs']['Pages'] == 2
+    assert calls['ec2:describe_vpcs']['Items'] == 2
+
+
+def test_iter_pages_memoizes_while_recording():
+    session = StubbedSession()
+    stub_vpc_pages(session)
+    inventory = panoptes.aws.inventory.Inventory(session, recording=True)
+
+    ranges = panoptes.aws.whitelist.get_vpc_ranges(inventory)
+
+    assert ranges == ["10.0.0.0/16", "10.1.0.0/16"]
+    assert ranges == panoptes.aws.whitelist.get_vpc_ranges(inventory)
+    assert len(inventory.export()[generate_call_key('ec2', 'describe_vpcs')]) == 2
+
+
+def test_iter_pages_serves_stored_pages():
+    inventory = panoptes.aws.inventory.Inventory(StubbedSession())
+    inventory.store('ec2', 'describe_addresses', [{'Addresses': [{'PublicIp': "52.1.2.3"}]}])
+
+    assert panoptes.aws.whitelist.get_elastic_ips(inventory) == ["52.1.2.3/32"]
+
+
+def test_snapshot_inventory_rejects_unrecorded_calls(snapshot_inventory):
+    inventory = snapshot_inventory()
+
+    assert list(inventory.iter_pages('ec2', 'describe_vpcs')) == [{'Vpcs': []}]
+    with pytest.raises(panoptes.aws.exceptions.PanoptesAWSSnapshotError):
+        list(inventory.iter_pages('ec2', 'describe_vpc_endpoints'))
@@ -0,0 +1,152 @@
+import io
+import json
+import yaml
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group
+
+
+def generate_security_groups() -> list:
+    return [
+        generate_security_group("sg-unused"),
+        generate_security_group("sg-open", [
+            generate_ip_permission(cidrs=["0.0.0.0/0"]),
+            generate_ip_permission(protocol="-1", cidrs=["52.1.2.3/32"]),
+        ]),
+        generate_security_group("sg-referenced", [
+            generate_ip_permission(from_port=80, group_ids=["sg-open"]),
+        ]),
+    ]
+
+
+def test_analysis_keeps_records_until_it_is_written(snapshot_inventory):
+    inventory = snapshot_inventory(security_groups=generate_security_groups())
+
+    analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=inventory,
+    )
+
+    security_groups = analysis['SecurityGroups']
+    assert security_groups['UnusedGroups'] and security_groups['UnsafeGroups']
+    assert isinstance(security_groups['UnsafeGroups'][0], panoptes.aws.model.UnsafeGroup)
+    plain_analysis = panoptes.aws.model.to_dict(analysis)
+    assert json.loads(panoptes.generic.output.print_json(analysis)) == plain_analysis
+    assert yaml.safe_load(panoptes.generic.output.print_yml(analysis)) == plain_analysis
+    assert yaml.safe_load(yaml.safe_dump(plain_analysis)) == plain_analysis
+
+
+def test_findings_are_written_as_dictionaries(snapshot_inventory):
+    inventory = snapshot_inventory(security_groups=generate_security_groups())
+    findings = list(panoptes.aws.analysis.iter_findings(session=None, inventory=inventory))
+    output_file = io.StringIO()
+
+    panoptes.generic.output.write_ndjson(findings, output_file)
+
+    assert all(isinstance(finding, panoptes.aws.model.Finding) for finding in findings)
+    assert [
+        json.loads(line) for line in output_file.getvalue().splitlines()
+    ] == panoptes.aws.model.to_dict(findings)
+
+
+def test_cached_records_match_the_reported_entries(snapshot_inventory):
+    state = panoptes.aws.state.AnalysisState()
+    inventory = snapshot_inventory(security_groups=generate_security_groups())
+    analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=inventory,
+        state=state,
+    )
+
+    state.rotate()
+    cached_analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=inventory,
+        state=state,
+    )
+
+    assert state.reused == 3
+    assert cached_analysis['SecurityGroups'] == analysis['SecurityGroups']
+    assert json.dumps(
+        cached_analysis['SecurityGroups'],
+        default=panoptes.generic.output.serialize_mapping,
+    )
+
+
+def test_record_to_dict_converts_nested_records():
+    unsafe_group = panoptes.aws.model.UnsafeGroup(
+        GroupName="name",
+        GroupId="sg-1",
+        Description="",
+        UnsafePorts=[
+            panoptes.aws.model.IngressRule(IpProtocol="-1", CidrIp="0.0.0.0/0", Status="alert"),
+        ],
+    )
+
+    converted = unsafe_group.to_dict()
+
+    assert converted == {
+        'GroupName': "name",
+        'GroupId': "sg-1",
+        'Description': "",
+        'UnsafePorts': [{'IpProtocol': "-1", 'CidrIp': "0.0.0.0/0", 'Status': "alert"}],
+    }
+    assert type(converted['UnsafePorts'][0]) is dict
+
+
+def test_parse_security_group_keeps_the_analyzed_fields():
+    security_group = dict(
+        generate_security_group("sg-1", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+        IpPermissionsEgress=[generate_ip_permission(protocol="-1", cidrs=["0.0.0.0/0"])],
+        OwnerId="123456789012",
+    )
+
+    parsed_group = panoptes.aws.model.parse_security_group(security_group)
+
+    assert isinstance(parsed_group, panoptes.aws.model.SecurityGroup)
+    assert dict(parsed_group) == {
+        key: security_group[key]
+        for key in ('GroupName', 'GroupId', 'Description', 'VpcId', 'IpPermissions')
+    }
+
+
+def test_event_model_updates_security_group_records(snapshot_inventory):
+    inventory = snapshot_inventory(security_groups=[generate_security_group("sg-1")])
+    model = panoptes.aws.events.SecurityGroupModel.from_inventory(inventory)
+
+    changes = model.apply({
+        'eventName': "AuthorizeSecurityGroupIngress",
+        'awsRegion': inventory.region,
+        'requestParameters': {
+            'groupId': "sg-1",
+            'ipPermissions': {'items': [{
+                'ipProtocol': "tcp",
+                'fromPort': 22,
+                'toPort': 22,
+                'ipRanges': {'items': [{'cidrIp': "0.0.0.0/0"}]},
+            }]},
+        },
+    })
+
+    assert isinstance(model.security_groups["sg-1"], panoptes.aws.model.SecurityGroup)
+    assert [(change['Type'], change['Change']) for change in changes] == [
+        (panoptes.aws.analysis.UNSAFE_FINDING, panoptes.aws.events.NEW_CHANGE),
+    ]
+    assert json.dumps(changes, default=panoptes.generic.output.serialize_mapping)
+
+
+def test_raw_responses_are_released_once_parsed(snapshot_inventory, monkeypatch):
+    inventory = snapshot_inventory(security_groups=generate_security_groups())
+    released = []
+    monkeypatch.setattr(inventory, 'release', lambda: released.append(True))
+
+    kept_findings = panoptes.aws.analysis.iter_findings(session=None, inventory=inventory)
+    next(kept_findings)
+    assert released == []
+
+    released_findings = panoptes.aws.analysis.iter_findings(
+        session=None,
+        inventory=inventory,
+        release_inventory=True,
+    )
+    next(released_findings)
+    assert released == [True]
@@ -0,0 +1,44 @@
+import io
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group, generate_snapshot
+
+
+def generate_analysis(region: str = "us-east-1") -> dict:
+    return panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=panoptes.aws.snapshot.SnapshotInventory(generate_snapshot(
+            region=region,
+            security_groups=[
+                generate_security_group("sg-open", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+            ],
+        )),
+    )
+
+
+def test_write_human_streams_the_same_output():
+    analysis = generate_analysis()
+    output_file = io.StringIO()
+
+    panoptes.aws.output.write_human(analysis, output_file, color=False)
+
+    assert output_file.getvalue() == panoptes.aws.output.print_human(analysis, color=False) + "\n"
+
+
+def test_human_output_without_color():
+    output = panoptes.aws.output.print_human(generate_analysis(), color=False)
+
+    assert "sg-open" in output
+    assert "0.0.0.0/0" in output
+    assert "\x1b[" not in output
+
+
+def test_human_output_of_every_region():
+    report = panoptes.aws.analysis.generate_regions_report()
+    for region in ("eu-west-1", "us-east-1"):
+        panoptes.aws.analysis.add_region_analysis(report, region, generate_analysis(region), 0.1)
+    report['Metadata']['Errors']['ap-east-1'] = "AuthFailure"
+
+    output = panoptes.aws.output.print_human(report, color=False)
+
+    assert output.index("eu-west-1") < output.index("us-east-1")
+    assert "ap-east-1" in output and "AuthFailure" in output
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+import panoptes
+
+
+class EventsClient:
+    """
+    Client keeping the botocore event handlers registered on it
+    """
+
+    def __init__(self):
+        self.handlers = {}
+
+        class Meta:
+            events = self
+        self.meta = Meta()
+
+    def register(self, event_name: str, handler):
+        self.handlers[event_name] = handler
+
+
+def generate_response(error_code: str = None) -> tuple:
+    response = {'ResponseMetadata': {}}
+    if error_code is not None:
+        response['Error'] = {'Code': error_code}
+    return None, response
+
+
+@pytest.fixture
+def registered_bucket():
+    client = EventsClient()
+    session = type("Session", (), {})()
+    scheduler = panoptes.aws.scheduler.Scheduler()
+    scheduler.register(client, session, 'ec2', "us-east-1")
+    return client.handlers['needs-retry'], scheduler.bucket(session, 'ec2', "us-east-1")
+
+
+def test_throttling_halves_the_rate_once_per_cooldown(registered_bucket):
+    needs_retry, bucket = registered_bucket
+
+    needs_retry(response=generate_response("RequestLimitExceeded"))
+    needs_retry(response=generate_response("Throttling"))
+
+    assert bucket.rate == panoptes.aws.scheduler.INITIAL_RATE / 2
+
+
+def test_quota_errors_are_not_throttling(registered_bucket):
+    needs_retry, bucket = registered_bucket
+
+    needs_retry(response=generate_response("LimitExceededException"))
+
+    assert bucket.rate == panoptes.aws.scheduler.INITIAL_RATE
+
+
+def test_success_increases_the_rate(registered_bucket):
+    needs_retry, bucket = registered_bucket
+
+    needs_retry(response=generate_response())
+
+    assert bucket.rate > panoptes.aws.scheduler.INITIAL_RATE
+
+
+def test_buckets_are_shared_by_session_service_and_region():
+    scheduler = panoptes.aws.scheduler.Scheduler()
+    session = type("Session", (), {})()
+    other_session = type("Session", (), {})()
+
+    bucket = scheduler.bucket(session, 'ec2', "us-east-1")
+
+    assert scheduler.bucket(session, 'ec2', "us-east-1") is bucket
+    assert scheduler.bucket(session, 'ec2', "eu-west-1") is not bucket
+    assert scheduler.bucket(session, 'rds', "us-east-1") is not bucket
+    assert scheduler.bucket(other_session, 'ec2', "us-east-1") is not bucket
+
+
+def test_client_config_uses_standard_retries():
+    config = panoptes.aws.scheduler.generate_client_config(max_workers=32)
+
+    assert config.max_pool_connections == 32
+    assert config.retries == {
+        'mode': "standard",
+        'max_attempts': panoptes.aws.scheduler.MAX_ATTEMPTS,
+    }
+
+
+def test_async_clients_wait_for_tokens_on_the_loop():
+    client = EventsClient()
+    session = type("Session", (), {})()
+    scheduler = panoptes.aws.scheduler.Scheduler()
+    scheduler.register_async(client, session, 'ec2', "us-east-1")
+    bucket = scheduler.bucket(session, 'ec2', "us-east-1")
+    bucket.rate, bucket.tokens = 20.0, 0.0
+
+    async def send_request() -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        ticks = []
+
+        async def tick():
+            while loop.time() - started < 0.04:
+                ticks.append(loop.time())
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(client.handlers['before-send'](request=None), tick())
+        return len(ticks)
+
+    # Other coroutines keep running while the request waits for its token
+    assert asyncio.run(send_request()) > 1
+    assert bucket.tokens < 1
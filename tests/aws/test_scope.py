@@ -0,0 +1,134 @@
+import panoptes
+from tests.aws.helpers import (
+    ACCOUNT_ID, REGION, generate_call_key, generate_ip_permission,
+    generate_security_group, generate_snapshot,
+)
+
+
+VPCS = [
+    {'VpcId': "vpc-1", 'CidrBlock': "10.0.0.0/16"},
+    {'VpcId': "vpc-2", 'CidrBlock': "10.1.0.0/16"},
+]
+SECURITY_GROUPS = [
+    # Allows the peered VPC, safe only with the whole region whitelisted
+    generate_security_group("sg-peered", [
+        generate_ip_permission(cidrs=["10.1.0.0/16"]),
+    ], vpc_id="vpc-1"),
+    # Allows an instance of the peered VPC
+    generate_security_group("sg-instance", [
+        generate_ip_permission(from_port=443, cidrs=["10.1.0.5/32", "52.1.2.3/32"]),
+    ], vpc_id="vpc-1"),
+    generate_security_group("sg-other", [
+        generate_ip_permission(cidrs=["0.0.0.0/0"]),
+    ], vpc_id="vpc-2"),
+]
+INSTANCES = [
+    {
+        'InstanceId': "i-1",
+        'SecurityGroups': [{'GroupId': "sg-peered"}],
+        'NetworkInterfaces': [{'PrivateIpAddress': "10.0.0.5"}],
+    },
+    {
+        'InstanceId': "i-2",
+        'SecurityGroups': [{'GroupId': "sg-other"}],
+        'NetworkInterfaces': [{'PrivateIpAddress': "10.1.0.5"}],
+    },
+]
+
+
+def generate_scoped_inventory(scope: 'panoptes.aws.scope.Scope'):
+    """
+    Generates an inventory replaying the calls of a scan limited to vpc-1
+    """
+    snapshot = generate_snapshot(
+        security_groups=SECURITY_GROUPS,
+        instances=INSTANCES,
+        vpcs=VPCS,
+    )
+    scoped_groups = [
+        security_group for security_group in SECURITY_GROUPS
+        if security_group['VpcId'] == "vpc-1"
+    ]
+    vpc_filters = [{'Name': 'vpc-id', 'Values': ["vpc-1"]}]
+    snapshot['Calls'].update({
+        generate_call_key('ec2', 'describe_security_groups', Filters=vpc_filters): [
+            {'SecurityGroups': scoped_groups}
+        ],
+        generate_call_key('ec2', 'describe_security_groups', Filters=[{
+            'Name': 'ip-permission.group-id',
+            'Values': [security_group['GroupId'] for security_group in scoped_groups],
+        }]): [{'SecurityGroups': []}],
+        generate_call_key(
+            'ec2', 'describe_network_interfaces',
+            PaginationConfig={'PageSize': 1000},
+            Filters=vpc_filters,
+        ): [{'NetworkInterfaces': []}],
+    })
+    inventory = panoptes.aws.snapshot.SnapshotInventory(snapshot)
+    inventory.scope = scope
+    return inventory
+
+
+def test_scope_does_not_change_verdicts(snapshot_inventory):
+    scope = panoptes.aws.scope.Scope(vpc_ids=["vpc-1"])
+    unscoped_analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=snapshot_inventory(
+            security_groups=SECURITY_GROUPS,
+            instances=INSTANCES,
+            vpcs=VPCS,
+        ),
+    )
+
+    scoped_analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=generate_scoped_inventory(scope),
+    )
+
+    for section, entries in unscoped_analysis['SecurityGroups'].items():
+        assert scoped_analysis['SecurityGroups'][section] == [
+            entry for entry in entries if entry['GroupId'] != "sg-other"
+        ]
+    unsafe_groups = scoped_analysis['SecurityGroups']['UnsafeGroups']
+    assert [unsafe_group['GroupId'] for unsafe_group in unsafe_groups] == ["sg-instance"]
+    assert [
+        unsafe_port['CidrIp'] for unsafe_port in unsafe_groups[0]['UnsafePorts']
+    ] == ["52.1.2.3/32"]
+
+
+def test_scoped_whitelist_is_cached_for_the_region():
+    whitelist_cache = panoptes.aws.cache.WhitelistCache()
+    scope = panoptes.aws.scope.Scope(vpc_ids=["vpc-1"])
+
+    panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=generate_scoped_inventory(scope),
+        whitelist_cache=whitelist_cache,
+    )
+
+    assert whitelist_cache.get(ACCOUNT_ID, REGION, 'get_vpc_ranges') == [
+        "10.0.0.0/16", "10.1.0.0/16",
+    ]
+
+
+def test_scoped_filters_are_pushed_down_to_network_interfaces(snapshot_inventory):
+    inventory = snapshot_inventory()
+    inventory.scope = panoptes.aws.scope.Scope(
+        vpc_ids=["vpc-1"],
+        tags=panoptes.aws.scope.parse_tags(["team=payments", "env"]),
+    )
+    inventory.store('ec2', 'describe_security_groups', [{'SecurityGroups': [
+        generate_security_group("sg-1"),
+    ]}], Filters=inventory.scope.generate_security_group_filters())
+
+    assert inventory.scope.generate_security_group_filters() == [
+        {'Name': 'vpc-id', 'Values': ["vpc-1"]},
+        {'Name': 'tag-key', 'Values': ["env"]},
+        {'Name': 'tag:team', 'Values': ["payments"]},
+    ]
+    assert panoptes.aws.scope.generate_scoped_params(inventory, 'group-id') == [{
+        'Filters': [
+            {'Name': 'vpc-id', 'Values': ["vpc-1"]},
+            {'Name': 'group-id', 'Values': ["sg-1"]},
+        ],
+    }]
@@ -0,0 +1,94 @@
+import pytest
+import panoptes
+from tests.aws.helpers import (
+    REGION,
+    generate_ip_permission,
+    generate_security_group,
+    generate_snapshot,
+)
+
+
+def test_saved_snapshot_replays_the_same_analysis(tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+    snapshot = generate_snapshot(security_groups=[
+        generate_security_group("sg-1", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+        generate_security_group("sg-2"),
+    ])
+
+    panoptes.aws.snapshot.save_snapshot(snapshot, snapshot_path)
+    loaded_snapshot = panoptes.aws.snapshot.load_snapshot(snapshot_path)
+
+    assert loaded_snapshot == snapshot
+    analyses = [
+        panoptes.aws.analysis.analyze_security_groups(
+            session=None,
+            inventory=panoptes.aws.snapshot.SnapshotInventory(replayed_snapshot),
+        )['SecurityGroups']
+        for replayed_snapshot in (snapshot, loaded_snapshot)
+    ]
+    assert analyses[0] == analyses[1]
+    assert [group['GroupId'] for group in analyses[0]['UnusedGroups']] == ["sg-1", "sg-2"]
+
+
+def test_recorded_snapshot_replays_the_live_analysis(tmp_path, monkeypatch):
+    aws_calls = generate_snapshot(
+        security_groups=[
+            generate_security_group("sg-open", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+            generate_security_group("sg-db", [generate_ip_permission(group_ids=["sg-open"])]),
+        ],
+        instances=[{
+            'InstanceId': "i-1",
+            'SecurityGroups': [{'GroupId': "sg-open"}],
+            'NetworkInterfaces': [],
+        }],
+    )['Calls']
+
+    def stream(inventory, service: str, operation: str, **params):
+        key = panoptes.aws.inventory.generate_call_key(service, operation, params)
+        for page in aws_calls[key]:
+            yield dict(page, ResponseMetadata={'RequestId': "id"})
+
+    monkeypatch.setattr(panoptes.aws.inventory.Inventory, 'stream', stream)
+    live_analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        region=REGION,
+    )
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+
+    panoptes.aws.snapshot.save_snapshot(
+        panoptes.aws.snapshot.create_snapshot(session=None, region=REGION),
+        snapshot_path,
+    )
+    replayed_analysis = panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        inventory=panoptes.aws.snapshot.SnapshotInventory(
+            panoptes.aws.snapshot.load_snapshot(snapshot_path)
+        ),
+    )
+
+    assert replayed_analysis['SecurityGroups'] == live_analysis['SecurityGroups']
+    assert [
+        group['GroupId'] for group in replayed_analysis['SecurityGroups']['ExposedGroups']
+    ] == ["sg-db"]
+
+
+def test_unsupported_snapshot_version_is_rejected(tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+    panoptes.aws.snapshot.save_snapshot(
+        dict(generate_snapshot(), Version=panoptes.aws.snapshot.SNAPSHOT_VERSION + 1),
+        snapshot_path,
+    )
+
+    with pytest.raises(panoptes.aws.exceptions.PanoptesAWSSnapshotError):
+        panoptes.aws.snapshot.load_snapshot(snapshot_path)
+
+
+def test_snapshot_inventory_never_creates_clients(snapshot_inventory):
+    with pytest.raises(panoptes.aws.exceptions.PanoptesAWSSnapshotError):
+        snapshot_inventory().client('ec2')
+
+
+def test_response_metadata_is_not_recorded():
+    page = {'SecurityGroups': [], 'ResponseMetadata': {'RequestId': "id"}}
+
+    assert panoptes.aws.snapshot.strip_response_metadata(page) == {'SecurityGroups': []}
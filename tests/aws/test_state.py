@@ -0,0 +1,62 @@
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group
+
+
+def analyze(snapshot_inventory, state, security_groups: list, whitelist: list = []) -> dict:
+    return panoptes.aws.analysis.analyze_security_groups(
+        session=None,
+        whitelist=whitelist,
+        inventory=snapshot_inventory(security_groups=security_groups),
+        state=state,
+    )['SecurityGroups']
+
+
+def test_saved_state_reuses_unchanged_groups(snapshot_inventory, tmp_path):
+    state_path = str(tmp_path / "state.json")
+    security_groups = [
+        generate_security_group("sg-1", [generate_ip_permission(cidrs=["52.1.2.3/32"])]),
+        generate_security_group("sg-2"),
+    ]
+    state = panoptes.aws.state.AnalysisState.load(state_path)
+    analysis = analyze(snapshot_inventory, state, security_groups)
+    state.save(state_path)
+
+    security_groups[1] = generate_security_group("sg-2", [generate_ip_permission(cidrs=["0.0.0.0/0"])])
+    loaded_state = panoptes.aws.state.AnalysisState.load(state_path)
+    cached_analysis = analyze(snapshot_inventory, loaded_state, security_groups)
+
+    assert (loaded_state.reused, loaded_state.evaluated) == (1, 1)
+    assert cached_analysis['UnsafeGroups'][0] == analysis['UnsafeGroups'][0]
+    assert [group['GroupId'] for group in cached_analysis['UnsafeGroups']] == ["sg-1", "sg-2"]
+
+
+def test_whitelist_changes_evaluate_groups_again(snapshot_inventory):
+    security_groups = [
+        generate_security_group("sg-1", [generate_ip_permission(cidrs=["52.1.2.3/32"])]),
+    ]
+    state = panoptes.aws.state.AnalysisState()
+    analyze(snapshot_inventory, state, security_groups)
+
+    state.rotate()
+    analysis = analyze(snapshot_inventory, state, security_groups, whitelist=["52.1.2.0/24"])
+
+    assert (state.reused, state.evaluated) == (0, 1)
+    assert analysis['UnsafeGroups'] == []
+
+
+def test_state_of_another_version_is_ignored(tmp_path):
+    state_path = tmp_path / "state.json"
+    state_path.write_text('{"Version": 0, "Groups": {"sg-1": {}}}')
+
+    state = panoptes.aws.state.AnalysisState.load(str(state_path))
+
+    assert state.get("sg-1", "hash") is None
+
+
+def test_group_hash_covers_the_attachment():
+    security_group = generate_security_group("sg-1")
+
+    assert (
+        panoptes.aws.state.generate_group_hash(security_group, True, "digest")
+        != panoptes.aws.state.generate_group_hash(security_group, False, "digest")
+    )
@@ -0,0 +1,81 @@
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group, generate_snapshot
+
+
+SECURITY_GROUPS = [
+    generate_security_group("sg-1", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+    generate_security_group("sg-2", [generate_ip_permission(cidrs=["10.0.0.0/8"])]),
+]
+
+
+def create_watcher(state=None, **kwargs) -> 'panoptes.aws.watch.Watcher':
+    watcher = panoptes.aws.watch.Watcher(
+        session=None,
+        regions=["us-east-1"],
+        whitelist=["10.0.0.0/8"],
+        state=state,
+        **kwargs,
+    )
+    watcher.inventories = {
+        region: panoptes.aws.snapshot.SnapshotInventory(
+            generate_snapshot(region=region, security_groups=SECURITY_GROUPS)
+        )
+        for region in watcher.inventories
+    }
+    return watcher
+
+
+def test_first_scan_reuses_loaded_state(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    first_watcher = create_watcher()
+    first_report = first_watcher.scan()
+    first_watcher.state.save(state_path)
+
+    watcher = create_watcher(state=panoptes.aws.state.AnalysisState.load(state_path))
+    report = watcher.scan()
+
+    assert watcher.status()['ReusedGroups'] == len(SECURITY_GROUPS)
+    assert watcher.status()['EvaluatedGroups'] == 0
+    assert report['Regions'] == first_report['Regions']
+
+
+def test_later_scans_reuse_previous_scan():
+    watcher = create_watcher()
+    watcher.scan()
+    watcher.scan()
+    status = watcher.status()
+
+    assert (status['Scans'], status['ReusedGroups'], status['EvaluatedGroups']) == (
+        2, len(SECURITY_GROUPS), 0
+    )
+
+
+def test_scan_passes_analysis_options(monkeypatch):
+    calls = []
+
+    def analyze_regions(**kwargs):
+        calls.append(kwargs)
+        return panoptes.aws.analysis.generate_regions_report()
+
+    monkeypatch.setattr(panoptes.aws.analysis, 'analyze_regions', analyze_regions)
+    scope = panoptes.aws.scope.Scope(vpc_ids=["vpc-1"])
+    watcher = create_watcher(
+        engine=panoptes.aws.analysis.COLUMNAR_ENGINE,
+        collector=panoptes.aws.analysis.ASYNCIO_COLLECTOR,
+        scope=scope,
+    )
+    watcher.scan()
+
+    assert calls[0]['engine'] == panoptes.aws.analysis.COLUMNAR_ENGINE
+    assert calls[0]['collector'] == panoptes.aws.analysis.ASYNCIO_COLLECTOR
+    assert calls[0]['scope'] is scope
+    assert calls[0]['inventories'] is watcher.inventories
+
+
+def test_prometheus_metrics_of_failed_regions():
+    report = panoptes.aws.analysis.generate_regions_report()
+    report['Metadata']['Errors']['ap-east-1'] = "AuthFailure"
+    status = create_watcher().status()
+    status['Analysis'] = report
+
+    assert "panoptes_failed_regions 1" in panoptes.aws.watch.generate_prometheus_metrics(status)
@@ -0,0 +1,81 @@
+import json
+import click.testing
+import pytest
+import panoptes
+from tests.aws.helpers import generate_ip_permission, generate_security_group, generate_snapshot
+
+
+def save_snapshot(snapshot_path: str):
+    panoptes.aws.snapshot.save_snapshot(
+        generate_snapshot(security_groups=[
+            generate_security_group("sg-1", [generate_ip_permission(cidrs=["0.0.0.0/0"])]),
+        ]),
+        snapshot_path,
+    )
+
+
+def test_analyze_writes_the_output_file(tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+    output_path = tmp_path / "analysis.json"
+    save_snapshot(snapshot_path)
+
+    result = click.testing.CliRunner().invoke(panoptes.cli.aws.aws_analyze_command, [
+        "--from-snapshot", snapshot_path, "--output", "json", "--output-file", str(output_path),
+    ])
+
+    assert result.exit_code == 0, result.output
+    analysis = json.loads(output_path.read_text())
+    assert [
+        unused_group['GroupId'] for unused_group in analysis['SecurityGroups']['UnusedGroups']
+    ] == ["sg-1"]
+
+
+def test_failed_analysis_keeps_the_output_file(tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+    output_path = tmp_path / "analysis.json"
+    output_path.write_text("previous")
+    panoptes.aws.snapshot.save_snapshot(
+        dict(generate_snapshot(), Calls={}),
+        snapshot_path,
+    )
+
+    result = click.testing.CliRunner().invoke(panoptes.cli.aws.aws_analyze_command, [
+        "--from-snapshot", snapshot_path, "--output", "json", "--output-file", str(output_path),
+    ])
+
+    assert result.exit_code != 0
+    assert output_path.read_text() == "previous"
+    assert not (tmp_path / "analysis.json.tmp").exists()
+
+
+@pytest.mark.parametrize('arguments', [
+    ["--whitelist-cache", "{tmp_path}/cache.json"],
+    ["--whitelist-cache", "{tmp_path}/cache.json", "--refresh"],
+    ["--region", "us-east-1"],
+    ["--accounts", "123456789012", "--role-name", "audit"],
+])
+def test_live_options_reject_snapshots(tmp_path, arguments):
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+    save_snapshot(snapshot_path)
+
+    result = click.testing.CliRunner().invoke(
+        panoptes.cli.aws.aws_analyze_command,
+        ["--from-snapshot", snapshot_path]
+        + [argument.format(tmp_path=tmp_path) for argument in arguments],
+    )
+
+    assert result.exit_code == 2
+    assert "--from-snapshot" in result.output
+    assert not (tmp_path / "cache.json").exists()
+
+
+def test_asyncio_collector_rejects_snapshots(tmp_path):
+    snapshot_path = str(tmp_path / "snapshot.json.gz")
+    save_snapshot(snapshot_path)
+
+    result = click.testing.CliRunner().invoke(panoptes.cli.aws.aws_analyze_command, [
+        "--from-snapshot", snapshot_path, "--collector", "asyncio",
+    ])
+
+    assert result.exit_code == 2
+    assert "--from-snapshot" in result.output
@@ -0,0 +1,74 @@
+import ipaddress
+import random
+import panoptes
+
+
+def test_contains_networks_inside_whitelisted_ranges():
+    whitelist_index = panoptes.generic.network.WhitelistIndex([
+        "10.0.0.0/16",
+        "52.1.2.3",
+        "2600:1f18::/32",
+    ])
+
+    assert "10.0.1.0/24" in whitelist_index
+    assert "10.0.0.0/16" in whitelist_index
+    assert "52.1.2.3/32" in whitelist_index
+    assert "2600:1f18:1::/48" in whitelist_index
+    assert "10.0.0.0/8" not in whitelist_index
+    assert "52.1.2.4/32" not in whitelist_index
+    assert "0.0.0.0/0" not in whitelist_index
+    assert "::/0" not in whitelist_index
+
+
+def test_malformed_entries_are_ignored():
+    whitelist_index = panoptes.generic.network.WhitelistIndex(["", "not a cidr", "10.0.0.0/8 "])
+
+    assert len(whitelist_index) == 1
+    assert "10.1.0.0/16" in whitelist_index
+    assert "not a cidr" not in whitelist_index
+
+
+def test_networks_inside_indexed_ones_are_not_counted():
+    whitelist_index = panoptes.generic.network.WhitelistIndex(["10.0.0.0/8", "10.1.0.0/16"])
+
+    assert len(whitelist_index) == 1
+    assert list(whitelist_index.networks()) == ["10.0.0.0/8"]
+
+
+def test_copy_is_independent():
+    whitelist_index = panoptes.generic.network.WhitelistIndex(["10.0.0.0/8"])
+
+    copied_index = whitelist_index.copy()
+    copied_index.add("192.168.0.0/16")
+
+    assert "192.168.1.0/24" in copied_index
+    assert "192.168.1.0/24" not in whitelist_index
+    assert copied_index.digest() != whitelist_index.digest()
+
+
+def test_digest_ignores_insertion_order():
+    cidrs = ["10.0.0.0/8", "52.1.2.3/32", "2600:1f18::/32"]
+
+    assert (
+        panoptes.generic.network.WhitelistIndex(cidrs).digest()
+        == panoptes.generic.network.WhitelistIndex(reversed(cidrs)).digest()
+    )
+
+
+def test_contains_matches_ipaddress():
+    randomizer = random.Random(7)
+    whitelist = [
+        str(ipaddress.ip_network((randomizer.getrandbits(32), randomizer.randint(8, 32)), strict=False))
+        for _ in range(200)
+    ]
+    whitelist_index = panoptes.generic.network.WhitelistIndex(whitelist)
+    networks = [ipaddress.ip_network(cidr) for cidr in whitelist]
+
+    for _ in range(500):
+        cidr = str(ipaddress.ip_network(
+            (randomizer.getrandbits(32), randomizer.randint(0, 32)), strict=False
+        ))
+        expected = any(
+            ipaddress.ip_network(cidr).subnet_of(network) for network in networks
+        )
+        assert (cidr in whitelist_index) == expected
@@ -0,0 +1,89 @@
+import io
+import json
+import pytest
+import panoptes
+
+
+ANALYSIS = {
+    'SecurityGroups': {
+        'UnsafeGroups': [
+            panoptes.aws.model.UnsafeGroup(
+                GroupName="web",
+                GroupId="sg-1",
+                Description="Ação",
+                UnsafePorts=[
+                    panoptes.aws.model.IngressRule(
+                        IpProtocol="tcp", CidrIp="0.0.0.0/0", Status="alert",
+                        FromPort=22, ToPort=22,
+                    ),
+                ],
+            ),
+        ],
+    },
+    'Metadata': {'CloudProvider': {'Name': "aws"}},
+}
+
+
+def write_json(analysis: dict) -> str:
+    output_file = io.StringIO()
+    panoptes.generic.output.write_json(analysis, output_file)
+    return output_file.getvalue()
+
+
+def test_write_json_matches_print_json():
+    content = write_json(ANALYSIS)
+
+    assert content == panoptes.generic.output.print_json(ANALYSIS)
+    assert json.loads(content) == panoptes.aws.model.to_dict(ANALYSIS)
+
+
+def test_write_ndjson_writes_the_same_lines_with_orjson(monkeypatch):
+    pytest.importorskip("orjson")
+    unsafe_group = ANALYSIS['SecurityGroups']['UnsafeGroups'][0]
+    findings = [{'Type': "UnsafeGroup", 'Region': "sa-east-1", 'SecurityGroup': unsafe_group}]
+    orjson_file = io.StringIO()
+    panoptes.generic.output.write_ndjson(findings, orjson_file)
+
+    monkeypatch.setattr(panoptes.generic.output, 'get_fast_json', lambda: None)
+    json_file = io.StringIO()
+    panoptes.generic.output.write_ndjson(findings, json_file)
+
+    assert orjson_file.getvalue() == json_file.getvalue()
+    assert "Ação" in json_file.getvalue()
+
+
+def test_write_ndjson_writes_one_finding_per_line():
+    findings = [
+        {'Type': "UnusedGroup", 'Region': "us-east-1", 'SecurityGroup': {'GroupId': "sg-1"}},
+        {'Type': "UnusedGroup", 'Region': "us-east-1", 'SecurityGroup': {'GroupId': "sg-2"}},
+    ]
+    output_file = io.StringIO()
+
+    panoptes.generic.output.write_ndjson(findings, output_file)
+
+    assert [json.loads(line) for line in output_file.getvalue().splitlines()] == findings
+
+
+def test_open_output_file_replaces_the_file_when_written(tmp_path):
+    output_path = tmp_path / "analysis.json"
+    output_path.write_text("previous")
+
+    with panoptes.generic.output.open_output_file(str(output_path)) as output_file:
+        output_file.write("current")
+        assert output_path.read_text() == "previous"
+
+    assert output_path.read_text() == "current"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["analysis.json"]
+
+
+def test_open_output_file_keeps_the_file_on_failure(tmp_path):
+    output_path = tmp_path / "analysis.json"
+    output_path.write_text("previous")
+
+    with pytest.raises(RuntimeError):
+        with panoptes.generic.output.open_output_file(str(output_path)) as output_file:
+            output_file.write("partial")
+            raise RuntimeError("analysis failed")
+
+    assert output_path.read_text() == "previous"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["analysis.json"]
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+
+BENCHMARKS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+
+
+def run_benchmark(*arguments) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS_PATH, "bench_analysis.py"), *arguments],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=os.path.dirname(BENCHMARKS_PATH)),
+    )
+
+
+def test_analysis_benchmark_runs_every_case(tmp_path):
+    results_path = str(tmp_path / "results.json")
+
+    run = run_benchmark("--sizes", "20", "--repeat", "1", "--no-memory", "--save", results_path)
+
+    assert run.returncode == 0, run.stderr
+    with open(results_path) as results_file:
+        results = json.load(results_file)
+    assert {result['Name'] for result in results} >= {
+        "list_all_safe_ips",
+        "list_all_attached_secgroups",
+        "analyze_security_groups",
+        "write_json",
+    }
+    assert {result['Groups'] for result in results} == {20}
+
+
+def test_analysis_benchmark_fails_on_regressions(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    baseline_path.write_text(json.dumps([
+        {'Name': "analyze_security_groups", 'Groups': 20, 'Seconds': 1e-9},
+    ]))
+
+    run = run_benchmark(
+        "--sizes", "20", "--repeat", "1", "--no-memory", "--compare", str(baseline_path),
+    )
+
+    assert run.returncode == 1
+    assert "REGRESSION: analyze_security_groups" in run.stderr
@@ -0,0 +1,47 @@
+import json
+import subprocess
+import sys
+import pytest
+import panoptes
+
+
+HEAVY_MODULES = ["boto3", "botocore", "jinja2", "numpy", "yaml"]
+
+
+def list_loaded_modules(code: str) -> set:
+    loaded_modules = subprocess.run(
+        [
+            sys.executable, "-c",
+            code + "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.splitlines()[-1]
+    return set(json.loads(loaded_modules))
+
+
+def test_importing_panoptes_loads_no_dependency():
+    loaded_modules = list_loaded_modules("import panoptes")
+
+    assert loaded_modules.isdisjoint(HEAVY_MODULES)
+    assert "panoptes.aws" not in loaded_modules
+
+
+def test_help_loads_no_cloud_dependency():
+    loaded_modules = list_loaded_modules(
+        "import panoptes\n"
+        "try:\n"
+        "    panoptes.panoptesctl.main(['aws', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass"
+    )
+
+    assert loaded_modules.isdisjoint(HEAVY_MODULES)
+
+
+@pytest.mark.parametrize("package", [panoptes, panoptes.aws, panoptes.generic, panoptes.cli])
+def test_every_submodule_is_importable(package):
+    for submodule in package.SUBMODULES:
+        assert getattr(package, submodule).__name__ == f"{package.__name__}.{submodule}"
+        assert submodule in dir(package)